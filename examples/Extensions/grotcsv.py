@@ -8,6 +8,10 @@ def open_makedirs(filename, *args, **kwargs):
     return open(filename, *args, **kwargs)
 
 def grottext(conf, data, jsonmsg) :
+    """ Legacy entry point (record as json string) """
+    return grottext_record(conf, json.loads(jsonmsg))
+
+def grottext_record(conf, jsonobj) :
     """
     Grot extension to log data to CSV file
     One CSV file per day is saved.
@@ -27,13 +31,10 @@ def grottext(conf, data, jsonmsg) :
         ### uncomment this print statements if you want to see the information that is availble.
         ###
 
-        # print(jsonmsg)
-        # print(data)
+        # print(jsonobj)
         # print(dir(conf))
         # print(conf.extvar)
 
-    jsonobj = json.loads(jsonmsg)
-
     try:
         outpath = conf.extvar["outpath"]
     except:
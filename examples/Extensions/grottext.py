@@ -1,38 +1,53 @@
-def grottext(conf,data,jsonmsg) : 
-    ### 
-    ### Example to sent (http put) to a webserver. 
-    ### 
-    ### Updated: 2021-01-09
-    ### Version 2.4.0
+import json
+import requests
+
+### Session is kept between calls (connection reuse)
+session = requests.Session()
+
+def grottext(conf,data,jsonmsg) :
+    ### Legacy entry point (record as json string), used by grott versions without grottext_record
+    return post(conf, jsonmsg)
+
+def grottext_record(conf,record) :
     ###
-    ### see: https://www.w3schools.com/python/ref_requests_post.asp  for a clear explonation how to program a http post request: 
+    ### Example to sent (http put) to a webserver.
     ###
-    import requests
-    resultcode = 0
-    if conf.verbose : 
+    ### Updated: 2026-10-16
+    ### Version 2.8.3
+    ###
+    ### see: https://www.w3schools.com/python/ref_requests_post.asp  for a clear explonation how to program a http post request:
+    ###
+    ### grott runs the extension on its own thread, but a call may take max the supervisor deadline:
+    ### specify a timeout (extvar "timeout", default 5 seconds).
+    ###
+    if conf.verbose :
 
-        print("\t - " + "Grott extension module entered ") 
+        print("\t - " + "Grott extension module entered ")
         ###
         ### uncomment this print statements if you want to see the information that is available.
         ###
 
-        #print(jsonmsg)
-        #print(data)
+        #print(record)
         #print(dir(conf))
         #print(conf.extvar)
 
+    ### the record is posted as json string (as before)
+    return post(conf, json.dumps(record))
+
+def post(conf, jsonmsg) :
+    resultcode = 0
     if "url" in conf.extvar:
         url = conf.extvar["url"]
     else:
         url = f"http://{conf.extvar['ip']}:{conf.extvar['port']}"
 
-    try: 
-        r = requests.post(url, json = jsonmsg)
+    try:
+        r = session.post(url, json = jsonmsg, timeout = conf.extvar.get("timeout", 5))
+
+    except Exception as e:
 
-    except Exception as e: 
-        
         resultcode = e
-        return resultcode 
+        return resultcode
 
-    #print(r.text)  
+    #print(r.text)
     return resultcode
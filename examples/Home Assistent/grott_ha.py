@@ -583,6 +583,11 @@ def publish_multiple(conf: Conf, msgs):
 
 
 def grottext(conf: Conf, data: str, jsonmsg: str):
+    """Legacy entry point, the record is passed as json string"""
+    return grottext_record(conf, json.loads(jsonmsg))
+
+
+def grottext_record(conf: Conf, jsonmsg: dict):
     """Allow to push to HA MQTT bus, with auto discovery"""
 
     required_params = [
@@ -593,9 +598,6 @@ def grottext(conf: Conf, data: str, jsonmsg: str):
         print("Missing configuration for ha_mqtt")
         return 1
 
-    # Need to decode the json string
-    jsonmsg = json.loads(jsonmsg)
-
     if jsonmsg.get("buffered") == "yes":
         # Skip buffered message, HA don't support them
         if conf.verbose:
@@ -603,7 +605,8 @@ def grottext(conf: Conf, data: str, jsonmsg: str):
         return 5
 
     device_serial = jsonmsg["device"]
-    values = jsonmsg["values"]
+    # Copy, the record is shared with other extensions
+    values = dict(jsonmsg["values"])
 
     # Send the last push in UTC with TZ
     dt = datetime.now(timezone.utc)
@@ -18,6 +18,7 @@ import sys
 
 from grottconf import Conf
 from grottproxy import Proxy
+from grottaproxy import AsyncProxy
 from grottsniffer import Sniff
 
 #proces config file
@@ -26,6 +27,9 @@ conf = Conf(verrel)
 #print configuration
 if conf.verbose: conf.print()
 
+#fields needed by the sinks (the extensions are loaded) and record decoders 
+conf.set_decodefields()
+
 #To test config only remove # below
 #sys.exit(1)
 
@@ -41,7 +45,15 @@ if conf.mode == 'proxy':
                 print("\t - no ports to close")
             sys.exit(1)
 
-if conf.mode == 'sniff':
+elif conf.mode == 'asyncproxy':
+        proxy = AsyncProxy(conf)
+        try:
+            proxy.main(conf)
+        except KeyboardInterrupt:
+            print("Ctrl C - Stopping server")
+            sys.exit(1)
+
+elif conf.mode == 'sniff':
         sniff = Sniff(conf)
         try: 
             sniff.main(conf)
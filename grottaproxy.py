@@ -0,0 +1,142 @@
+# grottaproxy.py asyncio proxy (mode = asyncproxy)
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# Same function as the proxy (grottproxy) on one asyncio event loop: every datalogger connection has a
+# coroutine pair (datalogger -> Growatt server and Growatt server -> datalogger), there is no polling delay
+# and the upstream connect does not block the other connections. The records are checked and blocked as in
+# the proxy (inspect_record) and handed to the pipeline workers after forwarding (process_record), so
+# decoding and the outputs do not delay forwarding (with pipeline workers = 0 records are processed on the
+# event loop). Writes wait for the peer (drain) when more than highwater bytes are waiting, so a slow peer
+# pauses reading from the other side (until less than lowwater bytes are waiting).
+# The received data is split into records per connection and direction (GrottFramer).
+# If growattip2 is configured the records from the datalogger are also queued for the second server (writer
+# thread, see grottmirror), its responses are not sent to the datalogger.
+
+import asyncio
+import socket
+
+from grottframe import GrottFrame, GrottFramer
+from grottproxy import inspect_record, process_record, prefetch
+from grottdns import resolver
+from grottmirror import mirror
+
+# read size per receive
+buffer_size = 4096
+
+
+class AsyncProxy:
+
+    def __init__(self, conf):
+        print("\nGrott asyncio proxy mode started")
+        if conf.grottip == "default" : conf.grottip = '0.0.0.0'
+        self.conf = conf
+        self.forward_to = (conf.growattip, conf.growattport)
+        # if the second growatt server ip is configured the records are also sent to this server (own queue and writer thread)
+        self.forward_to2 = None
+        if conf.growattip2 != "" :
+            self.forward_to2 = (conf.growattip2, conf.growattport2)
+        self.mirror = mirror(conf)
+        self.connections = 0
+        # look up the Growatt server addresses at startup (DNS cache) 
+        prefetch(conf, [self.forward_to, self.forward_to2])
+        try:
+            hostname = (socket.gethostname())
+            print("Hostname :", hostname)
+            print("IP : ", socket.gethostbyname(hostname), ", port : ", conf.grottport, "\n")
+        except:
+            print("IP and port information not available")
+
+    def main(self, conf):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        server = await asyncio.start_server(self.on_accept, self.conf.grottip, self.conf.grottport, backlog=200, reuse_address=True)
+        async with server:
+            await server.serve_forever()
+
+    async def connect(self, address):
+        # connect to a Growatt server, returns reader and writer or None. The address is taken from the DNS cache,
+        # a name that is not in the cache is looked up in the background (not blocking the other connections, the
+        # lookup is shared with other connections and not cancelled on timeout)
+        resolved = None
+        try:
+            lookup = asyncio.wrap_future(resolver(self.conf).submit(address[0], address[1]))
+            lookup.add_done_callback(lambda f: f.cancelled() or f.exception())
+            resolved = await asyncio.wait_for(asyncio.shield(lookup), self.conf.connecttimeout)
+            return await asyncio.wait_for(asyncio.open_connection(resolved[1][0], address[1]), self.conf.connecttimeout)
+        except Exception as e:
+            print("\t - Grott - grottaproxy forward error : ", address, repr(e))
+            if resolved is not None: resolver(self.conf).failed(address[0], address[1], resolved)
+            return None
+
+    async def on_accept(self, reader, writer):
+        conf = self.conf
+        clientaddr = writer.get_extra_info("peername")
+        upstream = await self.connect(self.forward_to)
+        if upstream is None:
+            if conf.verbose:
+                print("\t - Can't establish connection with remote server.")
+                print("\t - Closing connection with client side", clientaddr)
+            writer.close()
+            return
+        for w in (writer, upstream[1]):
+            w.transport.set_write_buffer_limits(conf.highwater, conf.lowwater)
+        if conf.verbose: print("\t -", clientaddr, "has connected")
+        self.connections += 1
+        # session of this connection for the second server
+        session = object()
+
+        pumps = [asyncio.ensure_future(self.pump(reader, upstream[1], session, clientaddr)),
+                 asyncio.ensure_future(self.pump(upstream[0], writer, None, clientaddr))]
+        try:
+            #connection ends when one side closes
+            await asyncio.wait(pumps, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for pump in pumps:
+                pump.cancel()
+            for w in (writer, upstream[1]):
+                w.close()
+            if self.mirror is not None: self.mirror.close(session)
+            self.connections -= 1
+            if conf.verbose: print("\t -", clientaddr, "has disconnected, connections:", self.connections)
+
+    async def pump(self, reader, writer, session, clientaddr):
+        # forward records from reader to writer (and to the second server for a datalogger session)
+        conf = self.conf
+        framer = GrottFramer()
+        while True:
+            try:
+                received = await reader.read(buffer_size)
+            except (ConnectionError, OSError):
+                if conf.verbose : print("\t - Grott connection error")
+                return
+            #connection closed: pass on the data of an incomplete record 
+            records = framer.feed(received) if received else framer.flush()
+            for data in records:
+                print("")
+                print("\t - " + "Growatt packet received:")
+                print("\t\t ", clientaddr)
+                frame = GrottFrame(data)
+                try:
+                    forward = inspect_record(conf, frame)
+                except Exception as e:
+                    #record can not be inspected: forwarded (not if commands are blocked), the session continues
+                    forward = not conf.blockcmd
+                    if conf.verbose : print("\t - Grott - grottaproxy record inspection error, record", "forwarded:" if forward else "not forwarded:", repr(e))
+                if not forward : continue
+                writer.write(data)
+                if session is not None and self.mirror is not None:
+                    self.mirror.put(session, data)
+                    if conf.verbose: print("\t - Data also queued for second destination")
+                try:
+                    process_record(conf, frame)
+                except Exception as e:
+                    if conf.verbose : print("\t - Grott - grottaproxy record processing error:", repr(e))
+            try:
+                await writer.drain()
+            except (ConnectionError, OSError):
+                if conf.verbose : print("\t - Grott connection error")
+                return
+            if not received:
+                return
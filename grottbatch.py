@@ -0,0 +1,125 @@
+# grottbatch.py batch (columnar) decoding of Growatt records for replay and backfill
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# decode_batch decodes a list of records in one go. Records are grouped per record layout and every group
+# is decoded into NumPy column arrays (one array per field plus device, time and buffered columns).
+# Numeric fields are read with strided views on one buffer holding all records of the group, using the
+# offsets and dividers of the compiled layouts in conf.decoders. Text, log and non standard fields are taken
+# from the DecodedRecord of every record, so the values are the same as the values procdata sends.
+#
+# Example:
+#   columns = decode_batch(conf, frames)
+#   for layout, cols in columns.items() : print(layout, cols["time"], cols["pvpowerout"])
+
+from grottframe import GrottFrame
+from grottdata import frame_layout
+from grottlayout import NUM, NUMX, READERS
+
+#numpy is optional, only needed for batch processing
+try:
+    import numpy as np
+except:
+    np = None
+
+
+def decode_batch(conf, frames, fields=None, divide=True):
+    # decode a list of records (GrottFrame or bytes), returns {layout name : {column name : numpy array}}
+    # fields: only decode these fields (default all fields compiled in conf.decoders)
+    # divide: apply the layout dividers (float columns) or return the raw integer values
+    # Records that procdata does not process (no layout, or an error in a field) are skipped.
+    if np is None:
+        raise ImportError("Grott batch decoding needs numpy, install with: pip install numpy")
+
+    groups = {}
+    for frame in frames:
+        if not isinstance(frame, GrottFrame):
+            frame = GrottFrame(frame)
+        if len(frame.data) < 12:
+            continue
+        layout, decoder, decrypt = frame_layout(conf, frame)
+        if decoder is None:
+            continue
+        plain = frame.descrambled if decrypt else frame.data
+        #text and log fields are decoded here (as in procdata), a record with an invalid field is not processed
+        try:
+            record = decoder.decode(plain)
+        except ValueError as e:
+            if conf.verbose : print("\t - grottbatch - error in keyword processing : ", str(e) + " ,record skipped")
+            continue
+        groups.setdefault(layout, (decoder, []))[1].append((plain, frame.command == "50", record))
+
+    return {layout: decode_group(decoder, records, fields, divide) for layout, (decoder, records) in groups.items()}
+
+
+def decode_group(decoder, records, fields=None, divide=True):
+    # decode records with the same layout into columns, records is a list of (plain data, buffered, DecodedRecord)
+    nrec = len(records)
+    width = max(decoder.recordlength, max(len(plain) for plain, buffered, record in records))
+    #one buffer with all records padded to the same width, every field is a strided view on this buffer
+    buf = bytearray(nrec * width)
+    for i, (plain, buffered, record) in enumerate(records):
+        buf[i * width:i * width + len(plain)] = plain
+    rows = np.frombuffer(buf, dtype=np.uint8).reshape(nrec, width)
+    lengths = np.array([len(plain) for plain, buffered, record in records], dtype=np.int64)
+    #records shorter than the layout, the fields at the end get the value of the available bytes (as in procdata)
+    short = np.nonzero(lengths < decoder.recordlength)[0]
+
+    columns = {}
+    for field in decoder.fields:
+        name, kind, offset, length, reader, keydivide, logpos = field
+        if fields is not None and name not in fields:
+            continue
+        if kind in (NUM, NUMX) and reader is READERS.get((length, kind == NUMX)):
+            dtype = np.dtype((">i" if kind == NUMX else ">u") + str(length))
+            column = np.ndarray(shape=(nrec,), dtype=dtype, buffer=buf, offset=offset, strides=(width,))
+            #native integers (unsigned 8 byte values do not fit in int64)
+            column = column.astype(np.uint64 if dtype == np.dtype(">u8") else np.int64)
+            for i in short:
+                column[i] = records[i][2][name]
+        else:
+            #text, log and non standard fields, per record
+            values = [record[name] for plain, buffered, record in records]
+            column = np.array(values) if kind in (NUM, NUMX) else np.array(values, dtype=object)
+        if divide and keydivide != 1 and kind in (NUM, NUMX):
+            column = column / keydivide
+        columns[name] = column
+
+    columns["device"] = device_column(decoder, columns, nrec)
+    columns["time"] = time_column(rows, lengths, decoder.dateoffset)
+    columns["buffered"] = np.array([buffered for plain, buffered, record in records], dtype=bool)
+    return columns
+
+
+def device_column(decoder, columns, nrec):
+    # device as used by procdata: device from layout, pvserial, or datalogserial for smart meter records
+    if decoder.device is not None:
+        return np.full(nrec, decoder.device, dtype=object)
+    for name in ("pvserial", "datalogserial"):
+        if name in columns:
+            return columns[name]
+    return np.full(nrec, None, dtype=object)
+
+
+def time_column(rows, lengths, dateoffset):
+    # record date/time (6 bytes: year, month, day, hour, minute, second at hex position dateoffset) as
+    # datetime64, NaT if invalid or not in the record (as grotttime.record_time)
+    nrec = rows.shape[0]
+    start = dateoffset // 2
+    if dateoffset <= 0 or start + 6 + dateoffset % 2 > rows.shape[1]:
+        return np.full(nrec, np.datetime64("NaT"), dtype="datetime64[s]")
+    date = rows[:, start:start + 7 if dateoffset % 2 else start + 6].astype(np.int64)
+    if dateoffset % 2:
+        #half byte position: every value is the low half of a byte and the high half of the next byte
+        date = ((date[:, :-1] & 0x0f) << 4) | (date[:, 1:] >> 4)
+    year, month, day, hour, minute, second = (date[:, i] for i in range(6))
+    valid = (lengths >= start + 6 + dateoffset % 2) & (year <= 99)
+    valid &= (month >= 1) & (month <= 12) & (day >= 1) & (hour < 24) & (minute < 60) & (second < 60)
+    months = np.where(valid, year + 2000 - 1970, 0) * 12 + np.where(valid, month - 1, 0)
+    monthstart = months.astype("datetime64[M]").astype("datetime64[D]")
+    days = monthstart + np.where(valid, day - 1, 0).astype("timedelta64[D]")
+    #day must be in the month
+    valid &= days < (months + 1).astype("datetime64[M]").astype("datetime64[D]")
+    times = days.astype("datetime64[s]") + (hour * 3600 + minute * 60 + second).astype("timedelta64[s]")
+    times[~valid] = np.datetime64("NaT")
+    return times
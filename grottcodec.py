@@ -0,0 +1,35 @@
+# grottcodec.py Growatt record (de)scrambling
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# Growatt protocol 05 and 06 records are scrambled by XOR-ing every byte after the 8 byte header with the
+# repeating mask "Growatt". The same operation scrambles and descrambles a record. The mask is repeated
+# once up front and the XOR is done on the whole payload at once (as one big integer), which is linear
+# in the record length.
+
+MASK = b"Growatt"
+HEADERLEN = 8
+
+# repeated mask, extended when a longer record is seen
+_mask = MASK * 1024
+
+
+def _repeated_mask(length):
+    global _mask
+    if length > len(_mask):
+        _mask = MASK * (length // len(MASK) + 1)
+    return _mask[:length]
+
+
+def descramble(data):
+    # descramble a record (header is not scrambled), returns bytes
+    data = bytes(data)
+    npayload = len(data) - HEADERLEN
+    if npayload <= 0:
+        return data
+    payload = int.from_bytes(data[HEADERLEN:], "big") ^ int.from_bytes(_repeated_mask(npayload), "big")
+    return data[:HEADERLEN] + payload.to_bytes(npayload, "big")
+
+
+# scrambling is the same XOR operation
+scramble = descramble
@@ -3,10 +3,16 @@
 # Updated: 2024-07-22 
 # Version 2.8.3
 
-import configparser, sys, argparse, os, json, io
+import configparser, sys, argparse, os, json, io, hashlib, threading
 import ipaddress
 from os import walk
 from grottdata import format_multi_line, str2bool
+from grottlayout import LazyLayouts
+
+# lock for loading the record layouts on first use 
+_layoutlock = threading.Lock()
+# lock for determining the fields to decode on first use 
+_fieldslock = threading.Lock()
 
 class Conf : 
 
@@ -34,6 +40,11 @@ class Conf :
         self.grottip = "default"                                                                    #connect to server IP adress     
         self.outfile ="sys.stdout"  
         self.tmzone = "local"                                                                       #set timezone (at this moment only used for influxdb)                
+        self.layoutfile = "grottlayouts.cache"                                                      #record layout cache file (empty = no cache)
+        self.highwater = 262144                                                                     #proxy: bytes waiting for a destination before reading from the source is paused
+        self.lowwater = 65536                                                                       #proxy: reading is resumed when less bytes are waiting
+        self.connecttimeout = 10                                                                    #proxy: max seconds for a connect to the Growatt server
+        self.dnsttl = 300                                                                           #seconds a DNS lookup of the Growatt server is used (0 = no cache)
 
         #Growatt server default 
         #self.growattip = "47.91.67.66"
@@ -41,6 +52,7 @@ class Conf :
         self.growattport = 5279
         self.growattip2 = ""
         self.growattport2 = 5279
+        self.mirrorqueue = 1000                                                                     #max records waiting for the second server (oldest dropped)
 
         #MQTT default
         self.mqttip = "localhost"
@@ -54,11 +66,20 @@ class Conf :
         self.mqttuser = "grott"
         self.mqttpsw = "growatt2020"
         self.mqttretain = False
+        self.mqttfields = None                                                                      #fields sent to MQTT (None = all)
+        self.mqttqueue = 1000                                                                       #max messages queued when MQTT is not connected
+        self.mqttbatch = 50                                                                         #max messages published per batch
+        self.mqttcoalesce = 100                                                                     #queue depth to start coalescing (latest message per device, 0 = never)
+        self.mqttqos = 0                                                                            #qos used for publish (1 = pipelined with inflight window)
+        self.mqttinflight = 20                                                                      #max unacknowledged qos 1 messages
 
         #pvoutput default 
         self.pvoutput = False
         self.pvinverters = 1
         self.pvurl = "https://pvoutput.org/service/r2/addstatus.jsp"
+        self.pvbatchurl = "https://pvoutput.org/service/r2/addbatchstatus.jsp"
+        self.pvtimeout = 5                                                                          #connect timeout in seconds (read timeout is 3 times longer)
+        self.pvqueue = 1000                                                                         #max statuses queued per systemid
         self.pvapikey = "yourapikey"
         self.pvsystemid = {}
         self.pvinverterid = {}
@@ -67,6 +88,8 @@ class Conf :
         self.pvdisv1 = False
         self.pvtemp = False
         self.pvuplimit = 5
+        #fields used for PVOutput (inverter and smart meter)
+        self.pvfields = {"pvserial", "pvenergytoday", "pvpowerout", "pvgridvoltage", "pvtemperature", "pos_act_energy", "pos_rev_act_power", "voltage_l1"}
         
         #influxdb default 
         self.influx = False
@@ -79,13 +102,37 @@ class Conf :
         self.iftoken  = "influx_token"
         self.iforg  = "grottorg"
         self.ifbucket = "grottdb" 
+        self.iffields = None                                                                        #fields written to influx (None = all)
+        self.ifschema = "device"                                                                    #device: measurement per device, family: measurement inverter / meter with device tags
+        self.ifbatch = 100                                                                          #max lines per influx write
+        self.ifflush = 5.0                                                                          #max seconds before waiting lines are written
+        self.ifbuffer = 10000                                                                       #max lines kept when influx is not available
 
         #extension 
         self.extension = False
         self.extname = "grottext"
         #self.extvar = {"ip": "localhost", "port":8000}  
         self.extvar = {"none": "none"}  
+        self.extfields = None                                                                       #fields sent to extensions (None = all, or declared in extension as grottext_fields)
+        self.extqueue = 100                                                                         #max waiting records per extension (oldest dropped)
         
+        #outbox (durable delivery to MQTT, InfluxDB, PVOutput) 
+        self.outbox = False
+        self.outboxdir = "outbox"                                                                   #directory of the outbox files (a subdirectory per sink)
+        self.outboxsize = 50                                                                        #max outbox size per sink in MB (oldest messages dropped)
+        self.outboxsegment = 1024                                                                   #segment file size in KB
+        self.outboxfsync = 1.0                                                                      #max seconds between syncs to disk
+        self.outboxrate = 20                                                                        #max deliveries per second per sink (0 = unlimited)
+
+        #sink supervisor 
+        self.sinkdeadline = 10                                                                      #max seconds for a sink call (influx, pvoutput, outbox delivery, extension)
+        self.sinkfailures = 3                                                                       #failures in a row before the circuit breaker opens
+        self.sinkprobe = 30                                                                         #seconds before an open circuit is probed again
+
+        #pipeline (records decoded and sent to the sinks by worker threads) 
+        self.pipeworkers = 2                                                                        #worker threads (0 = process records in the network loop)
+        self.pipequeue = 1000                                                                       #max waiting records per worker (oldest dropped)
+
         print("Grott Growatt logging monitor : " + self.verrel)    
 
         #Set parm's 
@@ -111,12 +158,14 @@ class Conf :
         if not self.mqttauth: self.pubauth = None
         else: self.pubauth = dict(username=self.mqttuser, password=self.mqttpsw)
         
-        #define recordlayouts 
-        self.set_reclayouts()
+        #recordlayouts are loaded on first use (see __getattr__) 
 
         #define record whitlist (if blocking / filtering enabled 
         self.set_recwl()
 
+        #fields needed by the sinks and the decoders used by procdata are determined on first use (see __getattr__), 
+        #grott.py does this at startup. Creating a Conf does not load the extensions (e.g. grott_mqtt_control.py) 
+
         #prepare influxDB
         if self.influx :  
             if self.ifip == "localhost" : self.ifip = '0.0.0.0'
@@ -194,6 +243,20 @@ class Conf :
                     self.influx = False                       # no influx processing any more till restart (and errors repared)
                     raise SystemExit("Grott Influxdb initialisation error") 
             
+    def __getattr__(self, name):
+        #record layouts are only loaded when needed (not needed by e.g. grott_mqtt_control.py) 
+        if name == "recorddict":
+            #first use can be on several pipeline workers at the same time, the layouts are loaded once 
+            with _layoutlock:
+                if "recorddict" not in self.__dict__ : self.set_reclayouts()
+            return self.recorddict
+        #fields to decode and decoders, the extensions are loaded for the fields they need 
+        if name in ("decodefields", "decoders", "layoutcache"):
+            with _fieldslock:
+                if "decoders" not in self.__dict__ : self.set_decodefields()
+            return getattr(self, name)
+        raise AttributeError(name)
+
     def print(self): 
         print("\nGrott settings:\n")
         print("_Generic:")
@@ -212,12 +275,17 @@ class Conf :
         print("\ttime:                \t",self.gtime)
         print("\tsendbuf:             \t",self.sendbuf)
         print("\ttimezone:            \t",self.tmzone)
+        print("\tlayoutfile:          \t",self.layoutfile)
         print("\tvalueoffset:         \t",self.valueoffset)
         print("\toffset:              \t",self.offset)
         print("\tinverterid:          \t",self.inverterid)
         print("\tmode:                \t",self.mode)
         print("\tgrottip              \t",self.grottip)
         print("\tgrottport            \t",self.grottport)
+        print("\thighwater            \t",self.highwater)
+        print("\tlowwater             \t",self.lowwater)
+        print("\tconnecttimeout       \t",self.connecttimeout)
+        print("\tdnsttl               \t",self.dnsttl)
         #print("\tSN           \t",self.SN)
         print("_MQTT:")
         print("\tnomqtt               \t",self.nomqtt)
@@ -230,6 +298,12 @@ class Conf :
         print("\tmqtttretain:         \t",self.mqttretain)
         print("\tmqtttauth:           \t",self.mqttauth)
         print("\tmqttuser:            \t",self.mqttuser)
+        print("\tmqttfields:          \t",self.mqttfields)
+        print("\tmqttqueue:           \t",self.mqttqueue)
+        print("\tmqttbatch:           \t",self.mqttbatch)
+        print("\tmqttcoalesce:        \t",self.mqttcoalesce)
+        print("\tmqttqos:             \t",self.mqttqos)
+        print("\tmqttinflight:        \t",self.mqttinflight)
         print("\tmqttpsw:             \t","**secret**")                       #scramble output if tested!
         #print("\tmqttpsw:     \t",self.mqttpsw)                       #scramble output if tested!
         print("_Growatt server:")
@@ -237,11 +311,15 @@ class Conf :
         print("\tgrowattport:         \t",self.growattport)
         print("\tgrowattip2:           \t",self.growattip2)
         print("\tgrowattport2:         \t",self.growattport2)
+        print("\tmirrorqueue:          \t",self.mirrorqueue)
         print("_PVOutput:")
         print("\tpvoutput:            \t",self.pvoutput)
         print("\tpvdisv1:             \t",self.pvdisv1)
         print("\tpvtemp:              \t",self.pvtemp)   
         print("\tpvurl:               \t",self.pvurl)
+        print("\tpvbatchurl:          \t",self.pvbatchurl)
+        print("\tpvtimeout:           \t",self.pvtimeout)
+        print("\tpvqueue:             \t",self.pvqueue)
         print("\tpvapikey:            \t",self.pvapikey)                
         print("\tpvinverters:         \t",self.pvinverters)
         if self.pvinverters == 1 :
@@ -260,6 +338,11 @@ class Conf :
         #print("\tpassword:    \t",self.ifpsw)
         print("\torganization:       \t",self.iforg ) 
         print("\tbucket:             \t",self.ifbucket) 
+        print("\tfields:             \t",self.iffields) 
+        print("\tschema:             \t",self.ifschema) 
+        print("\tbatch:              \t",self.ifbatch) 
+        print("\tflush:              \t",self.ifflush) 
+        print("\tbuffer:             \t",self.ifbuffer) 
         print("\ttoken:              \t","**secret**")
         #print("\ttoken:       \t",self.iftoken)  
         
@@ -267,6 +350,25 @@ class Conf :
         print("\textension:          \t",self.extension) 
         print("\textname:            \t",self.extname)  
         print("\textvar:             \t",self.extvar) 
+        print("\textfields:          \t",self.extfields) 
+        print("\textqueue:           \t",self.extqueue) 
+
+        print("_Supervisor:")
+        print("\tdeadline:           \t",self.sinkdeadline) 
+        print("\tfailures:           \t",self.sinkfailures) 
+        print("\tprobe:              \t",self.sinkprobe) 
+
+        print("_Pipeline:")
+        print("\tworkers:            \t",self.pipeworkers) 
+        print("\tqueue:              \t",self.pipequeue) 
+
+        print("_Outbox:")
+        print("\toutbox:             \t",self.outbox) 
+        print("\tdirectory:          \t",self.outboxdir) 
+        print("\tsize:               \t",self.outboxsize) 
+        print("\tsegment:            \t",self.outboxsegment) 
+        print("\tfsync:              \t",self.outboxfsync) 
+        print("\trate:               \t",self.outboxrate) 
          
         print()
 
@@ -278,7 +380,7 @@ class Conf :
         parser.add_argument('--version', action='version', version=self.verrel)
         parser.add_argument('-c',help="set config file if not specified config file is grott.ini",metavar="[config file]")
         parser.add_argument('-o',help="set output file, if not specified output is stdout",metavar="[output file]")
-        parser.add_argument('-m',help="set mode (sniff or proxy), if not specified mode is sniff",metavar="[mode]")
+        parser.add_argument('-m',help="set mode (sniff, proxy or asyncproxy), if not specified mode is sniff",metavar="[mode]")
         parser.add_argument('-i',help="set inverterid, if not specified inverterid of .ini file is used",metavar="[inverterid]")
         parser.add_argument('-nm','--nomqtt',help="disable mqtt send",action='store_true')
         parser.add_argument('-t','--trace',help="enable trace, use in addition to verbose option (only available in sniff mode)",action='store_true')
@@ -303,6 +405,8 @@ class Conf :
             #print("mode: ",args.m)
             if (args.m == "proxy") : 
                 self.amode = "proxy"
+            elif (args.m == "asyncproxy") : 
+                self.amode = "asyncproxy"
             else :
                 self.amode = "sniff"                                        # default
         if (args.i != None and args.i != "none") :                          # added none for docker support 
@@ -357,6 +461,7 @@ class Conf :
         self.influx = str2bool(self.influx)
         self.influx2 = str2bool(self.influx2)
         self.extension = str2bool(self.extension)
+        self.outbox = str2bool(self.outbox)
                
     def procconf(self): 
         print("\nGrott process configuration file")
@@ -375,14 +480,20 @@ class Conf :
         if config.has_option("Generic","time"): self.gtime = config.get("Generic","time")
         if config.has_option("Generic","sendbuf"): self.sendbuf = config.get("Generic","sendbuf")
         if config.has_option("Generic","timezone"): self.tmzone = config.get("Generic","timezone")
+        if config.has_option("Generic","layoutfile"): self.layoutfile = config.get("Generic","layoutfile")
         if config.has_option("Generic","mode"): self.mode = config.get("Generic","mode")
         if config.has_option("Generic","ip"): self.grottip = config.get("Generic","ip")
         if config.has_option("Generic","port"): self.grottport = config.getint("Generic","port")
+        if config.has_option("Generic","highwater"): self.highwater = config.getint("Generic","highwater")
+        if config.has_option("Generic","lowwater"): self.lowwater = config.getint("Generic","lowwater")
+        if config.has_option("Generic","connecttimeout"): self.connecttimeout = config.getfloat("Generic","connecttimeout")
+        if config.has_option("Generic","dnsttl"): self.dnsttl = config.getint("Generic","dnsttl")
         if config.has_option("Generic","valueoffset"): self.valueoffset = config.get("Generic","valueoffset")
         if config.has_option("Growatt","ip"): self.growattip = config.get("Growatt","ip") 
         if config.has_option("Growatt","port"): self.growattport = config.getint("Growatt","port")
         if config.has_option("Growatt2","ip"): self.growattip2 = config.get("Growatt2","ip") 
         if config.has_option("Growatt2","port"): self.growattport2 = config.getint("Growatt2","port")
+        if config.has_option("Growatt2","queue"): self.mirrorqueue = config.getint("Growatt2","queue")
         if config.has_option("MQTT","nomqtt"): self.nomqtt = config.get("MQTT","nomqtt")
         if config.has_option("MQTT","ip"): self.mqttip = config.get("MQTT","ip")
         if config.has_option("MQTT","port"): self.mqttport = config.getint("MQTT","port")
@@ -394,12 +505,20 @@ class Conf :
         if config.has_option("MQTT","auth"): self.mqttauth = config.getboolean("MQTT","auth")
         if config.has_option("MQTT","user"): self.mqttuser = config.get("MQTT","user")
         if config.has_option("MQTT","password"): self.mqttpsw = config.get("MQTT","password")
+        if config.has_option("MQTT","fields"): self.mqttfields = self.fieldlist(config.get("MQTT","fields"))
+        if config.has_option("MQTT","queue"): self.mqttqueue = config.getint("MQTT","queue")
+        if config.has_option("MQTT","batch"): self.mqttbatch = config.getint("MQTT","batch")
+        if config.has_option("MQTT","coalesce"): self.mqttcoalesce = config.getint("MQTT","coalesce")
+        if config.has_option("MQTT","qos"): self.mqttqos = config.getint("MQTT","qos")
+        if config.has_option("MQTT","inflight"): self.mqttinflight = config.getint("MQTT","inflight")
         if config.has_option("PVOutput","pvoutput"): self.pvoutput = config.get("PVOutput","pvoutput")
         if config.has_option("PVOutput","pvtemp"): self.pvtemp = config.get("PVOutput","pvtemp")
         if config.has_option("PVOutput","pvdisv1"): self.pvdisv1 = config.get("PVOutput","pvdisv1")
         if config.has_option("PVOutput","pvinverters"): self.pvinverters = config.getint("PVOutput","pvinverters")
         if config.has_option("PVOutput","apikey"): self.pvapikey = config.get("PVOutput","apikey")
         if config.has_option("PVOutput", "pvuplimit"): self.pvuplimit = config.getint("PVOutput", "pvuplimit")
+        if config.has_option("PVOutput", "timeout"): self.pvtimeout = config.getfloat("PVOutput", "timeout")
+        if config.has_option("PVOutput", "queue"): self.pvqueue = config.getint("PVOutput", "queue")
         # if more inverter are installed at the same interface (shinelink) get systemids
         #if self.pvinverters > 1 : 
         for x in range(self.pvinverters+1) : 
@@ -418,10 +537,31 @@ class Conf :
         if config.has_option("influx","org"): self.iforg = config.get("influx","org")
         if config.has_option("influx","bucket"): self.ifbucket = config.get("influx","bucket")
         if config.has_option("influx","token"): self.iftoken = config.get("influx","token")
+        if config.has_option("influx","fields"): self.iffields = self.fieldlist(config.get("influx","fields"))
+        if config.has_option("influx","schema"): self.ifschema = config.get("influx","schema")
+        if config.has_option("influx","batch"): self.ifbatch = config.getint("influx","batch")
+        if config.has_option("influx","flush"): self.ifflush = config.getfloat("influx","flush")
+        if config.has_option("influx","buffer"): self.ifbuffer = config.getint("influx","buffer")
         #extensionINFLUX
         if config.has_option("extension","extension"): self.extension = config.get("extension","extension") 
         if config.has_option("extension","extname"): self.extname = config.get("extension","extname") 
         if config.has_option("extension","extvar"): self.extvar = eval(config.get("extension","extvar"))
+        if config.has_option("extension","fields"): self.extfields = self.fieldlist(config.get("extension","fields"))
+        if config.has_option("extension","queue"): self.extqueue = config.getint("extension","queue")
+        #supervisor
+        if config.has_option("supervisor","deadline"): self.sinkdeadline = config.getfloat("supervisor","deadline") 
+        if config.has_option("supervisor","failures"): self.sinkfailures = config.getint("supervisor","failures") 
+        if config.has_option("supervisor","probe"): self.sinkprobe = config.getfloat("supervisor","probe") 
+        #pipeline
+        if config.has_option("pipeline","workers"): self.pipeworkers = config.getint("pipeline","workers") 
+        if config.has_option("pipeline","queue"): self.pipequeue = config.getint("pipeline","queue") 
+        #outbox
+        if config.has_option("outbox","outbox"): self.outbox = config.get("outbox","outbox") 
+        if config.has_option("outbox","directory"): self.outboxdir = config.get("outbox","directory") 
+        if config.has_option("outbox","size"): self.outboxsize = config.getint("outbox","size") 
+        if config.has_option("outbox","segment"): self.outboxsegment = config.getint("outbox","segment") 
+        if config.has_option("outbox","fsync"): self.outboxfsync = config.getfloat("outbox","fsync") 
+        if config.has_option("outbox","rate"): self.outboxrate = config.getfloat("outbox","rate") 
 
     def getenv(self, envvar):
         envval = os.getenv(envvar)
@@ -431,7 +571,7 @@ class Conf :
 
     def procenv(self): 
         print("\nGrott process environmental variables")
-        if os.getenv('gmode') in ("sniff", "proxy") :  self.mode = self.getenv('gmode')
+        if os.getenv('gmode') in ("sniff", "proxy", "asyncproxy") :  self.mode = self.getenv('gmode')
         if os.getenv('gverbose') != None :  self.verbose = self.getenv('gverbose')
         if os.getenv('gminrecl') != None : 
             if 0 <= int(os.getenv('gminrecl')) <= 255  :     self.minrecl = self.getenv('gminrecl')
@@ -444,6 +584,7 @@ class Conf :
         if os.getenv('gnoipf') != None : self.noipf = self.getenv('gnoipf')
         if os.getenv('gtime') in ("auto", "server") : self.gtime = self.getenv('gtime')
         if os.getenv('gtimezone') != None : self.tmzone = self.getenv('gtimezone')
+        if os.getenv('glayoutfile') != None : self.layoutfile = self.getenv('glayoutfile')
         if os.getenv('gsendbuf') != None : self.sendbuf = self.getenv('gsendbuf')
         if os.getenv('ginverterid') != None :  self.inverterid = self.getenv('ginverterid')
         if os.getenv('ggrottip') != None : 
@@ -454,6 +595,10 @@ class Conf :
                 if self.verbose : print("\nGrott IP address env invalid")
         if os.getenv('ggrottport') != None : 
             if 0 <= int(os.getenv('ggrottport')) <= 65535  :  self.grottport = self.getenv('ggrottport')
+        if os.getenv('ghighwater') != None :  self.highwater = int(self.getenv('ghighwater'))
+        if os.getenv('glowwater') != None :  self.lowwater = int(self.getenv('glowwater'))
+        if os.getenv('gconnecttimeout') != None :  self.connecttimeout = float(self.getenv('gconnecttimeout'))
+        if os.getenv('gdnsttl') != None :  self.dnsttl = int(self.getenv('gdnsttl'))
         if os.getenv('gvalueoffset') != None :     
             if 0 <= int(os.getenv('gvalueoffset')) <= 255  :  self.valueoffset = self.getenv('gvalueoffset')
         if os.getenv('ggrowattip') != None :    
@@ -466,6 +611,7 @@ class Conf :
             if 0 <= int(os.getenv('ggrowattport')) <= 65535  :  self.growattport = int(self.getenv('ggrowattport'))
             else : 
                if self.verbose : print("\nGrott Growatt server Port address env invalid")   
+        if os.getenv('gmirrorqueue') != None :  self.mirrorqueue = int(self.getenv('gmirrorqueue'))
         #handle mqtt environmentals    
         if os.getenv('gnomqtt') != None :  self.nomqtt = self.getenv('gnomqtt')
         if os.getenv('gmqttip') != None :    
@@ -487,6 +633,12 @@ class Conf :
         if os.getenv('gmqttauth') != None :  self.mqttauth = self.getenv('gmqttauth')
         if os.getenv('gmqttuser') != None :  self.mqttuser = self.getenv('gmqttuser')
         if os.getenv('gmqttpassword') != None : self.mqttpsw = self.getenv('gmqttpassword')
+        if os.getenv('gmqttfields') != None : self.mqttfields = self.fieldlist(self.getenv('gmqttfields'))
+        if os.getenv('gmqttqueue') != None : self.mqttqueue = int(self.getenv('gmqttqueue'))
+        if os.getenv('gmqttbatch') != None : self.mqttbatch = int(self.getenv('gmqttbatch'))
+        if os.getenv('gmqttcoalesce') != None : self.mqttcoalesce = int(self.getenv('gmqttcoalesce'))
+        if os.getenv('gmqttqos') in ("0", "1") : self.mqttqos = int(self.getenv('gmqttqos'))
+        if os.getenv('gmqttinflight') != None : self.mqttinflight = int(self.getenv('gmqttinflight'))
         #Handle PVOutput variables
         if os.getenv('gpvoutput') != None :  self.pvoutput = self.getenv('gpvoutput')
         if os.getenv('gpvtemp') != None :  self.pvtemp = self.getenv('gpvtemp')
@@ -499,6 +651,8 @@ class Conf :
         if self.pvinverters == 1 : 
             if os.getenv('gpvsystemid') != None :  self.pvsystemid[1] = self.getenv('gpvsystemid')
         if os.getenv('pvuplimit') != None :  self.pvuplimit = int(self.getenv('pvuplimit'))
+        if os.getenv('gpvtimeout') != None :  self.pvtimeout = float(self.getenv('gpvtimeout'))
+        if os.getenv('gpvqueue') != None :  self.pvqueue = int(self.getenv('gpvqueue'))
         #Handle Influx
         if os.getenv('ginflux') != None :  self.influx = self.getenv('ginflux')
         if os.getenv('ginflux2') != None :  self.influx2 = self.getenv('ginflux2')
@@ -518,11 +672,62 @@ class Conf :
         if os.getenv('giforg') != None :  self.iforg = self.getenv('giforg')
         if os.getenv('gifbucket') != None :  self.ifbucket = self.getenv('gifbucket')
         if os.getenv('giftoken') != None :  self.iftoken = self.getenv('giftoken')
+        if os.getenv('giffields') != None :  self.iffields = self.fieldlist(self.getenv('giffields'))
+        if os.getenv('gifschema') in ("device", "family") :  self.ifschema = self.getenv('gifschema')
+        if os.getenv('gifbatch') != None :  self.ifbatch = int(self.getenv('gifbatch'))
+        if os.getenv('gifflush') != None :  self.ifflush = float(self.getenv('gifflush'))
+        if os.getenv('gifbuffer') != None :  self.ifbuffer = int(self.getenv('gifbuffer'))
         #Handle Extension
         if os.getenv('gextension') != None :  self.extension = self.getenv('gextension')
         if os.getenv('gextname') != None :  self.extname = self.getenv('gextname')
         if os.getenv('gextvar') != None :  self.extvar = eval(self.getenv('gextvar'))
+        if os.getenv('gextfields') != None :  self.extfields = self.fieldlist(self.getenv('gextfields'))
+        if os.getenv('gextqueue') != None :  self.extqueue = int(self.getenv('gextqueue'))
+        #Handle Supervisor
+        if os.getenv('gsinkdeadline') != None :  self.sinkdeadline = float(self.getenv('gsinkdeadline'))
+        if os.getenv('gsinkfailures') != None :  self.sinkfailures = int(self.getenv('gsinkfailures'))
+        if os.getenv('gsinkprobe') != None :  self.sinkprobe = float(self.getenv('gsinkprobe'))
+        #Handle Pipeline
+        if os.getenv('gpipeworkers') != None :  self.pipeworkers = int(self.getenv('gpipeworkers'))
+        if os.getenv('gpipequeue') != None :  self.pipequeue = int(self.getenv('gpipequeue'))
+        #Handle Outbox
+        if os.getenv('goutbox') != None :  self.outbox = self.getenv('goutbox')
+        if os.getenv('goutboxdir') != None :  self.outboxdir = self.getenv('goutboxdir')
+        if os.getenv('goutboxsize') != None :  self.outboxsize = int(self.getenv('goutboxsize'))
+        if os.getenv('goutboxsegment') != None :  self.outboxsegment = int(self.getenv('goutboxsegment'))
+        if os.getenv('goutboxfsync') != None :  self.outboxfsync = float(self.getenv('goutboxfsync'))
+        if os.getenv('goutboxrate') != None :  self.outboxrate = float(self.getenv('goutboxrate'))
         
+    def fieldlist(self, fields):
+        #comma separated list of field names, "all" or empty means all fields
+        fields = {field.strip() for field in fields.split(",") if field.strip()}
+        if not fields or "all" in fields : return None
+        return fields
+
+    def set_decodefields(self):
+        #fields needed by the enabled sinks. Only the union of these fields is decoded (None = all fields) 
+        #can be called again if the field selection of a sink is changed in code. 
+        sinkfields = []
+        if not self.nomqtt : sinkfields.append(self.mqttfields)
+        if self.influx : sinkfields.append(self.iffields)
+        if self.pvoutput : sinkfields.append(self.pvfields)
+        if self.extension : 
+            #extensions are loaded once, an extension can declare the fields it needs 
+            from grottextension import extensions
+            sinkfields.extend(extension.fields for extension in extensions(self))
+
+        if None in sinkfields:
+            self.decodefields = None
+        else:
+            #fields always needed for processing (device id and smart meter record check) 
+            self.decodefields = {"pvserial", "datalogserial", "voltage_l1"}.union(*sinkfields)
+        if self.verbose : print("\nGrott fields decoded : ", "all" if self.decodefields is None else sorted(self.decodefields))
+
+        #layouts are compiled on first use 
+        self.decoders = LazyLayouts(lambda: self.recorddict, self.includeall, self.decodefields)
+        #resolved record layouts (see grottdata.resolve_layout), cleared when layouts are compiled again 
+        self.layoutcache = {}
+
     def set_recwl(self):    
         #define record that will not be blocked or inspected if blockcmd is specified
         self.recwl = {"0103",                                    #announce record
@@ -566,7 +771,81 @@ class Conf :
 
     def set_reclayouts(self):    
         #define record layout to be used based on byte 4,6,7 of the header T+byte4+byte6+byte7     
-        self.recorddict = {} 
+        #built-in layouts and t*.json layout files, read from the layout cache file if it is still valid 
+        #the layouts are set when complete (a half built recorddict is never seen by other threads) 
+        files = self.layoutfiles()
+        signature = self.layoutsignature(files)
+        recorddict = self.readlayoutcache(signature)
+        if recorddict is None: 
+            recorddict = self.builtinlayouts()
+            print("\nGrott process json layout files")
+            for x in files:
+                print(x)
+                with open(x) as json_file: 
+                    dicttemp = json.load(json_file) 
+                    #print(dicttemp)
+                    recorddict.update(dicttemp)
+            self.writelayoutcache(signature, recorddict)
+        else:
+            if self.verbose: print("\nGrott layout records read from cache file:", self.layoutfile)
+        self.recorddict = recorddict
+
+        if self.verbose: print("\nGrott layout records loaded")
+        for key in self.recorddict :
+            if self.verbose : print(key, " : ")
+            if self.verbose : print(self.recorddict[key])  
+
+    def layoutfiles(self):
+        #t*.json layout files in the working directory 
+        f = []
+        for (dirpath, dirnames, filenames) in walk('.'):            
+            f.extend(filenames)
+            break   
+        return sorted(x for x in f if ((x[0] == 't' or x[0] == 'T') and x.find('.json') > 0))
+
+    def layoutsignature(self, files):
+        #signature of the layout definitions: name, size, mtime and hash of grottconf.py (built-in layouts) and the layout files 
+        sig = hashlib.sha1()
+        for x in [__file__] + files:
+            try:
+                st = os.stat(x)
+                with open(x, "rb") as f: 
+                    sig.update(repr((os.path.basename(x), st.st_size, st.st_mtime_ns)).encode())
+                    sig.update(hashlib.sha1(f.read()).digest())
+            except OSError:
+                sig.update(repr((x, None)).encode())
+        return sig.hexdigest()
+
+    def readlayoutcache(self, signature):
+        #read layouts from the cache file, None if there is no (valid) cache 
+        if not self.layoutfile : return None
+        try:
+            #json file (plain data, no code is executed when the cache is read) 
+            with open(self.layoutfile, "r") as f: 
+                cache = json.load(f)
+            if cache["signature"] == signature : return cache["recorddict"]
+            if self.verbose: print("\nGrott layout cache file outdated:", self.layoutfile)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            if self.verbose: print("\nGrott layout cache file can not be read:", self.layoutfile, e)
+        return None
+
+    def writelayoutcache(self, signature, recorddict):
+        #write layouts to the cache file (write to temporary file and replace, cache is never partly written) 
+        if not self.layoutfile : return 
+        try:
+            tmpfile = self.layoutfile + ".tmp"
+            with open(tmpfile, "w") as f: 
+                json.dump({"signature": signature, "recorddict": recorddict}, f)
+            os.replace(tmpfile, self.layoutfile)
+            if self.verbose: print("\nGrott layout cache file written:", self.layoutfile)
+        except Exception as e:
+            if self.verbose: print("\nGrott layout cache file can not be written:", self.layoutfile, e)
+
+    def builtinlayouts(self):    
+        #built-in record layouts 
+        recorddict = {} 
         
         self.recorddict1 = {"T02NNNN": {
             "decrypt"           : {"value" :"False"},
@@ -1579,37 +1858,20 @@ class Conf :
             "bms_commtype"       : {"value" : 1082,"length" : 2,"type" : "num","divide" : 1}
 	      } }
         
-        self.recorddict.update(self.recorddict1)
-        self.recorddict.update(self.recorddict2)
-        self.recorddict.update(self.recorddict3)
-        self.recorddict.update(self.recorddict4)
-        self.recorddict.update(self.recorddict5)       
-        self.recorddict.update(self.recorddict6)       
-        self.recorddict.update(self.recorddict7)  
-        self.recorddict.update(self.recorddict8) 
-        self.recorddict.update(self.recorddict9)  
-        self.recorddict.update(self.recorddict10)  
-        self.recorddict.update(self.recorddict11)
-        self.recorddict.update(self.recorddict12)                   #T05NNNNXSPH
-        self.recorddict.update(self.recorddict13)                   #T06NNNNXSPA
-        self.recorddict.update(self.recorddict14)                   #T06NNNNXMIN
+        recorddict.update(self.recorddict1)
+        recorddict.update(self.recorddict2)
+        recorddict.update(self.recorddict3)
+        recorddict.update(self.recorddict4)
+        recorddict.update(self.recorddict5)       
+        recorddict.update(self.recorddict6)       
+        recorddict.update(self.recorddict7)  
+        recorddict.update(self.recorddict8) 
+        recorddict.update(self.recorddict9)  
+        recorddict.update(self.recorddict10)  
+        recorddict.update(self.recorddict11)
+        recorddict.update(self.recorddict12)                   #T05NNNNXSPH
+        recorddict.update(self.recorddict13)                   #T06NNNNXSPA
+        recorddict.update(self.recorddict14)                   #T06NNNNXMIN
 
-        f = []
-        print("\nGrott process json layout files")
-        for (dirpath, dirnames, filenames) in walk('.'):            
-            f.extend(filenames)
-            break   
-        for x in f:
-            if ((x[0] == 't' or x[0] == 'T') and x.find('.json') > 0):   
-                print(x)
-                with open(x) as json_file: 
-                    dicttemp = json.load(json_file) 
-                    #print(dicttemp)
-                    self.recorddict.update(dicttemp)
-                
-                
-        if self.verbose: print("\nGrott layout records loaded")
-        for key in self.recorddict :
-            if self.verbose : print(key, " : ")
-            if self.verbose : print(self.recorddict[key])  
+        return recorddict
 
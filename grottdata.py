@@ -7,41 +7,85 @@ from datetime import datetime, timedelta
 from os import times_result
 #import pytz
 import time
+import threading
 import sys
 import struct
 import textwrap
-from itertools import cycle # to support "cycling" the iterator
 import json, codecs
 from typing import Dict
 # requests
 
 #import mqtt                       
-import paho.mqtt.publish as publish
+from grottmqtt import publisher
+from grottoutbox import outbox
+from grottsupervisor import supervisor
+from grottpvout import uploader as pvuploader, MAXBATCH
+from grottinflux import line as influxline, writer as influxwriter, write_lines
+from grottextension import extensions
+from functools import partial
+
+from grottcodec import descramble
+from grottframe import GrottFrame
+#str2bool moved to grottutil, still available from grottdata (used by grottconf) 
+from grottutil import str2bool
+from grotttime import GrottTime, record_time, pytz
 
 
 class GrottPvOutLimit:
+    # Upload limit per inverter: max one status per pvuplimit minutes of status (record) time. The limit is
+    # applied on the time of the status and not on the time it is received, so buffered records sent by the
+    # datalogger after an outage are uploaded (with addbatchstatus) and not refused.
+
+    # time slots kept per inverter (14 days of 5 minute slots, PVOutput accepts statuses up to 14 days old)
+    maxslots = 4032
 
     def __init__(self):
-        self.register: Dict[str, int] = {}
-
-    def ok_send(self, pvserial: str, conf) -> bool:
-        now = time.perf_counter()
-        ok = False
-        if self.register.get(pvserial):
-            ok = True if self.register.get(pvserial) + conf.pvuplimit * 60 < now else False
-            if ok:
-                self.register[pvserial] = int(now)
-            else:
+        self.register: Dict[str, set] = {}
+        self.lock = threading.Lock()
+
+    def ok_send(self, pvserial: str, conf, statustime: datetime) -> bool:
+        if conf.pvuplimit <= 0:
+            return True
+        slot = int((statustime - datetime(1970, 1, 1)).total_seconds()) // (conf.pvuplimit * 60)
+        with self.lock:
+            slots = self.register.setdefault(pvserial, set())
+            if slot in slots:
                 if conf.verbose: print(f'\t - PVOut: Update refused for {pvserial} due to time limitation')
-        else:
-            self.register.update({pvserial: int(now)})
-            ok = True
-        return ok
+                return False
+            if len(slots) >= self.maxslots:
+                slots.discard(min(slots))
+            slots.add(slot)
+        return True
 
 
 pvout_limit = GrottPvOutLimit()
 
 
+class GrottContext:
+    # Per record processing context. Values determined per record (layout, decrypt, buffered, time, values) are
+    # kept here so the configuration is not changed while processing (records can be processed concurrently).
+    # All other attributes are read from the configuration, so the context can be passed where conf is expected
+    # (e.g. extensions reading conf.layout or conf.extvar).
+
+    __slots__ = ("conf", "frame", "layout", "decoder", "decrypt", "buffered", "time", "jsondate", "timefromserver", "device", "values")
+
+    def __init__(self, conf, frame):
+        self.conf = conf
+        self.frame = frame
+        self.layout = None
+        self.decoder = None
+        self.decrypt = True
+        self.buffered = "nodetect"
+        self.time = None
+        self.jsondate = None
+        self.timefromserver = True
+        self.device = None
+        self.values = None
+
+    def __getattr__(self, name):
+        return getattr(self.conf, name)
+
+
 # Formats multi-line data
 def format_multi_line(prefix, string, size=80):
     size -= len(prefix)
@@ -51,100 +95,172 @@ def format_multi_line(prefix, string, size=80):
             size -= 1
     return '\n'.join([prefix + line for line in textwrap.wrap(string, size)])
 
-#decrypt data. 
+#decrypt data (kept for compatibility, returns a hex string). 
 def decrypt(decdata) :   
+    return descramble(decdata).hex()
+
+def selectvalues(values, fields):
+    #record values restricted to the fields selected for a sink (None = all fields). Only the selected fields 
+    #of a DecodedRecord are decoded, without selection all fields are decoded 
+    if fields is None : return dict(values)
+    return {key: values[key] for key in values if key in fields}
+
+def resolve_layout(conf, frame):
+    #determine record layout for a frame, returns layout name, compiled layout (None if no valid layout) and decrypt flag
+    header = frame.header
+    ndata = len(frame.data)
+    is_smart_meter = frame.command in ("20","1b")
+
+    layout = "T" + header[6:8] + header[12:14] + header[14:16]
+    #v270 add X for extended except for smart monitor records
+    if ((ndata > 375) and not is_smart_meter) :  layout = layout + "X"
+
+    #v270 no invtype added to layout for smart monitor records
+    if (conf.invtype != "default") and not is_smart_meter :
+            layout = layout + conf.invtype.upper()
+
+    if conf.verbose : print("\t - " + "layout   : ", layout)
+    if layout not in conf.decoders : 
+        #try generic if generic record exist
+        if conf.verbose : print("\t - " + "no matching record layout found, try generic")
+        if header[14:16] in ("04","50") :
+            layout = layout.replace(header[12:16], "NNNN")
+            if layout not in conf.decoders : 
+                #no valid record fall back on old processing? 
+                if conf.verbose : print("\t - " + "no matching record layout found, standard processing performed")
+                return("none", None, True)
+        else:         
+            return(layout, None, True)
+
+    #decrypt as defined in layout (default is decrypt) 
+    decrypt = conf.decoders[layout].decrypt
+
+    if (conf.invtype == "default") and (ndata > 50) and frame.protocol == "06" and not is_smart_meter and conf.invtypemap :
+        # Handle systems with mixed invtype, there is enough data for an inverter serial number (protocol 06 only)
+        plain = frame.descrambled if decrypt else frame.data
+        inverterType = "default"
+        inverterSerial = None
+        try:
+            inverterSerial = plain[38:48].decode('ASCII')
+            if conf.verbose:
+                print("\t - Possible Inverter serial", inverterSerial)
+        except UnicodeDecodeError:
+            # In case of problem (eg: new record type with different serial placement)
+            pass
 
-    ndecdata = len(decdata)
+        if inverterSerial:
+            # Lookup inverter type based on inverter serial
+            try:
+                inverterType = conf.invtypemap[inverterSerial]
+                print("\t - Matched inverter serial to inverter type", inverterType)
+            except:
+                inverterType = "default"
+                print("\t - Inverter serial not recognised - using inverter type", inverterType)
 
-    # Create mask and convert to hexadecimal
-    mask = "Growatt"
-    hex_mask = ['{:02x}'.format(ord(x)) for x in mask]    
-    nmask = len(hex_mask)
+        if (inverterType != "default") :
+            if layout + inverterType.upper() in conf.decoders : 
+                layout = layout + inverterType.upper()
+            else : 
+                print("\t - No record layout defined for inverter type", inverterType, ", layout used:", layout)
 
-    #start decrypt routine 
-    unscrambled = list(decdata[0:8])                                            #take unscramble header
-    
-    for i,j in zip(range(0,ndecdata-8),cycle(range(0,nmask))): 
-        unscrambled = unscrambled + [decdata[i+8] ^ int(hex_mask[j],16)]
-    
-    result_string = "".join("{:02x}".format(n) for n in unscrambled)
-    
-    print("\t - " + "Growatt data decrypted V2")   
-    return result_string        
+    return(layout, conf.decoders[layout], decrypt)
 
-def str2bool(defstr):
-    if defstr in ("True", "true", "TRUE", "y", "Y", "yes", "YES", 1, "1") : defret = True 
-    if defstr in ("False", "false", "FALSE", "n", "N", "no", "NO", 0, "0") : defret = False 
-    if 'defret' in locals():
-        return(defret)
-    else : return()
+def frame_layout(conf, frame):
+    # resolved layouts are cached per header, extended flag and (if inverter types are mapped) inverter serial
+    data = frame.data
+    ndata = len(data)
+    serialkey = None
+    if conf.invtype == "default" and conf.invtypemap and ndata > 50 and frame.protocol == "06" and frame.command not in ("20","1b") : serialkey = data[38:48]
+    layoutkey = (frame.protocol, frame.device, frame.command, ndata > 375, serialkey)
+    try: 
+        return conf.layoutcache[layoutkey]
+    except KeyError:
+        if len(conf.layoutcache) > 1024 : conf.layoutcache.clear()
+        resolved = conf.layoutcache[layoutkey] = resolve_layout(conf, frame)
+        return resolved
+
+def deliver(conf, sink, msg, send, batch=1):
+    #deliver a message to a sink (mqtt, pvoutput, influx): via the durable outbox or directly
+    #(with batch > 1 the outbox delivers lists of max batch messages) 
+    if conf.outbox : 
+        #deliveries from the outbox are supervised (deadline and circuit breaker) 
+        outbox(conf, sink, partial(supervisor(conf, sink).call, send, conf), batch).put(msg)
+        if conf.verbose: print("\t - " + "Grott message stored in outbox:", sink)
+        return
+    try:
+        send(conf, [msg] if batch > 1 else msg)
+    except Exception as e:
+        print("\t - " + "Grott " + sink + " send failed, message dropped:", str(e))
+
+def mqtt_queue(conf, msg):
+    #queue message for the MQTT connection
+    topic, payload, retain, key = msg
+    publisher(conf).publish(topic, payload, retain=retain, key=tuple(key) if key is not None else None)
+
+def mqtt_send(conf, msg):
+    #outbox delivery: publish and wait for the broker acknowledgement (qos 0: until written to the connection),
+    #the message stays in the outbox if it is not published 
+    topic, payload, retain, key = msg
+    publisher(conf).publish_wait(topic, payload, retain=retain)
+
+def pvout_send(conf, msgs):
+    #outbox delivery: send statuses to PVOutput in batches, connection and server errors raise an exception (retried from the outbox)
+    pvuploader(conf).send_all(msgs)
+
+def pvout_queue(conf, pvssid, pvdata):
+    #send status to PVOutput: via the outbox or queued for the PVOutput uploader thread 
+    if conf.outbox : 
+        deliver(conf, "pvoutput", {"systemid": pvssid, "data": pvdata}, pvout_send, batch=MAXBATCH)
+    else :
+        pvuploader(conf).put(pvssid, pvdata)
+        if conf.verbose : print("\t - " + "Grott PVOutput status queued for systemid: ", pvssid)
+
+def influx_send(conf, iflines):
+    #write line protocol lines to influxdb, errors raise an exception (retried from the outbox) 
+    write_lines(conf, iflines)
 
 def procdata(conf,data):    
+    #data is a GrottFrame (raw record bytes are still accepted) 
+    frame = data if isinstance(data, GrottFrame) else GrottFrame(data)
+    data = frame.data
+    #per record values are kept in the context, conf is not changed 
+    ctx = GrottContext(conf, frame)
+
     if conf.verbose: 
         print("\t - " + "Growatt original Data:") 
         print(format_multi_line("\t\t ", data))
 
-    header = "".join("{:02x}".format(n) for n in data[0:8])
+    header = frame.header
     ndata = len(data)
     buffered = "nodetect"                                               # set buffer detection to nodetect (for compat mode), wil in auto detection changed to no or yes        
     is_smart_meter = header[14:16] in ("20","1b")
 
     # automatic detect protocol (decryption and protocol) only if compat = False!
     novalidrec = False
+    decoder = None                                                      # no compiled layout in compat mode 
     if conf.compat is False : 
         if conf.verbose : 
             print("\t - " + "Grott automatic protocol detection")  
             print("\t - " + "Grott data record length", ndata)
-        #print(header)
-        layout = "T" + header[6:8] + header[12:14] + header[14:16]
-        #v270 add X for extended except for smart monitor records
-        if ((ndata > 375) and not is_smart_meter) :  layout = layout + "X"
-
-        #v270 no invtype added to layout for smart monitor records
-        if (conf.invtype != "default") and not is_smart_meter :
-                layout = layout + conf.invtype.upper()
 
         if header[14:16] == "50" : buffered = "yes"
         else: buffered = "no" 
 
-        if conf.verbose : print("\t - " + "layout   : ", layout)
-        try:            
-            # does record layout record exists? 
-            test = conf.recorddict[layout]
-        except:
-            #try generic if generic record exist
-            if conf.verbose : print("\t - " + "no matching record layout found, try generic")
-            if header[14:16] in ("04","50") :
-                layout = layout.replace(header[12:16], "NNNN")
-                try:
-                    # does generic record layout record exists? 
-                    test = conf.recorddict[layout]
-                except:
-                    #no valid record fall back on old processing? 
-                    if conf.verbose : print("\t - " + "no matching record layout found, standard processing performed")
-                    layout = "none"
-                    novalidrec = True  
-            else:         
-                novalidrec = True     
-    
-        conf.layout = layout
+        layout, decoder, ctx.decrypt = frame_layout(conf, frame)
+        novalidrec = decoder is None
+
+        ctx.layout = layout
+        ctx.decoder = decoder
         if conf.verbose : print("\t - " + "Record layout used : ", layout)
     
-    #Decrypt 
-    try: 
-        #see if decrypt keyword is defined
-        conf.decrypt =  str2bool(conf.recorddict[layout]["decrypt"]["value"])
-    except:   
-        #if decrypt not defined, default is decypt
-        conf.decrypt = True  
-    
-    if conf.decrypt: 
-        result_string = decrypt(data) 
+    if ctx.decrypt: 
+        plain = frame.descrambled 
         if conf.verbose : print("\t - " + "Grott Growatt data decrypted")        
     else: 
         #do not decrypt 
-        result_string = data.hex()
+        plain = data
         if conf.verbose: print("\t - " + "Grott Growatt unencrypted data used")                                      
+    result_string = plain.hex()
                                                         
     if conf.verbose: 
         print("\t - " + 'Growatt plain data:')
@@ -168,169 +284,58 @@ def procdata(conf,data):
 
     if conf.compat is False: 
         # new method if compat = False (automatic detection):  
-       
-        if (conf.invtype == "default") :
-            # Handle systems with mixed invtype
-            if (ndata > 50) and not is_smart_meter:
-                # There is enough data for an inverter serial number
-                inverterType = "default"
-
-                inverterSerial = None
-                try:
-                    inverterSerial = codecs.decode(result_string[76:96], "hex").decode('ASCII')
-                    if conf.verbose:
-                        print("\t - Possible Inverter serial", inverterSerial)
-                except UnicodeDecodeError:
-                    # In case of problem (eg: new record type with different serial placement)
-                    pass
-
-                if inverterSerial:
-                    # Lookup inverter type based on inverter serial
-                    try:
-                        inverterType = conf.invtypemap[inverterSerial]
-                        print("\t - Matched inverter serial to inverter type", inverterType)
-                    except:
-                        inverterType = "default"
-                        print("\t - Inverter serial not recognised - using inverter type", inverterType)
-
-                if (inverterType != "default") :
-                    layout = layout + inverterType.upper()
-                    # Update the conf.layout like done earlier
-                    conf.layout = layout
 
         if conf.verbose: 
            print("\t - " + 'Growatt new layout processing')
-           print("\t\t - " + "decrypt       : ",conf.decrypt)
+           print("\t\t - " + "decrypt       : ",ctx.decrypt)
            print("\t\t - " + "offset        : ", conf.offset)
            print("\t\t - " + "record layout : ", layout)
            print()
 
         
         
-        try:
-            #v270 try if logstart and log fields are defined, if yes prepare log fields 
-            logstart = conf.recorddict[layout]["logstart"]["value"] 
-            logdict = {}
-            logdict = bytes.fromhex(result_string[conf.recorddict[layout]["logstart"]["value"]:len(result_string)-4]).decode("ASCII").split(",")
-        except:
-            pass
-
-        #v270 log data record processing (SDM630 smart monitor with railog 
-        #if rectype == "data" : 
-        for keyword in  conf.recorddict[layout].keys() :
-            
-            if keyword not in ("decrypt","date","logstart","device") :  
-                #try if keyword should be included 
-                include=True
-                try:
-                    #try if key type is specified 
-                    if conf.recorddict[layout][keyword]["incl"] == "no" : 
-                        include=False
-                except: 
-                    #no include statement keyword should be process, set include to prevent except errors
-                    include = True
-                #process only keyword needs to be included (default):     
-                try: 
-                    if ((include) or (conf.includeall)): 
-                        try:
-                            #try if key type is specified  
-                            keytype = conf.recorddict[layout][keyword]["type"]           
-                        except: 
-                            #if not default is num
-                            keytype = "num"               
-                        if keytype == "text" :
-                            definedkey[keyword] = result_string[conf.recorddict[layout][keyword]["value"]:conf.recorddict[layout][keyword]["value"]+(conf.recorddict[layout][keyword]["length"]*2)]
-                            definedkey[keyword] = codecs.decode(definedkey[keyword], "hex").decode('utf-8')
-                            #print(definedkey[keyword])
-                        if keytype == "num" :
-                        #else:                    
-                            definedkey[keyword] = int(result_string[conf.recorddict[layout][keyword]["value"]:conf.recorddict[layout][keyword]["value"]+(conf.recorddict[layout][keyword]["length"]*2)],16)                                     
-                        if keytype == "numx" :
-                            #process signed integer 
-                            keybytes = bytes.fromhex(result_string[conf.recorddict[layout][keyword]["value"]:conf.recorddict[layout][keyword]["value"]+(conf.recorddict[layout][keyword]["length"]*2)])
-                            definedkey[keyword] = int.from_bytes(keybytes, byteorder='big', signed=True)
-                        if keytype == "log" :
-                            # Proces log fields
-                            definedkey[keyword] = logdict[conf.recorddict[layout][keyword]["pos"]-1]
-                        if keytype == "logpos" :
-                        #only display this field if positive    
-                            # Proces log fields
-                            if float(logdict[conf.recorddict[layout][keyword]["pos"]-1]) > 0 : 
-                                definedkey[keyword] = logdict[conf.recorddict[layout][keyword]["pos"]-1]
-                            else : definedkey[keyword] = 0
-                        if keytype == "logneg" :
-                        #only display this field if negative    
-                            # Proces log fields
-                            if float(logdict[conf.recorddict[layout][keyword]["pos"]-1]) < 0 : 
-                                definedkey[keyword] = logdict[conf.recorddict[layout][keyword]["pos"]-1]    
-                            else : definedkey[keyword] = 0
-                except: 
-                    if conf.verbose : print("\t - grottdata - error in keyword processing : ", keyword + " ,data processing stopped") 
-                    return(8) 
+        #decode record values with the compiled layout (numeric values are decoded on first use) 
+        try: 
+            definedkey = decoder.decode(plain)
+        except ValueError as e: 
+            if conf.verbose : print("\t - grottdata - error in keyword processing : ", str(e) + " ,data processing stopped") 
+            return(8) 
                                  
         # test if pvserial was defined, if not take inverterid from config.
         device_defined = False 
-        try:    
-            definedkey["device"] = conf.recorddict[layout]["device"]["value"]
+        if decoder.device is not None:    
+            definedkey["device"] = decoder.device
             device_defined = True
-        except:         
+        else:         
             # test if pvserial was defined, if not take inverterid from config.     
             try: 
                 test = definedkey["pvserial"]
             except: 
                 definedkey["pvserial"] = conf.inverterid
-                conf.recorddict[layout]["pvserial"] = {"value" : 0, "type" : "text"}
                 if conf.verbose : print("\t - pvserial not found and device not specified used configuration defined invertid:", definedkey["pvserial"] ) 
      
         # test if dateoffset is defined, if not take set to 0 (no futher date retrieval processing) . 
-        try: 
-            # test of date is specified in layout
-            dateoffset = int(conf.recorddict[layout]["date"]["value"]) 
-        except:
-            # no date specified, default no date specified
-            dateoffset = 0        
+        dateoffset = decoder.dateoffset
 
         #proces date value if specifed 
+        recordtime = None
         if dateoffset > 0 and (conf.gtime != "server" or buffered == "yes"):
             if conf.verbose: print("\t - " + 'Grott data record date/time processing started')
-            #date
-            pvyearI =  int(result_string[dateoffset:dateoffset+2],16)
-            if pvyearI < 10 : pvyear = "200" + str(pvyearI)
-            else: pvyear = "20" + str(pvyearI) 
-            pvmonthI = int(result_string[dateoffset+2:dateoffset+4],16)
-            if pvmonthI < 10 : pvmonth = "0" + str(pvmonthI)
-            else: pvmonth = str(pvmonthI) 
-            pvdayI = int(result_string[dateoffset+4:dateoffset+6],16)
-            if pvdayI < 10 : pvday = "0" + str(pvdayI)
-            else: pvday = str(pvdayI) 
-            #Time
-            pvhourI = int(result_string[dateoffset+6:dateoffset+8],16)
-            if pvhourI < 10 : pvhour = "0" + str(pvhourI)
-            else: pvhour = str(pvhourI) 
-            pvminuteI = int(result_string[dateoffset+8:dateoffset+10],16)
-            if pvminuteI < 10 : pvminute = "0" + str(pvminuteI)
-            else: pvminute = str(pvminuteI) 
-            pvsecondI = int(result_string[dateoffset+10:dateoffset+12],16)
-            if pvsecondI < 10 : pvsecond = "0" + str(pvsecondI)
-            else: pvsecond = str(pvsecondI) 
-            # create date/time is format
-            pvdate = pvyear + "-" + pvmonth + "-" + pvday + "T" + pvhour + ":" + pvminute + ":" + pvsecond
-            # test if valid date/time in data record
-            try:
-                testdate = datetime.strptime(pvdate, "%Y-%m-%dT%H:%M:%S")
-                jsondate = pvdate
-                if conf.verbose : print("\t - date-time: ", jsondate) 
-                timefromserver = False                                              # Indicate of date/time is from server (used for buffered data)           
-            except ValueError:
+            # date/time directly from the record bytes (test if valid date/time in data record)
+            recordtime = record_time(plain, dateoffset)
+            if recordtime is not None:
+                if conf.verbose : print("\t - date-time: ", recordtime.iso) 
+            else:
                 # Date could not be parsed - either the format is different or it's not a
                 # valid date
                 if conf.verbose : print("\t - " + "no or no valid time/date found, grott server time will be used (buffer records not sent!)")  
-                timefromserver = True          
-                jsondate = datetime.now().replace(microsecond=0).isoformat()
         else:
             if conf.verbose: print("\t - " + "Grott server date/time used") 
-            jsondate = datetime.now().replace(microsecond=0).isoformat()   
-            timefromserver = True     
+
+        if recordtime is None : recordtime = GrottTime.now()
+        # Indicate of date/time is from server (used for buffered data)
+        jsondate = recordtime.iso
+        timefromserver = recordtime.fromserver
 
         dataprocessed = True
 
@@ -342,8 +347,10 @@ def procdata(conf,data):
 
         if serialfound == True:
             
-            jsondate = datetime.now().replace(microsecond=0).isoformat()
+            recordtime = GrottTime.now()
+            jsondate = recordtime.iso
             timefromserver = True 
+            device_defined = False 
 
             if conf.verbose: print("\t - " + 'Growatt processing values for: ', bytearray.fromhex(conf.SN).decode())
             
@@ -445,6 +452,13 @@ def procdata(conf,data):
             else : 
                 deviceid = definedkey["datalogserial"]
             
+        ctx.buffered = buffered
+        ctx.time = recordtime
+        ctx.jsondate = jsondate
+        ctx.timefromserver = timefromserver
+        ctx.device = deviceid
+        ctx.values = definedkey
+
         jsonobj = {
                         "device" : deviceid,
                         "time" : jsondate, 
@@ -452,16 +466,8 @@ def procdata(conf,data):
                         "values" : {}
                     }
 
-        for key in definedkey : 
-
-            #if key != "pvserial" : 
-                #if conf.recorddict[layout][key]["type"] == "num" : 
-                # only add int values to the json object 
-                #print(definedkey[key])
-                #print(type(definedkey[key]))                                 
-                #if type(definedkey[key]) == type(1) :                                                                     
-                #    jsonobj["values"][key] = definedkey[key]
-            jsonobj["values"][key] = definedkey[key]
+        #only the fields selected for MQTT 
+        jsonobj["values"] = selectvalues(definedkey, conf.mqttfields)
                      
         jsonmsg = json.dumps(jsonobj) 
         
@@ -489,22 +495,19 @@ def procdata(conf,data):
             if conf.mqttretain:
                if conf.verbose: print("\t - " + 'Grott MQTT message retain enabled')  
 
-            try:
-                #v2.7.1 add retrain variable  
-                publish.single(mqtttopic, payload=jsonmsg, qos=0, retain=conf.mqttretain, hostname=conf.mqttip,port=conf.mqttport, client_id=conf.inverterid, keepalive=60, auth=conf.pubauth)
-                if conf.verbose: print("\t - " + 'MQTT message message sent') 
-            except TimeoutError:     
-                if conf.verbose: print("\t - " + 'MQTT connection time out error') 
-            except ConnectionRefusedError:     
-                if conf.verbose: print("\t - " + 'MQTT connection refused by target')     
-            except BaseException as error:     
-                if conf.verbose: print("\t - "+ 'MQTT send failed:', str(error)) 
+            #queue message for the persistent MQTT connection (sent by the MQTT sender thread)
+            #(live records can be coalesced per device if the queue is deep, buffered records are history and are all sent) 
+            mqttmsg = [mqtttopic, jsonmsg, conf.mqttretain, None if buffered == "yes" else [mqtttopic, deviceid]]
+            if conf.outbox : 
+                deliver(conf, "mqtt", mqttmsg, mqtt_send)
+            else :
+                mqtt_queue(conf, mqttmsg)
+                if conf.verbose: print("\t - " + 'MQTT message queued') 
         else:
             if conf.verbose: print("\t - " + 'No MQTT message sent, MQTT disabled') 
 
         # process pvoutput if enabled
         if conf.pvoutput :      
-            import requests
  
             pvidfound = False    
             if  conf.pvinverters == 1 :  
@@ -520,7 +523,7 @@ def procdata(conf,data):
             if not pvidfound:
                 if conf.verbose : print("\t - " + "pvsystemid not found for inverter : ", definedkey["pvserial"])   
                 return
-            if not pvout_limit.ok_send(definedkey["pvserial"], conf):
+            if not pvout_limit.ok_send(definedkey["pvserial"], conf, recordtime.local):
                 # Will print a line for the refusal in verbose mode (see GrottPvOutLimit at the top)
                 return
             if conf.verbose : print("\t - " + "Grott send data to PVOutput systemid: ", pvssid, "for inverter: ", definedkey["pvserial"]) 
@@ -529,9 +532,8 @@ def procdata(conf,data):
                 "X-Pvoutput-SystemId"   : pvssid
             }
             
-            pvodate = jsondate[:4] +jsondate[5:7] + jsondate[8:10]
-            # debug: pvodate = jsondate[:4] +jsondate[5:7] + "16" 
-            pvotime = jsondate[11:16] 
+            pvodate = recordtime.pvodate
+            pvotime = recordtime.pvotime
             # debug: pvotime = "09:05" 
             # if record is a smart monitor record sent smart monitor data to PVOutput
             if header[14:16] != "20" :
@@ -553,9 +555,7 @@ def procdata(conf,data):
                 #print(pvdata)
                 if conf.verbose : print("\t\t - ", pvheader)
                 if conf.verbose : print("\t\t - ", pvdata)
-                reqret = requests.post(conf.pvurl, data = pvdata, headers = pvheader)
-                if conf.verbose :  print("\t - " + "Grott PVOutput response: ") 
-                if conf.verbose : print("\t\t - ", reqret.text)
+                pvout_queue(conf, pvssid, pvdata)
             else: 
                 # send smat monitor data c1 = 3 indiates v3 is lifetime energy (day wil be calculated), n=1 indicates is net data (import /export)
                 # value seprated because it is not allowed to sent combination at once
@@ -579,86 +579,58 @@ def procdata(conf,data):
                 if conf.verbose : print("\t\t - ", pvheader)
                 if conf.verbose : print("\t\t - ", pvdata1)
                 if conf.verbose : print("\t\t - ", pvdata2)
-                reqret = requests.post(conf.pvurl, data = pvdata1, headers = pvheader)
-                if conf.verbose :  print("\t - " + "Grott PVOutput response SM1: ") 
-                if conf.verbose : print("\t\t - ", reqret.text)
-                reqret = requests.post(conf.pvurl, data = pvdata2, headers = pvheader)
-                if conf.verbose :  print("\t - " + "Grott PVOutput response SM2: ") 
-                if conf.verbose : print("\t\t - ", reqret.text)
+                pvout_queue(conf, pvssid, pvdata1)
+                pvout_queue(conf, pvssid, pvdata2)
         else: 
             if conf.verbose : print("\t - " + "Grott Send data to PVOutput disabled ") 
 
+    if not dataprocessed : 
+        # no record values (compat mode: serial not found or invalid pv status), nothing to send  
+        return
+
     # influxDB processing 
     if conf.influx:      
         if conf.verbose :  print("\t - " + "Grott InfluxDB publihing started")
-        try:  
-            import  pytz             
-        except: 
+        if pytz is None: 
             if conf.verbose :  print("\t - " + "Grott PYTZ Library not installed in Python, influx processing disabled")    
-            conf.inlyx = False
             return
-        try: 
-            local = pytz.timezone(conf.tmzone) 
-        except : 
-            if conf.verbose :  
-                if conf.tmzone ==  "local":  print("\t - " + "Timezone local specified default timezone used")
-                else : print("\t - " + "Grott unknown timezone : ",conf.tmzone,", default timezone used")
-            conf.tmzone = "local"
-            local = int(time.timezone/3600)
-            #print(local)
-
-        if conf.tmzone == "local": 
-           curtz = time.timezone 
-           utc_dt = datetime.strptime (jsondate, "%Y-%m-%dT%H:%M:%S") + timedelta(seconds=curtz) 
-        else :      
-            naive = datetime.strptime (jsondate, "%Y-%m-%dT%H:%M:%S")
-            local_dt = local.localize(naive, is_dst=None)
-            utc_dt = local_dt.astimezone(pytz.utc)
-        
-        ifdt = utc_dt.strftime ("%Y-%m-%dT%H:%M:%S")
-        if conf.verbose :  print("\t - " + "Grott original time : ",jsondate,"adjusted UTC time for influx : ",ifdt)
+        #UTC time (epoch ns) with the cached timezone conversion (unknown timezone: default timezone used) 
+        ifns = recordtime.epoch_ns(conf.tmzone)
+        if conf.verbose :  print("\t - " + "Grott original time : ",jsondate,"adjusted UTC time for influx : ",recordtime.utc(conf.tmzone).isoformat())
     
-        # prepare influx jsonmsg dictionary    
-
-        # if record is a smart monitor record use datalogserial as measurement (to distinguish from solar record) 
-        if header[14:16] != "20" :
-            ifobj = {
-                        "measurement" : definedkey["pvserial"],
-                        "time" : ifdt,
-                        "fields" : {}
-                    }    
-        else: 
-            ifobj = {
-                                "measurement" : definedkey["datalogserial"],
-                                "time" : ifdt,
-                               "fields" : {}
-                    }    
-
-        for key in definedkey : 
-            if key != "date" : 
-                ifobj["fields"][key] = definedkey[key]
+        iftags = {}
+        iffields = {}
+        if conf.ifschema == "family" : 
+            # fixed measurement per record family, device / datalogger / buffered as tags and only numeric values (divided)  
+            ifmeasurement = "meter" if header[14:16] in ("20","1b") else "inverter"
+            iftags = {"device": deviceid, "datalogger": definedkey.get("datalogserial"), "buffered": buffered}
+            for key, value in selectvalues(definedkey, conf.iffields).items() : 
+                if type(value) in (int, float) : 
+                    iffields[key] = value / decoder.divide.get(key, 1) if decoder is not None else float(value)
+        else :
+            # if record is a smart monitor record use datalogserial as measurement (to distinguish from solar record) 
+            if header[14:16] != "20" :
+                ifmeasurement = definedkey["pvserial"]
+            else: 
+                ifmeasurement = definedkey["datalogserial"]
+
+            for key, value in selectvalues(definedkey, conf.iffields).items() : 
+                if key != "date" : 
+                    iffields[key] = value
         
-        #Create list for influx
-        ifjson = [ifobj]
+        #create line protocol line for influx 
+        ifline = influxline(ifmeasurement, iftags, iffields, ifns)
 
-        print("\t - " + "Grott influxdb jsonmsg: ")        
-        print(format_multi_line("\t\t\t ", str(ifjson)))   
-        #if conf.verbose :  print("\t - " + "Grott InfluxDB publihing started")
+        if conf.verbose : 
+            print("\t - " + "Grott influxdb line: ")        
+            print(format_multi_line("\t\t\t ", str(ifline)))   
   
-        try: 
-            if (conf.influx2):
-                if conf.verbose :  print("\t - " + "Grott write to influxdb v2") 
-                ifresult = conf.ifwrite_api.write(conf.ifbucket,conf.iforg,ifjson)   
-                #print(ifresult)
-            else: 
-                if conf.verbose :  print("\t - " + "Grott write to influxdb v1") 
-                ifresult = conf.influxclient.write_points(ifjson)
-        #except : 
-        except Exception as e:
-            # if  conf.verbose: 
-                print("\t - " + "Grott InfluxDB error ")
-                print(e) 
-                raise SystemExit("Grott Influxdb write error, grott will be stopped") 
+        if ifline is not None : 
+            if conf.outbox : 
+                deliver(conf, "influx", ifline, influx_send, batch=conf.ifbatch)
+            else :
+                #batched write by the influx writer thread 
+                influxwriter(conf).put(ifline)
             
     else: 
             if conf.verbose : print("\t - " + "Grott Send data to Influx disabled ")      
@@ -666,25 +638,22 @@ def procdata(conf,data):
     if conf.extension : 
         
         if conf.verbose :  print("\t - " + "Grott extension processing started : ", conf.extname)
-        import importlib
-        try: 
-            module = importlib.import_module(conf.extname, package=None)
-        except :
-            if conf.verbose : print("\t - " + "Grott import extension failed:", conf.extname)      
-            return
 
-        try:
-            ext_result = module.grottext(conf,result_string,jsonmsg) 
-            if conf.verbose :  
-                print("\t - " + "Grott extension processing ended : ", ext_result)
-        except Exception as e:
-            print("\t - " + "Grott extension processing error:", repr(e))
-            if conf.verbose:
-                import traceback
-                print("\t - " + traceback.format_exc())
-            #print("\t - " + "Grott extension processing error ")
-            #print(e) 
-            #return
+        #record (and json message for legacy extensions) per field selection, shared by extensions with the same fields 
+        records = {}
+        for extension in extensions(conf) : 
+            fieldskey = None if extension.fields is None else frozenset(extension.fields)
+            if fieldskey not in records : 
+                if extension.fields == conf.mqttfields : 
+                    records[fieldskey] = (jsonobj, lambda: jsonmsg)
+                else :
+                    extrecord = dict(jsonobj, values=selectvalues(definedkey, extension.fields))
+                    records[fieldskey] = (extrecord, partial(json.dumps, extrecord))
+            extrecord, extjson = records[fieldskey]
+
+            #extension runs on its own thread (supervised: deadline and circuit breaker) 
+            extension.put(ctx, extrecord, result_string, extjson) 
+            if conf.verbose : print("\t - " + "Grott extension record queued : ", extension.name)
 
         #if conf.verbose :  
             #print("\t - " + "Grott extension processing ended : ", ext_result)
@@ -0,0 +1,144 @@
+# grottdns.py DNS cache for the Growatt server connections
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# The proxy connects to the Growatt server (growattip, e.g. server.growatt.com) for every datalogger
+# connection. The address is looked up once (at startup) and kept in the cache. DNS lookups are done by a
+# lookup thread and never by the proxy loop: submit returns a future with the address, that is already done
+# when the address is in the cache (or an IP address is used).
+# A cached address is looked up again in the background when it is older than 80% of dnsttl; until the new
+# lookup is done (or if it fails) the last good address is used, but not longer than MAXSTALE x dnsttl after
+# the last good lookup: an older address is removed and the next connection waits for a new lookup. A failed
+# lookup of a name without a good address is remembered for NEGTTL seconds, connections in that time fail
+# directly without a new lookup.
+# With dnsttl = 0 there is no cache: every connection waits for a new (background) lookup.
+# If a name has more addresses and a connect fails, the next address is used for the next connect.
+
+import socket
+import threading
+import ipaddress
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from grottqueue import shared
+
+# seconds a failed lookup is remembered (negative cache)
+NEGTTL = 30
+# a cached address is not used anymore MAXSTALE x ttl seconds after the last good lookup
+MAXSTALE = 2
+
+
+class GrottResolver:
+
+    def __init__(self, ttl=300, verbose=False):
+        self.ttl = ttl
+        self.verbose = verbose
+        # name, port -> [list of (family, sockaddr), time of lookup]
+        self.cache = {}
+        # name, port -> (time of failed lookup, error)
+        self.failures = {}
+        # name, port -> future of a running lookup
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="grottdns")
+        self.lookups = 0
+        self.failed_lookups = 0
+
+    def lookup(self, host, port):
+        # DNS lookup (blocking), returns list of (family, sockaddr)
+        with self.lock:
+            self.lookups += 1
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = []
+        for family, _, _, _, sockaddr in infos:
+            if (family, sockaddr) not in addresses: addresses.append((family, sockaddr))
+        return addresses
+
+    def submit(self, host, port):
+        # future with the address (family, sockaddr) of host, does not block (raises OSError if the lookup fails)
+        future = Future()
+        try:
+            ip = ipaddress.ip_address(host)
+            future.set_result(((socket.AF_INET6 if ip.version == 6 else socket.AF_INET), (host, port)))
+            return future
+        except ValueError:
+            pass
+        now = time.monotonic()
+        with self.lock:
+            entry = self.cache.get((host, port))
+            if entry is not None and now - entry[1] >= self.ttl * MAXSTALE:
+                #the refresh lookups failed for too long: the old address is not used anymore
+                del self.cache[(host, port)]
+                entry = None
+            failure = self.failures.get((host, port))
+            #no new lookup within NEGTTL seconds after a failed lookup
+            retry = failure is None or now - failure[0] >= NEGTTL
+            if entry is not None:
+                #refresh in the background before the ttl runs out, the last good address is used meanwhile
+                if retry and now - entry[1] >= self.ttl * 0.8: self.start_lookup(host, port)
+                future.set_result(entry[0][0])
+                return future
+            if not retry:
+                future.set_exception(failure[1])
+                return future
+            return self.start_lookup(host, port)
+
+    def start_lookup(self, host, port):
+        # start a background lookup (one per name at a time), called with lock
+        future = self.pending.get((host, port))
+        if future is None or future.cancelled():
+            future = self.pending[(host, port)] = self.executor.submit(self.run_lookup, host, port)
+        return future
+
+    def run_lookup(self, host, port):
+        # lookup thread: look up host and update the cache, returns the first address
+        try:
+            addresses = self.lookup(host, port)
+            if not addresses: raise OSError("no address found for " + host)
+        except Exception as e:
+            #e.g. socket.gaierror, UnicodeError for an invalid name
+            error = e if isinstance(e, OSError) else OSError(str(e))
+            with self.lock:
+                self.failed_lookups += 1
+                self.pending.pop((host, port), None)
+                self.failures[(host, port)] = (time.monotonic(), error)
+                known = (host, port) in self.cache
+            print("\t - " + "Grott DNS lookup failed for", host + (", known addresses kept" if known else "") + ":", str(error))
+            raise error
+        with self.lock:
+            self.pending.pop((host, port), None)
+            self.failures.pop((host, port), None)
+            if self.ttl:
+                old = self.cache.get((host, port), [[], 0])[0]
+                #keep the order of known addresses (address after a failed connect stays last)
+                addresses = [a for a in old if a in addresses] + [a for a in addresses if a not in old]
+                self.cache[(host, port)] = [addresses, time.monotonic()]
+                if self.verbose and set(old) != set(addresses): print("\t - " + "Grott DNS", host, "resolved:", [a[1][0] for a in addresses])
+        return addresses[0]
+
+    def resolve(self, host, port, timeout=None):
+        # address (family, sockaddr) for host, waits max timeout seconds for the lookup (not to be used by the
+        # proxy loop). Raises OSError if the lookup fails or takes longer (the lookup continues in the background)
+        try:
+            return self.submit(host, port).result(timeout)
+        except FutureTimeout:
+            raise OSError("DNS lookup of " + host + " takes more than " + str(timeout) + " seconds")
+
+    def cached(self, host, port):
+        # cached address (family, sockaddr), None if the name is not in the cache (or the address is too old)
+        with self.lock:
+            entry = self.cache.get((host, port))
+            if entry is None or time.monotonic() - entry[1] >= self.ttl * MAXSTALE: return None
+            return entry[0][0]
+
+    def failed(self, host, port, address):
+        # connect to address failed, use the next address of host first
+        with self.lock:
+            entry = self.cache.get((host, port))
+            if entry and len(entry[0]) > 1 and entry[0][0] == address:
+                entry[0].append(entry[0].pop(0))
+
+
+def resolver(conf):
+    # DNS cache of this process, created on first use
+    return shared("dns", lambda: GrottResolver(conf.dnsttl, conf.verbose))
@@ -0,0 +1,188 @@
+# grottextension.py extension registry
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# The extension modules are imported once (at startup, when the fields to decode are determined) and kept in
+# the registry. extname can be a comma separated list of extensions (e.g. "grottext, grotcsv, grott_ha").
+# Every extension gets its own extvar: if extvar contains a dict for the extension name this dict is used
+# (e.g. {"grotcsv": {"outpath": "/home/pi/grottlog"}, "grottext": {"url": "http://localhost:8000"}}),
+# otherwise extvar is used by all extensions.
+#
+# Extension entry points (an extension defines one of them):
+#   grottext_record(conf, record)  record is the decoded record as dict (device, time, buffered, values),
+#                                  the record is shared with other extensions and should not be changed.
+#                                  Can be defined as async def (non-blocking extension).
+#   grottext(conf, data, jsonmsg)  legacy entry point: plain data as hex string and the record as json string.
+# conf is the processing context with conf.extvar set to the extvar of the extension.
+# An extension can declare the fields it needs with grottext_fields (unless fields is set in grott.ini).
+#
+# procdata only queues the record for an extension and returns. Every extension has its own thread and
+# bounded queue (extqueue records, if full the oldest record is dropped), so a slow extension does not stall
+# the processing of records or the other extensions. The calls are supervised (deadline and circuit breaker
+# per extension, see grottsupervisor). Async extensions run on their own event loop thread, max extqueue
+# calls are running at the same time (new records are dropped when this limit is reached).
+
+import asyncio
+import importlib
+import threading
+
+from grottsupervisor import supervisor, CircuitOpenError, SinkTimeoutError
+from grottqueue import GrottWorker, shared
+
+
+class GrottExtensionConf:
+    # configuration as seen by an extension: its own extvar, all other attributes from the processing context
+
+    __slots__ = ("ctx", "extvar", "extname")
+
+    def __init__(self, ctx, extension):
+        self.ctx = ctx
+        self.extvar = extension.extvar
+        self.extname = extension.name
+
+    def __getattr__(self, name):
+        return getattr(self.ctx, name)
+
+
+class GrottExtension:
+
+    def __init__(self, conf, name, module, extvar, fields):
+        self.name = name
+        self.module = module
+        self.extvar = extvar
+        self.fields = fields
+        self.verbose = conf.verbose
+        self.maxqueue = max(1, conf.extqueue)
+        self.sink = supervisor(conf, "extension-" + name)
+        self.entry = getattr(module, "grottext_record", None)
+        self.legacy = getattr(module, "grottext", None) if self.entry is None else None
+        self.isasync = asyncio.iscoroutinefunction(self.entry)
+        self.lock = threading.Lock()
+        # running async calls
+        self.pending = 0
+        # counters
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.dropped = 0
+        if self.isasync:
+            self.worker = None
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self.loop.run_forever, name="grottext-" + name, daemon=True)
+            self.thread.start()
+        else:
+            self.worker = GrottWorker("Grott extension " + name, self.maxqueue, self.handle, self.verbose, thread="grottext-" + name)
+
+    def call(self, ctx, record, data, jsonmsg):
+        # run the extension for a record, jsonmsg is only used by the legacy entry point
+        conf = GrottExtensionConf(ctx, self)
+        if self.entry is not None:
+            return self.entry(conf, record)
+        return self.legacy(conf, data, jsonmsg())
+
+    def put(self, ctx, record, data, jsonmsg):
+        # queue a record for the extension, returns immediately
+        if not self.isasync:
+            self.worker.put((ctx, record, data, jsonmsg))
+            return
+        with self.lock:
+            if self.pending >= self.maxqueue:
+                self.dropped += 1
+                if self.verbose: print("\t - " + "Grott extension", self.name, "max running calls reached, record dropped, total dropped:", self.dropped)
+                return
+            self.pending += 1
+        self.loop.call_soon_threadsafe(self.loop.create_task, self.run_async(ctx, record))
+
+    def result(self, result, error=None):
+        # count and show the result of a call
+        if error is None:
+            self.done += 1
+            if self.verbose: print("\t - " + "Grott extension processing ended : ", self.name, result)
+        elif isinstance(error, (CircuitOpenError, SinkTimeoutError)):
+            self.skipped += 1
+            print("\t - " + "Grott extension processing skipped:", self.name, str(error))
+        else:
+            self.failed += 1
+            print("\t - " + "Grott extension processing error:", self.name, repr(error))
+
+    def handle(self, args):
+        # extension thread: call the extension for a queued record (supervised)
+        try:
+            self.result(self.sink.call(self.call, *args))
+        except Exception as e:
+            self.result(None, e)
+            if self.verbose and not isinstance(e, (CircuitOpenError, SinkTimeoutError)):
+                import traceback
+                print("\t - " + traceback.format_exc())
+
+    async def run_async(self, ctx, record):
+        # async extension call with deadline, runs on the event loop of the extension
+        try:
+            self.sink.acquire()
+        except Exception as e:
+            self.result(None, e)
+        else:
+            try:
+                result = await asyncio.wait_for(self.entry(GrottExtensionConf(ctx, self), record), self.sink.deadline)
+            except asyncio.TimeoutError:
+                error = SinkTimeoutError(self.name + " deadline of " + str(self.sink.deadline) + " seconds exceeded")
+                self.sink.failure(error)
+                self.result(None, error)
+            except Exception as e:
+                self.sink.failure(e)
+                self.result(None, e)
+            else:
+                self.sink.success()
+                self.result(result)
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def stats(self):
+        if self.isasync:
+            return {"extension": self.name, "queue": self.pending, "done": self.done,
+                    "failed": self.failed, "skipped": self.skipped, "dropped": self.dropped}
+        return {"extension": self.name, "queue": len(self.worker), "done": self.done,
+                "failed": self.failed, "skipped": self.skipped, "dropped": self.worker.dropped}
+
+    def stop(self, timeout=5):
+        # handle the queued records and stop
+        if self.isasync:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+        else:
+            self.worker.stop(timeout)
+
+
+def extvar_for(extvar, name, names):
+    # extvar of an extension: its own dict in extvar or the complete extvar
+    if isinstance(extvar, dict) and isinstance(extvar.get(name), dict) and set(extvar).issubset(names):
+        return extvar[name]
+    return extvar
+
+
+def load(conf):
+    # import the configured extensions, an extension that can not be imported is skipped
+    names = [name.strip() for name in conf.extname.split(",") if name.strip()]
+    loaded = []
+    for name in names:
+        try:
+            module = importlib.import_module(name)
+        except Exception as e:
+            print("\t - " + "Grott import extension failed:", name, repr(e))
+            continue
+        if not hasattr(module, "grottext_record") and not hasattr(module, "grottext"):
+            print("\t - " + "Grott extension has no grottext_record or grottext function:", name)
+            continue
+        fields = conf.extfields
+        if fields is None:
+            fields = getattr(module, "grottext_fields", None)
+            if fields is not None: fields = set(fields)
+        loaded.append(shared(("extension", name), lambda: GrottExtension(conf, name, module, extvar_for(conf.extvar, name, names), fields)))
+        if conf.verbose: print("\t - " + "Grott extension loaded:", name, "fields:", "all" if fields is None else sorted(fields))
+    return loaded
+
+
+def extensions(conf):
+    # extensions of this process, loaded on first use
+    return shared("extensions", lambda: load(conf))
@@ -0,0 +1,179 @@
+# grottframe.py Growatt frame (record) as received from the datalogger
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# A GrottFrame is created once for every received record and passed to all processing stages (proxy,
+# server, sniffer and procdata). The header fields are parsed once, the descrambled data and the
+# validation (length / CRC) result are calculated on first use and cached.
+
+from grottcodec import descramble
+
+#libscrc is optional, without it records are only validated on length
+try:
+    import libscrc
+except:
+    libscrc = None
+
+
+class GrottFrame:
+
+    __slots__ = ("data", "seq", "protocol", "length", "device", "command", "_header", "_descrambled", "_validatecc")
+
+    def __init__(self, data):
+        self.data = bytes(data)
+        self._header = None
+        self._descrambled = None
+        self._validatecc = None
+        mv = memoryview(self.data)
+        if len(mv) >= 8:
+            self.seq = int.from_bytes(mv[0:2], "big")
+            self.protocol = "{:02x}".format(mv[3])
+            self.length = int.from_bytes(mv[4:6], "big")
+            self.device = "{:02x}".format(mv[6])
+            self.command = "{:02x}".format(mv[7])
+        else:
+            self.seq = self.length = 0
+            self.protocol = self.device = self.command = ""
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def header(self):
+        # header (first 8 bytes) as hex string
+        if self._header is None:
+            self._header = self.data[0:8].hex()
+        return self._header
+
+    @property
+    def scrambled(self):
+        return self.protocol in ("05", "06")
+
+    @property
+    def descrambled(self):
+        # descrambled data (bytes), calculated once
+        if self._descrambled is None:
+            self._descrambled = descramble(self.data)
+        return self._descrambled
+
+    @property
+    def plain(self):
+        # plain data: descrambled for protocol 05/06, otherwise the data as received
+        if self.scrambled:
+            return self.descrambled
+        return self.data
+
+    def validate(self):
+        # validate data record on length and CRC (for "05" and "06" records): 0 = ok, 8 = invalid
+        if self._validatecc is None:
+            data = self.data
+            ldata = len(data)
+            lcrc = 2 if self.scrambled else 0
+            returncc = 0
+            if ldata < 8 or ldata - 6 - lcrc != self.length:
+                returncc = 8
+            elif lcrc and libscrc is not None:
+                if int.from_bytes(data[ldata - 2:ldata], "big") != libscrc.modbus(data[0:ldata - 2]):
+                    returncc = 8
+            self._validatecc = returncc
+        return self._validatecc
+
+
+class GrottFramer:
+    # Splits a TCP stream (one per connection and direction) into Growatt records. A receive can contain
+    # several records (coalesced) or a part of a record (split). The record length is taken from the header
+    # (bytes 4-6: length of the data after byte 6, plus 2 bytes CRC for protocol 05/06).
+    # Received data is appended to one buffer, complete records are taken from the front by moving the read
+    # position; the buffer is only compacted when more than half of it is consumed (no copy per receive).
+    # Data that does not start with a valid header (unknown protocol or a record longer than maxbuffer) is
+    # passed on as received up to the next plausible header (byte 2 is 0 and a valid protocol), that is checked
+    # as a record again (resync). Without a plausible header the data is kept until more data is received (at
+    # most maxbuffer bytes, then it is passed on). flush returns the kept data or an incomplete record when
+    # the connection is closed.
+
+    __slots__ = ("buffer", "start", "maxbuffer", "frames", "resynced")
+
+    def __init__(self, maxbuffer=65536):
+        self.buffer = bytearray()
+        self.start = 0
+        self.maxbuffer = maxbuffer
+        # counters
+        self.frames = 0
+        self.resynced = 0
+
+    def __len__(self):
+        # bytes of an incomplete record waiting for the rest
+        return len(self.buffer) - self.start
+
+    def recordlength(self, mv):
+        # length of the record at the start of mv, None if not enough data for the header, 0 if no valid header
+        if len(mv) < 6:
+            return None
+        if mv[2] != 0 or mv[3] not in (2, 5, 6):
+            return 0
+        length = 6 + int.from_bytes(mv[4:6], "big") + (2 if mv[3] in (5, 6) else 0)
+        #header must be complete (device and command) and the record must fit in the buffer
+        if length < 8 or length > self.maxbuffer:
+            return 0
+        return length
+
+    def resync(self, mv, pos):
+        # position of the next plausible header after pos, None if there is none (yet)
+        end = len(mv)
+        #byte 2 of a header is 0, byte 3 the protocol
+        i = self.buffer.find(0, pos + 3)
+        while i != -1 and i + 1 < end:
+            if mv[i + 1] in (2, 5, 6):
+                return i - 2
+            i = self.buffer.find(0, i + 1)
+        if end - pos > self.maxbuffer:
+            #no header in maxbuffer bytes: pass on the data, except the last 3 bytes (can be the start of a header)
+            return end - 3
+        return None
+
+    def feed(self, data):
+        # add received data, returns the complete records (bytes)
+        if not self.buffer and len(data) >= 6:
+            #fast path: receive contains exactly one record
+            length = self.recordlength(data)
+            if length == len(data):
+                self.frames += 1
+                return [bytes(data)]
+        self.buffer += data
+        records = []
+        mv = memoryview(self.buffer)
+        try:
+            while self.start < len(self.buffer):
+                length = self.recordlength(mv[self.start:])
+                if length is None:
+                    break
+                if length == 0:
+                    #no valid header: pass on the data up to the next valid header as received
+                    pos = self.resync(mv, self.start)
+                    if pos is None:
+                        break
+                    self.resynced += 1
+                    records.append(bytes(mv[self.start:pos]))
+                    self.start = pos
+                    continue
+                if len(self.buffer) - self.start < length:
+                    break
+                records.append(bytes(mv[self.start:self.start + length]))
+                self.start += length
+                self.frames += 1
+        finally:
+            mv.release()
+        if self.start == len(self.buffer):
+            self.buffer.clear()
+            self.start = 0
+        elif self.start > len(self.buffer) // 2:
+            del self.buffer[:self.start]
+            self.start = 0
+        return records
+
+    def flush(self):
+        # connection closed: returns the data of an incomplete record (passed on as received)
+        records = [bytes(self.buffer[self.start:])] if len(self) else []
+        self.buffer.clear()
+        self.start = 0
+        return records
@@ -0,0 +1,117 @@
+# grottinflux.py batched InfluxDB writer
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# procdata creates an InfluxDB line protocol line per record and hands it to the writer. The writer thread
+# writes the lines in batches: when ifbatch lines are waiting or at least every ifflush seconds, and on
+# shutdown. If a write fails the lines are kept and written with the next batch (max ifbuffer lines are
+# kept, oldest are dropped). With the outbox enabled the lines are written from the outbox instead.
+# Writes are supervised (deadline and circuit breaker, see grottsupervisor).
+
+import threading
+import time
+
+from grottsupervisor import supervisor, CircuitOpenError
+from grottqueue import GrottQueue, shared
+
+
+def escape(value, chars=",= "):
+    # escape measurement, tag keys / values and field keys
+    value = str(value).replace("\\", "\\\\")
+    for char in chars:
+        value = value.replace(char, "\\" + char)
+    return value
+
+
+def fieldvalue(value):
+    # field value in line protocol (integer, float, boolean or string)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value) + "i"
+    if isinstance(value, float):
+        return repr(value)
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def line(measurement, tags, fields, epochns):
+    # one line protocol line, None if there are no fields
+    if not fields:
+        return None
+    key = escape(measurement, ", ")
+    for tag, value in sorted(tags.items()):
+        if value is not None and value != "":
+            key += "," + escape(tag) + "=" + escape(value)
+    return key + " " + ",".join(escape(field) + "=" + fieldvalue(value) for field, value in fields.items()) + " " + str(epochns)
+
+
+def write_lines(conf, lines):
+    # write lines to influxdb (raises exception if write fails)
+    if conf.influx2:
+        if conf.verbose: print("\t - " + "Grott write to influxdb v2, lines:", len(lines))
+        conf.ifwrite_api.write(conf.ifbucket, conf.iforg, lines)
+    else:
+        if conf.verbose: print("\t - " + "Grott write to influxdb v1, lines:", len(lines))
+        conf.influxclient.write_points(lines, time_precision="n", protocol="line")
+
+
+class GrottInflux(GrottQueue):
+
+    def __init__(self, conf):
+        self.conf = conf
+        self.batch = max(1, conf.ifbatch)
+        self.flushinterval = conf.ifflush
+        #lines waiting for the next write (max ifbuffer, put drops the oldest line)
+        GrottQueue.__init__(self, "Grott InfluxDB", max(conf.ifbuffer, self.batch), conf.verbose, "line")
+        self.written = 0
+        self.thread = threading.Thread(target=self.run, name="grottinflux", daemon=True)
+        self.thread.start()
+
+    def flush(self):
+        # write the waiting lines (in batches), returns False if a write failed
+        while True:
+            with self.cond:
+                lines = [self.queue[i] for i in range(min(self.batch, len(self.queue)))]
+            if not lines:
+                return True
+            try:
+                supervisor(self.conf, "influx").call(write_lines, self.conf, lines)
+            except CircuitOpenError as e:
+                if self.conf.verbose: print("\t - " + "Grott InfluxDB not written:", str(e))
+                return False
+            except Exception as e:
+                print("\t - " + "Grott InfluxDB write error, lines kept for next write:", len(self.queue), str(e))
+                return False
+            with self.cond:
+                for i in range(len(lines)):
+                    #lines can be dropped (buffer full) during write
+                    if self.queue and self.queue[0] is lines[i]: self.queue.popleft()
+                self.written += len(lines)
+
+    def run(self):
+        # writer thread: write when a batch is complete or flush interval has passed
+        while True:
+            with self.cond:
+                deadline = time.monotonic() + self.flushinterval
+                while self.running and len(self.queue) < self.batch and time.monotonic() < deadline:
+                    self.cond.wait(deadline - time.monotonic())
+                if not self.running:
+                    return
+            if not self.flush():
+                #influxdb not available, wait before next try
+                with self.cond:
+                    self.cond.wait_for(lambda: not self.running, self.flushinterval)
+
+    def stop(self, timeout=5):
+        # write the remaining lines on shutdown
+        with self.cond:
+            if not self.running: return
+            self.running = False
+            self.cond.notify_all()
+        self.thread.join(timeout)
+        self.flush()
+
+
+def writer(conf):
+    # InfluxDB writer of this process, created on first use
+    return shared("influx", lambda: GrottInflux(conf))
@@ -0,0 +1,281 @@
+# grottlayout.py compiled record layout decoders
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# A record layout in conf.recorddict describes every field with a hex string position ("value"), a byte
+# length, a type and a divider. Looking these up per keyword per record is expensive, so each layout is
+# compiled once into a table with byte offsets and precompiled struct readers that work directly on the
+# (decrypted) record bytes. Decoding returns a DecodedRecord that only decodes the numeric values on first
+# access (text and log fields are decoded directly). This only saves work if the fields used are selected:
+# iterating the record yields all field names, so copying it (dict(record), or an output with all fields,
+# e.g. MQTT without mqttfields) decodes every field. Use grottdata.selectvalues with a field selection.
+
+import struct
+from collections.abc import Mapping
+
+from grottutil import str2bool
+
+# field kinds
+NUM = 0                                                                         # unsigned integer
+NUMX = 1                                                                        # signed integer
+TEXT = 2                                                                        # text (utf-8)
+LOG = 3                                                                         # comma separated log field
+LOGPOS = 4                                                                      # log field, only if positive
+LOGNEG = 5                                                                      # log field, only if negative
+
+KINDS = {"num": NUM, "numx": NUMX, "text": TEXT, "log": LOG, "logpos": LOGPOS, "logneg": LOGNEG}
+
+# keywords that are not record values
+NOVALUE = ("decrypt", "date", "logstart", "device")
+
+# precompiled big endian readers for the standard field widths: (length, signed) => struct.unpack_from
+READERS = {
+    (1, False): struct.Struct(">B").unpack_from,
+    (2, False): struct.Struct(">H").unpack_from,
+    (4, False): struct.Struct(">I").unpack_from,
+    (8, False): struct.Struct(">Q").unpack_from,
+    (1, True): struct.Struct(">b").unpack_from,
+    (2, True): struct.Struct(">h").unpack_from,
+    (4, True): struct.Struct(">i").unpack_from,
+    (8, True): struct.Struct(">q").unpack_from,
+}
+
+
+def partial_hex(buf, pos, length):
+    # hex string of the field at hex position pos (also a half byte position), as sliced from the hex string
+    # before the compiled layouts. Shorter if the field is (partly) beyond the end of the record
+    return bytes(buf[pos // 2:(pos + length * 2 + 1) // 2]).hex()[pos % 2:pos % 2 + length * 2]
+
+
+def partial_value(buf, pos, length, signed):
+    # value of the field at hex position pos as decoded from the hex string before the compiled layouts: a field
+    # that is (partly) beyond the end of the record gets the value of the available bytes (no bytes: error for
+    # num, 0 for numx)
+    keyhex = partial_hex(buf, pos, length)
+    if signed:
+        return int.from_bytes(bytes.fromhex(keyhex), "big", signed=True)
+    return int(keyhex, 16)
+
+
+def layout_decrypt(layoutdef):
+    # decrypt flag of a layout, default is decrypt
+    try:
+        return str2bool(layoutdef["decrypt"]["value"])
+    except:
+        return True
+
+
+class GrottLayout:
+    # compiled version of one conf.recorddict layout
+
+    __slots__ = ("name", "decrypt", "fields", "fieldmap", "eager", "recordlength", "divide", "dateoffset", "logstart", "device")
+
+    def __init__(self, name, layoutdef, includeall=False, fields=None):
+        self.name = name
+        self.decrypt = layout_decrypt(layoutdef)
+        # table of (name, kind, byte offset, length, reader, divide, log position)
+        self.fields = []
+        self.divide = {}
+
+        self.dateoffset = 0
+        try:
+            self.dateoffset = int(layoutdef["date"]["value"])
+        except:
+            pass
+
+        self.logstart = None
+        try:
+            self.logstart = int(layoutdef["logstart"]["value"]) // 2
+        except:
+            pass
+
+        self.device = None
+        try:
+            self.device = layoutdef["device"]["value"]
+        except:
+            pass
+
+        for keyword, keydef in layoutdef.items():
+            try:
+                self.divide[keyword] = keydef["divide"]
+            except:
+                pass
+            if keyword in NOVALUE:
+                continue
+            #process only keyword needs to be included (default)
+            if not includeall and keydef.get("incl") == "no":
+                continue
+            #only the fields used by the sinks (None = all fields)
+            if fields is not None and keyword not in fields:
+                continue
+            kind = KINDS.get(keydef.get("type", "num"))
+            if kind is None:
+                #unknown types (e.g. def) have no value
+                continue
+            self.fields.append(self.compile_field(keyword, kind, keydef))
+
+        self.fieldmap = {field[0]: field for field in self.fields}
+        # numeric fields with a valid position are decoded on access, the record length is checked up front.
+        # text, log and invalid defined fields are decoded immediately (these can fail on the record content)
+        self.eager = []
+        self.recordlength = 0
+        for field in self.fields:
+            name, kind, offset, length, reader, divide, logpos = field
+            pos = layoutdef[name].get("value")
+            if kind <= NUMX and isinstance(pos, int) and isinstance(length, int):
+                self.recordlength = max(self.recordlength, (pos + length * 2 + 1) // 2)
+            else:
+                self.eager.append(field)
+
+    def compile_field(self, keyword, kind, keydef):
+        if kind in (LOG, LOGPOS, LOGNEG):
+            return (keyword, kind, 0, 0, None, 1, keydef["pos"] - 1 if "pos" in keydef else None)
+
+        pos = keydef.get("value")
+        length = keydef.get("length")
+        reader = None
+        offset = 0
+        if isinstance(pos, int) and isinstance(length, int):
+            offset = pos // 2
+            if pos % 2 == 0 and kind != TEXT:
+                reader = READERS.get((length, kind == NUMX))
+        if kind == TEXT:
+            if isinstance(pos, int) and pos % 2:
+                #text at a half byte position (decoded from the shifted hex string as before)
+                reader = self.text_reader(pos, length)
+        elif reader is None:
+            #non standard width or (half byte) position, use the generic reader
+            reader = self.generic_reader(keyword, pos, length, kind == NUMX)
+        return (keyword, kind, offset, length, reader, keydef.get("divide", 1), 0)
+
+    @staticmethod
+    def generic_reader(keyword, pos, length, signed):
+        def reader(buf, offset):
+            if not isinstance(pos, int) or not isinstance(length, int):
+                raise ValueError("invalid position or length for " + keyword)
+            return (partial_value(buf, pos, length, signed),)
+        return reader
+
+    @staticmethod
+    def text_reader(pos, length):
+        def reader(buf, offset):
+            return (bytes.fromhex(partial_hex(buf, pos, length)).decode("utf-8"),)
+        return reader
+
+    def decode(self, buf):
+        # decode the (decrypted) record bytes, returns a DecodedRecord
+        return DecodedRecord(self, buf)
+
+    def decode_field(self, field, buf, logdict=None):
+        name, kind, offset, length, reader, divide, logpos = field
+        try:
+            if kind <= NUMX:
+                try:
+                    return reader(buf, offset)[0]
+                except struct.error:
+                    #field (partly) beyond the end of the record
+                    return partial_value(buf, offset * 2, length, kind == NUMX)
+            if kind == TEXT:
+                if reader is not None:
+                    return reader(buf, offset)[0]
+                return bytes(buf[offset:offset + length]).decode("utf-8")
+            if kind == LOG:
+                return logdict[logpos]
+            if kind == LOGPOS:
+                return logdict[logpos] if float(logdict[logpos]) > 0 else 0
+            return logdict[logpos] if float(logdict[logpos]) < 0 else 0
+        except Exception as e:
+            raise ValueError(name) from e
+
+
+class DecodedRecord(Mapping):
+    # record values of one decoded record, numeric values are decoded on first access.
+    # values can be added or overruled (e.g. device or pvserial from configuration)
+
+    __slots__ = ("layout", "buf", "values")
+
+    def __init__(self, layout, buf):
+        self.layout = layout
+        self.buf = buf
+        self.values = {}
+        if len(buf) < layout.recordlength:
+            #record too short, decode all fields up front: fields at the end of the record get the value of the
+            #available bytes, a field that is not in the record stops the processing (as before)
+            for field in layout.fields:
+                if field not in layout.eager:
+                    self.values[field[0]] = layout.decode_field(field, buf)
+        if layout.eager:
+            logdict = None
+            if layout.logstart is not None:
+                try:
+                    logdict = bytes(buf[layout.logstart:len(buf) - 2]).decode("ASCII").split(",")
+                except:
+                    pass
+            for field in layout.eager:
+                self.values[field[0]] = layout.decode_field(field, buf, logdict)
+
+    def __getitem__(self, key):
+        try:
+            return self.values[key]
+        except KeyError:
+            pass
+        field = self.layout.fieldmap[key]
+        value = self.values[key] = self.layout.decode_field(field, self.buf)
+        return value
+
+    def __setitem__(self, key, value):
+        self.values[key] = value
+
+    def __contains__(self, key):
+        return key in self.values or key in self.layout.fieldmap
+
+    def __iter__(self):
+        yield from self.layout.fieldmap
+        for key in self.values:
+            if key not in self.layout.fieldmap:
+                yield key
+
+    def __len__(self):
+        return len(self.layout.fieldmap) + sum(1 for key in self.values if key not in self.layout.fieldmap)
+
+    def __repr__(self):
+        return "DecodedRecord(" + self.layout.name + ", " + repr(dict(self)) + ")"
+
+
+def compile_layouts(recorddict, includeall=False, fields=None):
+    # compile all layouts of a recorddict
+    return {name: GrottLayout(name, layoutdef, includeall, fields) for name, layoutdef in recorddict.items()}
+
+
+class LazyLayouts(Mapping):
+    # compiled layouts of a recorddict, a layout is compiled on first use (first record of that type).
+    # recorddict can be a function returning the recorddict, so the layouts are only loaded when needed
+
+    def __init__(self, recorddict, includeall=False, fields=None):
+        self._recorddict = recorddict
+        self.includeall = includeall
+        self.fields = fields
+        self.compiled = {}
+
+    @property
+    def recorddict(self):
+        if callable(self._recorddict):
+            self._recorddict = self._recorddict()
+        return self._recorddict
+
+    def __getitem__(self, name):
+        try:
+            return self.compiled[name]
+        except KeyError:
+            pass
+        layout = self.compiled[name] = GrottLayout(name, self.recorddict[name], self.includeall, self.fields)
+        return layout
+
+    def __contains__(self, name):
+        return name in self.recorddict
+
+    def __iter__(self):
+        return iter(self.recorddict)
+
+    def __len__(self):
+        return len(self.recorddict)
@@ -0,0 +1,141 @@
+# grottmirror.py second Growatt server (growattip2) writer
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# The proxy sends the records of a datalogger also to a second server (e.g. a local grottserver). The proxy
+# only puts the record in the queue of the mirror and returns, a writer thread sends the records, so a slow
+# or unreachable second server does not delay forwarding to the Growatt server.
+# As with the Growatt server there is one connection to the second server per datalogger connection
+# (session). A connection is made when the first record of a session is sent and made again when it is
+# broken. After a failed connect no connects are tried for a while (increasing up to 60 seconds), records
+# for sessions without connection are dropped in that time. Responses of the second server are read and
+# dropped. The queue holds max mirrorqueue records, if it is full the oldest record is dropped.
+
+import socket
+import select
+import time
+
+from grottdns import resolver
+from grottqueue import GrottWorker, shared
+
+# max bytes read (and dropped) from the second server per receive
+buffer_size = 4096
+
+
+class GrottMirror(GrottWorker):
+
+    def __init__(self, conf, host, port):
+        self.conf = conf
+        self.host = host
+        self.port = port
+        self.timeout = conf.connecttimeout
+        # session -> socket
+        self.connections = {}
+        self.retryat = 0
+        self.retrywait = 1
+        # counters (also dropped and failed of the worker)
+        self.sent = 0
+        self.connects = 0
+        #writer thread, reads the responses when there is no record for a second. Waiting records are not sent on stop
+        GrottWorker.__init__(self, "Grott second server", conf.mirrorqueue, self.handle, conf.verbose, thread="grottmirror",
+                             interval=1, idle=self.discard, drain=False)
+
+    def put(self, session, data):
+        # queue a record for the second server, returns immediately
+        GrottWorker.put(self, (session, data))
+
+    def close(self, session):
+        # datalogger connection closed: close the connection of the session (after the queued records)
+        with self.cond:
+            self.queue.append((session, None))
+            self.cond.notify()
+
+    def connect(self, session):
+        # connection for a session, None if the second server is not reachable
+        if time.monotonic() < self.retryat:
+            return None
+        sock = None
+        try:
+            family, address = resolver(self.conf).resolve(self.host, self.port, self.timeout)
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(address)
+        except OSError as e:
+            if sock is not None: sock.close()
+            with self.cond:
+                self.failed += 1
+            print("\t - " + "Grott second server connect failed, retry in", self.retrywait, "seconds:", (self.host, self.port), str(e))
+            self.retryat = time.monotonic() + self.retrywait
+            self.retrywait = min(self.retrywait * 2, 60)
+            return None
+        self.retrywait = 1
+        with self.cond:
+            self.connects += 1
+        if self.verbose: print("\t - Second forward connection established to", (self.host, self.port))
+        self.connections[session] = sock
+        return sock
+
+    def disconnect(self, session):
+        sock = self.connections.pop(session, None)
+        if sock is not None: sock.close()
+
+    def discard(self):
+        # read and drop the responses of the second server
+        socks = list(self.connections.values())
+        if not socks: return
+        readable = select.select(socks, [], [], 0)[0]
+        for sock in readable:
+            try:
+                data = sock.recv(buffer_size)
+            except OSError:
+                data = b""
+            if not data:
+                #connection closed by the second server, made again for the next record
+                for session, s in list(self.connections.items()):
+                    if s is sock: self.disconnect(session)
+
+    def send(self, session, data):
+        # send a record, a broken connection is made again once. The counters are updated with the lock (also
+        # used by put)
+        for attempt in (1, 2):
+            sock = self.connections.get(session) or self.connect(session)
+            if sock is None:
+                break
+            try:
+                sock.sendall(data)
+                with self.cond:
+                    self.sent += 1
+                return
+            except OSError as e:
+                with self.cond:
+                    self.failed += 1
+                if self.verbose: print("\t - Error forwarding to second destination:", e)
+                self.disconnect(session)
+        with self.cond:
+            self.dropped += 1
+
+    def handle(self, item):
+        # writer thread: send a record or close the connection of a session, read the responses
+        session, data = item
+        if data is None:
+            self.disconnect(session)
+        else:
+            self.send(session, data)
+        self.discard()
+
+    def stats(self):
+        with self.cond:
+            return {"queue": len(self.queue), "sent": self.sent, "dropped": self.dropped, "failed": self.failed,
+                    "connects": self.connects, "connections": len(self.connections)}
+
+    def stop(self, timeout=2):
+        GrottWorker.stop(self, timeout)
+        if not self.thread.is_alive():
+            for session in list(self.connections):
+                self.disconnect(session)
+
+
+def mirror(conf):
+    # writer for the second server of this process (None if growattip2 is not configured), created on first use
+    if conf.growattip2 == "": return None
+    return shared("mirror", lambda: GrottMirror(conf, conf.growattip2, conf.growattport2))
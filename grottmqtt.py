@@ -0,0 +1,164 @@
+# grottmqtt.py persistent MQTT publisher
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# One MQTT connection is kept open for the whole process (instead of a connect / publish / disconnect per
+# record). paho's network loop runs on its own thread and reconnects automatically. procdata only puts the
+# message in a bounded queue, a sender thread publishes the queued messages when the connection is up.
+# The sender takes up to mqttbatch messages from the queue at once. With qos 1 up to mqttinflight messages
+# are unacknowledged at the same time (pipelined), the sender waits for the oldest acknowledgement when the
+# window is full. When the queue is deeper than mqttcoalesce only the latest message per key (topic and
+# device) is kept. If the queue is full the oldest message is dropped.
+# Deliveries from the outbox are published directly (publish_wait) and only count as delivered when the
+# broker has acknowledged the message (qos 1 or 2). With qos 0 a message is delivered when it is written to
+# the connection: at-most-once, a message can still be lost when the connection breaks.
+# sent counts the messages acknowledged by the broker (qos 0: written to the connection).
+
+import threading
+from collections import deque
+
+import paho.mqtt.client as mqtt
+
+from grottqueue import GrottQueue, shared
+
+
+class GrottMqtt(GrottQueue):
+
+    def __init__(self, conf):
+        GrottQueue.__init__(self, "Grott MQTT", conf.mqttqueue, conf.verbose, "message")
+        self.batch = max(1, conf.mqttbatch)
+        self.coalesce = conf.mqttcoalesce
+        self.qos = conf.mqttqos
+        self.timeout = conf.sinkdeadline
+        self.inflight = max(1, conf.mqttinflight)
+        # queued messages [topic, payload, retain, key] and latest queued message per key (for coalescing)
+        self.latest = {}
+        self.connected = False
+        self.sent = 0
+        self.coalesced = 0
+
+        try:
+            #paho-mqtt >= 2.0
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=conf.inverterid)
+        except AttributeError:
+            #paho-mqtt 1.x
+            self.client = mqtt.Client(client_id=conf.inverterid)
+        if conf.pubauth is not None:
+            self.client.username_pw_set(conf.pubauth["username"], conf.pubauth["password"])
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_publish = self.on_publish
+        self.client.reconnect_delay_set(min_delay=1, max_delay=60)
+        self.client.max_inflight_messages_set(self.inflight)
+
+        print("\t - " + "Grott MQTT connecting to:", conf.mqttip, conf.mqttport)
+        self.client.connect_async(conf.mqttip, port=conf.mqttport, keepalive=60)
+        self.client.loop_start()
+
+        self.sender = threading.Thread(target=self.run, name="grottmqtt", daemon=True)
+        self.sender.start()
+
+    def on_connect(self, client, userdata, flags, rc, properties=None):
+        if rc == 0:
+            print("\t - " + "Grott MQTT connected")
+            with self.cond:
+                self.connected = True
+                self.cond.notify_all()
+        else:
+            print("\t - " + "Grott MQTT connection refused:", str(rc))
+
+    def on_disconnect(self, client, userdata, *args):
+        # paho 1.x: (rc), paho 2.x: (flags, reason code, properties)
+        with self.cond:
+            self.connected = False
+        if self.running:
+            print("\t - " + "Grott MQTT connection lost, reconnecting")
+
+    def on_publish(self, client, userdata, mid, *args):
+        # message acknowledged by the broker (qos 0: written). paho 2.x also passes reason code and properties
+        with self.cond:
+            self.sent += 1
+
+    def publish(self, topic, payload, retain=False, key=None):
+        # queue a message, returns immediately. Messages with a key can be coalesced (None = never coalesced)
+        with self.cond:
+            if key is not None and self.coalesce and len(self.queue) >= self.coalesce:
+                msg = self.latest.get(key)
+                if msg is not None:
+                    #replace queued message by the latest one (keeps its position in the queue)
+                    msg[0], msg[1], msg[2] = topic, payload, retain
+                    self.coalesced += 1
+                    return
+            msg = [topic, payload, retain, key]
+            dropped = self.put(msg)
+            if dropped is not None: self.forget(dropped)
+            if key is not None: self.latest[key] = msg
+
+    def publish_wait(self, topic, payload, retain=False):
+        # publish a message and wait for the acknowledgement (outbox delivery), raises an exception if the message
+        # is not published within the timeout (the outbox delivers it again)
+        if not self.connected: raise ConnectionError("MQTT not connected")
+        info = self.client.publish(topic, payload=payload, qos=self.qos, retain=retain)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            raise ConnectionError("MQTT publish failed: " + mqtt.error_string(info.rc))
+        info.wait_for_publish(timeout=self.timeout)
+        if not info.is_published():
+            raise TimeoutError("MQTT message not acknowledged within " + str(self.timeout) + " seconds")
+
+    def forget(self, msg):
+        # message leaves the queue, it can not be coalesced anymore
+        if msg[3] is not None and self.latest.get(msg[3]) is msg:
+            del self.latest[msg[3]]
+
+    def run(self):
+        # sender thread: publish queued messages in batches while connected
+        window = deque()
+        while True:
+            with self.cond:
+                while self.running and not (self.queue and self.connected):
+                    self.cond.wait()
+                if not self.running:
+                    return
+                batch = []
+                while self.queue and len(batch) < self.batch:
+                    msg = self.queue.popleft()
+                    self.forget(msg)
+                    batch.append(msg)
+                self.cond.notify_all()
+            for n, msg in enumerate(batch):
+                topic, payload, retain, key = msg
+                if len(window) >= self.inflight:
+                    #window full, wait for the oldest acknowledgement
+                    try:
+                        window.popleft().wait_for_publish(timeout=10)
+                    except (ValueError, RuntimeError):
+                        pass
+                info = self.client.publish(topic, payload=payload, qos=self.qos, retain=retain)
+                if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                    if self.qos: window.append(info)
+                elif info.rc == mqtt.MQTT_ERR_NO_CONN and self.qos == 0:
+                    #connection lost, publish the rest of the batch again after reconnect
+                    with self.cond:
+                        self.connected = False
+                        for msg in reversed(batch[n:]):
+                            self.queue.appendleft(msg)
+                            if msg[3] is not None: self.latest.setdefault(msg[3], msg)
+                    break
+                elif info.rc != mqtt.MQTT_ERR_NO_CONN:
+                    #publish failed (qos 1 messages without connection are kept by paho and sent after reconnect)
+                    if self.verbose: print("\t - " + "Grott MQTT publish failed:", mqtt.error_string(info.rc))
+
+    def stop(self, timeout=5):
+        # send the queued messages (if connected) and close the connection
+        with self.cond:
+            self.cond.wait_for(lambda: not (self.queue and self.connected), timeout)
+            self.running = False
+            self.cond.notify_all()
+        self.sender.join(timeout)
+        self.client.disconnect()
+        self.client.loop_stop()
+
+
+def publisher(conf):
+    # MQTT publisher of this process, created (and connected) on first use
+    return shared("mqtt", lambda: GrottMqtt(conf))
@@ -0,0 +1,248 @@
+# grottoutbox.py durable outbox for sink deliveries (MQTT, InfluxDB, PVOutput)
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# procdata writes the messages for a sink into the outbox of that sink and returns. A drain thread per
+# outbox delivers the messages in order and only moves its replay cursor when a message is delivered, so
+# messages are kept (also over a restart of grott) while the target is not reachable.
+#
+# The outbox of a sink is a directory with append only segment files (00000001.seg, ...) and a cursor file
+# (segment and offset of the next message to deliver). Every message is stored as length, crc32 and the
+# message as json. Segment files are flushed per message and synced to disk (fsync) in batches at most every
+# outboxfsync seconds. If the outbox gets bigger than outboxsize the oldest segment is dropped (eviction).
+# Delivered segments are deleted. Messages are delivered at max outboxrate messages per second, after a
+# failed delivery the drain thread waits (increasing up to 60 seconds) and tries again.
+# With batch > 1 up to batch messages are delivered in one call (deliver gets a list of messages).
+
+import os
+import json
+import time
+import zlib
+import struct
+import threading
+
+from grottqueue import shared
+
+RECHEADER = struct.Struct(">II")                                                # length, crc32
+
+
+class GrottOutbox:
+
+    def __init__(self, name, directory, deliver, maxbytes=50*1024*1024, segmentbytes=1024*1024, fsync=1.0, rate=20, verbose=False, batch=1):
+        self.name = name
+        self.dir = os.path.join(directory, name)
+        self.deliver = deliver
+        self.maxbytes = maxbytes
+        self.segmentbytes = segmentbytes
+        self.fsyncinterval = fsync
+        self.rate = rate
+        self.verbose = verbose
+        self.batch = batch
+        self.cond = threading.Condition()
+        self.running = True
+        self.dirty = False
+        self.delivered = 0
+        self.evicted = 0
+
+        os.makedirs(self.dir, exist_ok=True)
+        self.segments = sorted(int(f[:-4]) for f in os.listdir(self.dir) if f.endswith(".seg") and f[:-4].isdigit())
+        if not self.segments:
+            self.segments = [1]
+        self.size = sum(self.segsize(seg) for seg in self.segments)
+        #writer appends to the last segment (a partly written last message is removed)
+        self.wseg = self.segments[-1]
+        self.wfile = open(self.segpath(self.wseg), "ab")
+        self.truncate_torn()
+        #replay cursor
+        self.rseg, self.roffset = self.read_cursor()
+        self.rfile = None
+        self.rfileseg = None
+        self.cursorsaved = (self.rseg, self.roffset)
+        pending = self.size - sum(self.segsize(seg) for seg in self.segments if seg < self.rseg) - self.roffset
+        if pending > 0: print("\t - " + "Grott outbox", name, "messages to deliver from previous run:", pending, "bytes")
+
+        self.thread = threading.Thread(target=self.run, name="grottoutbox-" + name, daemon=True)
+        self.thread.start()
+
+    def segpath(self, seg):
+        return os.path.join(self.dir, "{:08d}.seg".format(seg))
+
+    def segsize(self, seg):
+        try:
+            return os.path.getsize(self.segpath(seg))
+        except OSError:
+            return 0
+
+    def truncate_torn(self):
+        # remove a partly written message at the end of the write segment (e.g. power loss)
+        valid = 0
+        with open(self.segpath(self.wseg), "rb") as f:
+            while True:
+                header = f.read(RECHEADER.size)
+                if len(header) < RECHEADER.size: break
+                length, crc = RECHEADER.unpack(header)
+                data = f.read(length)
+                if len(data) < length or zlib.crc32(data) != crc: break
+                valid = f.tell()
+        end = self.wfile.seek(0, os.SEEK_END)
+        if valid < end:
+            print("\t - " + "Grott outbox", self.name, "incomplete message removed from", self.segpath(self.wseg))
+            self.wfile.truncate(valid)
+            self.size -= end - valid
+
+    def read_cursor(self):
+        try:
+            with open(os.path.join(self.dir, "cursor")) as f:
+                seg, offset = (int(x) for x in f.read().split())
+            if seg in self.segments: return seg, offset
+        except:
+            pass
+        return self.segments[0], 0
+
+    def save_cursor(self):
+        if (self.rseg, self.roffset) == self.cursorsaved: return
+        tmp = os.path.join(self.dir, "cursor.tmp")
+        with open(tmp, "w") as f:
+            f.write("{} {}".format(self.rseg, self.roffset))
+        os.replace(tmp, os.path.join(self.dir, "cursor"))
+        self.cursorsaved = (self.rseg, self.roffset)
+
+    def put(self, item):
+        # store a message for delivery (json serializable)
+        data = json.dumps(item).encode()
+        rec = RECHEADER.pack(len(data), zlib.crc32(data)) + data
+        with self.cond:
+            if self.wfile.tell() > 0 and self.wfile.tell() + len(rec) > self.segmentbytes:
+                #start new segment
+                self.wfile.flush()
+                os.fsync(self.wfile.fileno())
+                self.wfile.close()
+                self.wseg += 1
+                self.segments.append(self.wseg)
+                self.wfile = open(self.segpath(self.wseg), "ab")
+            self.wfile.write(rec)
+            self.wfile.flush()
+            self.size += len(rec)
+            self.dirty = True
+            while self.size > self.maxbytes and len(self.segments) > 1:
+                self.evict()
+            self.cond.notify()
+
+    def evict(self):
+        # outbox too big, drop the oldest segment
+        seg = self.segments.pop(0)
+        self.size -= self.segsize(seg)
+        self.evicted += 1
+        print("\t - " + "Grott outbox", self.name, "size limit reached, oldest messages dropped:", self.segpath(seg))
+        if self.rfileseg == seg:
+            self.close_reader()
+        if self.rseg <= seg:
+            self.rseg, self.roffset = self.segments[0], 0
+        os.remove(self.segpath(seg))
+
+    def close_reader(self):
+        if self.rfile is not None:
+            self.rfile.close()
+            self.rfile = None
+            self.rfileseg = None
+
+    def read_at(self, pos):
+        # message at position (segment, offset) and the position after it, None if there is no message (called with lock)
+        seg, offset = pos
+        while True:
+            if self.rfileseg != seg:
+                self.close_reader()
+                self.rfile = open(self.segpath(seg), "rb")
+                self.rfileseg = seg
+            self.rfile.seek(offset)
+            header = self.rfile.read(RECHEADER.size)
+            if len(header) == RECHEADER.size:
+                length, crc = RECHEADER.unpack(header)
+                data = self.rfile.read(length)
+                if len(data) == length and zlib.crc32(data) == crc:
+                    return json.loads(data), (seg, offset + RECHEADER.size + length)
+                if seg == self.wseg:
+                    return None
+                print("\t - " + "Grott outbox", self.name, "invalid message, rest of segment skipped:", self.segpath(seg))
+            if seg == self.wseg:
+                return None
+            #end of segment, continue with next segment
+            seg, offset = self.segments[self.segments.index(seg) + 1], 0
+
+    def read_batch(self):
+        # next messages to deliver (max batch) and the cursor after them (called with lock)
+        items = []
+        pos = (self.rseg, self.roffset)
+        while len(items) < self.batch:
+            msg = self.read_at(pos)
+            if msg is None: break
+            items.append(msg[0])
+            pos = msg[1]
+        return items, pos
+
+    def commit(self, pos):
+        # messages delivered: move cursor and delete the delivered segments (called with lock)
+        seg, offset = pos
+        while self.segments[0] < seg:
+            done = self.segments.pop(0)
+            if self.rfileseg == done: self.close_reader()
+            self.size -= self.segsize(done)
+            os.remove(self.segpath(done))
+        self.rseg, self.roffset = pos
+
+    def sync(self):
+        # fsync written messages and save cursor (called with lock)
+        if self.dirty:
+            os.fsync(self.wfile.fileno())
+            self.dirty = False
+        self.save_cursor()
+
+    def run(self):
+        # drain thread: deliver messages in order
+        retrywait = 1
+        lastsync = time.monotonic()
+        while True:
+            with self.cond:
+                if time.monotonic() - lastsync >= self.fsyncinterval:
+                    self.sync()
+                    lastsync = time.monotonic()
+                if not self.running:
+                    return
+                items, pos = self.read_batch()
+                if not items:
+                    self.cond.wait(self.fsyncinterval)
+                    continue
+                start = (self.rseg, self.roffset)
+            starttime = time.monotonic()
+            try:
+                self.deliver(items if self.batch > 1 else items[0])
+            except Exception as e:
+                print("\t - " + "Grott outbox", self.name, "delivery failed, retry in", retrywait, "seconds:", str(e))
+                with self.cond:
+                    self.cond.wait_for(lambda: not self.running, retrywait)
+                retrywait = min(retrywait * 2, 60)
+                continue
+            retrywait = 1
+            with self.cond:
+                #cursor not moved by eviction
+                if start == (self.rseg, self.roffset):
+                    self.commit(pos)
+                self.delivered += len(items)
+                if self.rate:
+                    self.cond.wait_for(lambda: not self.running, len(items) / self.rate - (time.monotonic() - starttime))
+
+    def stop(self, timeout=5):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.thread.join(timeout)
+        with self.cond:
+            self.sync()
+            self.wfile.close()
+            self.close_reader()
+
+
+def outbox(conf, name, deliver, batch=1):
+    # outbox of a sink, created on first use
+    return shared(("outbox", name), lambda: GrottOutbox(name, conf.outboxdir, deliver, conf.outboxsize * 1024 * 1024, conf.outboxsegment * 1024,
+                                                       conf.outboxfsync, conf.outboxrate, conf.verbose, batch))
@@ -0,0 +1,76 @@
+# grottpipeline.py decode and sink pipeline
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# The network loop (proxy, sniffer) only puts the received frames in the pipeline and returns. A pool of
+# worker threads decodes the frames and sends them to the sinks (procdata), so forwarding to the Growatt
+# server does not wait for MQTT, InfluxDB, PVOutput or the extension.
+# Every worker has its own bounded queue. Frames are assigned to a worker by datalogger serial (bytes 8-18 of
+# the record, also usable without decryption), so the records of a datalogger are processed in order by
+# the same worker. If a queue is full the oldest frame is dropped. Queue depth and counters are shown with
+# verbose and available with stats().
+
+import zlib
+
+from grottdata import procdata
+from grottqueue import GrottWorker, shared
+
+
+class GrottPipeline:
+
+    def __init__(self, conf, process):
+        self.conf = conf
+        self.process = process
+        self.maxqueue = max(1, conf.pipequeue)
+        self.workers = [GrottWorker("Grott pipeline worker " + str(index), self.maxqueue, self.handle, conf.verbose, thread="grottworker-" + str(index))
+                        for index in range(max(1, conf.pipeworkers))]
+        if conf.verbose: print("\t - " + "Grott pipeline started, workers:", len(self.workers), "queue size:", self.maxqueue)
+
+    def handle(self, frame):
+        # worker thread: process a frame
+        self.process(self.conf, frame)
+
+    def partition(self, frame):
+        # worker of a frame: by datalogger serial (the same for all records of a datalogger)
+        return zlib.crc32(frame.data[8:18]) % len(self.workers)
+
+    def put(self, frame):
+        # queue a frame for processing, returns immediately
+        index = self.partition(frame)
+        worker = self.workers[index]
+        worker.put(frame)
+        if self.conf.verbose: print("\t - " + "Grott record queued for worker", index, "queue depth:", len(worker))
+
+    def depth(self):
+        # waiting frames per worker
+        return [len(worker) for worker in self.workers]
+
+    def stats(self):
+        # counters per worker
+        return [{"worker": index, "depth": len(worker), "processed": worker.processed,
+                 "dropped": worker.dropped, "failed": worker.failed} for index, worker in enumerate(self.workers)]
+
+    def join(self, timeout=None):
+        # wait until all queued frames are processed (returns False on timeout)
+        for worker in self.workers:
+            if not worker.join(timeout):
+                return False
+        return True
+
+    def stop(self, timeout=5):
+        # process the waiting frames and stop
+        for worker in self.workers:
+            worker.stop(timeout)
+
+
+def pipeline(conf):
+    # pipeline of this process, created on first use
+    return shared("pipeline", lambda: GrottPipeline(conf, procdata))
+
+
+def process(conf, frame):
+    # process a frame: by the pipeline workers, or directly if no workers are configured (pipeworkers = 0)
+    if conf.pipeworkers > 0:
+        pipeline(conf).put(frame)
+    else:
+        procdata(conf, frame)
@@ -3,19 +3,24 @@
 # Updated: 2022-08-07
 # Version 2.7.5
 
+import os
+import errno
 import socket
 import select
 import time
 import sys
 import struct
 import textwrap
-from itertools import cycle # to support "cycling" the iterator
 import time, json, datetime, codecs
 ## to resolve errno 32: broken pipe issue (only linux)
 if sys.platform != 'win32' :
    from signal import signal, SIGPIPE, SIG_DFL
 
-from grottdata import procdata, decrypt, format_multi_line
+from grottdata import format_multi_line
+from grottpipeline import process
+from grottframe import GrottFrame, GrottFramer
+from grottdns import resolver
+from grottmirror import mirror
 
 #import mqtt                       
 import paho.mqtt.publish as publish
@@ -30,64 +35,59 @@ except:
     print("\t **********************************************************************************")
 
 
-# Changing the buffer_size and delay, you can improve the speed and bandwidth.
-# But when buffer get to high or delay go too down, you can broke things
+# Changing the buffer_size, you can improve the speed and bandwidth.
+# But when buffer get to high, you can broke things
 buffer_size = 4096
 #buffer_size = 65535
-delay = 0.0002
+
+# connect_ex results of a non blocking connect in progress (Windows returns WSAEWOULDBLOCK)
+CONNECTING = tuple(rc for rc in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, getattr(errno, "WSAEWOULDBLOCK", None)) if rc is not None)
 
 def validate_record(xdata): 
     # validata data record on length and CRC (for "05" and "06" records)
-    
-    data = bytes.fromhex(xdata)
-    ldata = len(data)
-    len_orgpayload = int.from_bytes(data[4:6],"big")
-    header = "".join("{:02x}".format(n) for n in data[0:8])
-    protocol = header[6:8]
-
-    if protocol in ("05","06"):
-        lcrc = 4
-        crc = int.from_bytes(data[ldata-2:ldata],"big")
-    else: 
-        lcrc = 0
-
-    len_realpayload = (ldata*2 - 12 -lcrc) / 2
-
-    if protocol != "02" :
-                
-        try: 
-            crc_calc = libscrc.modbus(data[0:ldata-2])
-        except: 
-            #liscrc is not installed yet
-            #print("\t - Grott - Validate datarecord - libscrc not installed, only validation on record length")  
-            crc_calc = crc = 0 
-
-    if len_realpayload == len_orgpayload :
-        returncc = 0
-        if protocol != "02" and crc != crc_calc:     
-            returncc = 8    
-    else : 
-        returncc = 8
-
-    return(returncc)
+    return GrottFrame(bytes.fromhex(xdata)).validate()
 
 
 class Forward:
     def __init__(self):
-        self.forward = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.forward = None
+        self.address = None
 
-    def start(self, host, port):
+    def start(self, host, port, resolved):
+        #start a non blocking connect (completed in the proxy loop), resolved is the (done) DNS lookup of host 
+        self.host = host
+        self.port = port
         try:
-            self.forward.connect((host, port))
+            family, self.address = resolved.result()
+            self.forward = socket.socket(family, socket.SOCK_STREAM)
+            self.forward.setblocking(False)
+            rc = self.forward.connect_ex(self.address)
+            if rc not in CONNECTING : 
+                raise OSError(rc, os.strerror(rc))
             return self.forward
         except Exception as e:
             print("\t - Grott - grottproxy forward error : ", e) 
             #print(e)
+            if self.forward is not None : self.forward.close()
             return False  
 
 class Proxy:
     input_list = []
     channel = {}
+    #stream framer per socket (a receive can contain more or partial records)
+    framers = {}
+    #data waiting to be sent per socket (sent when the socket is writable)
+    outbuf = {}
+    #sockets not read because the socket they forward to has more than highwater bytes waiting (reader: writer)
+    paused = {}
+    #Growatt server connects in progress: socket -> (client socket, deadline, Forward)
+    connecting = {}
+    #clients waiting for the DNS lookup of the Growatt server: client socket -> (lookup future, deadline, address)
+    resolving = {}
+    #datalogger (client) sockets, records from these sockets are also sent to the second server 
+    clients = set()
+    #sockets closed after the waiting data is sent (the other side of the connection is closed): socket -> deadline 
+    closing = {}
 
     def __init__(self, conf):
         print("\nGrott proxy mode started")
@@ -119,61 +119,203 @@ class Proxy:
             print("IP and port information not available") 
 
         self.server.listen(200)
+        self.server.setblocking(False)
         self.forward_to = (conf.growattip, conf.growattport)
-        # if the second growatt server ip is configured use this as alternative
+        # if the second growatt server ip is configured the records are also sent to this server (own queue and writer thread)
         self.forward_to2 = None
         if conf.growattip2 != "" :
             self.forward_to2 = (conf.growattip2, conf.growattport2)
+        self.mirror = mirror(conf)
+        # look up the Growatt server addresses at startup (DNS cache) 
+        prefetch(conf, [self.forward_to, self.forward_to2])
 
     def main(self,conf):
         self.input_list.append(self.server)
         while 1:
-            time.sleep(delay)
             ss = select.select
-            inputready, outputready, exceptready = ss(self.input_list, [], [])
+            inputlist = [s for s in self.input_list if s not in self.paused]
+            #wait max until the first connect timeout 
+            timeout = None
+            if self.connecting : timeout = max(0, min(c[1] for c in self.connecting.values()) - time.monotonic())
+            if self.closing : 
+                closetimeout = max(0, min(self.closing.values()) - time.monotonic())
+                timeout = closetimeout if timeout is None else min(timeout, closetimeout)
+            #DNS lookups in the background are checked every 50 ms 
+            if self.resolving : timeout = 0.05 if timeout is None else min(timeout, 0.05)
+            #a connect is finished when the socket is writable, on Windows a failed connect is reported as exceptional
+            inputready, outputready, exceptready = ss(inputlist, list(self.outbuf) + list(self.connecting), list(self.connecting), timeout)
+            for self.s in exceptready:
+                if self.s in self.connecting : self.on_connect(conf)
+            for self.s in outputready:
+                if self.s in self.connecting : self.on_connect(conf)
+                elif self.s in self.outbuf : self.on_writable(conf)
+            self.check_resolving(conf)
+            self.check_connecting(conf)
+            self.check_closing(conf)
             for self.s in inputready:
+                #socket can be closed while handling an earlier socket
+                if self.s not in self.input_list : continue
                 if self.s == self.server:
                     self.on_accept(conf)
-                    break
+                    continue
                 try: 
                     self.data, self.addr = self.s.recvfrom(buffer_size)
+                except BlockingIOError: 
+                    continue
                 except: 
                     if conf.verbose : print("\t - Grott connection error") 
                     self.on_close(conf)   
-                    break
+                    continue
+                framer = self.framers.get(self.s)
+                if framer is None : framer = self.framers[self.s] = GrottFramer()
                 if len(self.data) == 0:
+                    #pass on the data of an incomplete record before closing
+                    for self.data in framer.flush():
+                        self.on_recv(conf)
                     self.on_close(conf)
-                    break
+                    continue
                 else:
-                    self.on_recv(conf)
+                    for self.data in framer.feed(self.data):
+                        self.on_recv(conf)
+
+    def send(self, conf, sock, data, reader=None):
+        #send data (non blocking), data that can not be sent now is kept and sent when the socket is writable. 
+        #If more than highwater bytes are waiting: reading from reader is paused, without reader data is dropped 
+        buf = self.outbuf.get(sock)
+        if buf is None:
+            try: 
+                sent = sock.send(data)
+            except BlockingIOError: 
+                sent = 0
+            except OSError as e: 
+                if conf.verbose : print("\t - Grott send error, data not forwarded:", e)
+                return
+            if sent == len(data) : return
+            data = memoryview(data)[sent:]
+            buf = self.outbuf[sock] = bytearray()
+        elif reader is None and len(buf) >= conf.highwater : 
+            if conf.verbose : print("\t - Grott destination not ready, data not forwarded:", len(data), "bytes")
+            return
+        buf += data
+        if reader is not None and len(buf) >= conf.highwater and reader not in self.paused : 
+            if conf.verbose : print("\t - Grott destination not ready, reading paused, bytes waiting:", len(buf))
+            self.paused[reader] = sock
+
+    def on_writable(self,conf):
+        #send waiting data, resume reading from the sockets paused for this socket below lowwater bytes 
+        buf = self.outbuf[self.s]
+        try: 
+            sent = self.s.send(buf)
+        except BlockingIOError: 
+            return
+        except OSError as e: 
+            if conf.verbose : print("\t - Grott send error, waiting data dropped:", e)
+            sent = len(buf)
+        del buf[:sent]
+        if len(buf) <= conf.lowwater : 
+            for reader in [r for r, w in self.paused.items() if w is self.s] : 
+                del self.paused[reader]
+                if conf.verbose : print("\t - Grott reading resumed")
+        if not buf : 
+            del self.outbuf[self.s]
+            #other side already closed: all data is sent, close 
+            if self.s in self.closing : 
+                del self.closing[self.s]
+                self.s.close()
+
+    def forget(self, sock):
+        #remove the buffers of a closed socket
+        self.framers.pop(sock, None)
+        self.outbuf.pop(sock, None)
+        self.paused.pop(sock, None)
+        for reader in [r for r, w in self.paused.items() if w is sock] : 
+            del self.paused[reader]
 
     def on_accept(self,conf):
-        forward = Forward().start(self.forward_to[0], self.forward_to[1])
-        clientsock, clientaddr = self.server.accept()
-        if forward:
-            if conf.verbose: print("\t -", clientaddr, "has connected")
-            self.input_list.append(clientsock)
-            self.input_list.append(forward)
-            self.channel[clientsock] = forward
-            self.channel[forward] = clientsock
-            
-            # Setup second forward connection if configured
-            if self.forward_to2 is not None:
-                forward2 = Forward().start(self.forward_to2[0], self.forward_to2[1])
-                if forward2:
-                    if conf.verbose: print("\t - Second forward connection established to", self.forward_to2)
-                    self.input_list.append(forward2)
-                    # Store second forward with a special key to track it
-                    self.channel[(clientsock, 'forward2')] = forward2
-                    self.channel[forward2] = clientsock
-                else:
-                    if conf.verbose: print("\t - Warning: Can't establish second forward connection to", self.forward_to2)
-        else:
+        try: 
+            clientsock, clientaddr = self.server.accept()
+        except (BlockingIOError, InterruptedError, ConnectionAbortedError): 
+            #connection is gone before it is accepted (e.g. reset by the client)
+            return
+        except OSError as e: 
+            print("\t - Grott accept error:", e)
+            return
+        clientsock.setblocking(False)
+        #connect to the Growatt server, the client is read when the connection is established (on_connect)
+        if not self.connect(conf, clientsock, self.forward_to):
             if conf.verbose: 
                 print("\t - Can't establish connection with remote server."),
                 print("\t - Closing connection with client side", clientaddr)
             clientsock.close()
 
+    def connect(self, conf, clientsock, address):
+        #start a non blocking connect for a client, if the address is not in the DNS cache the connect is started 
+        #when the lookup (in the background) is done 
+        lookup = resolver(conf).submit(address[0], address[1])
+        deadline = time.monotonic() + conf.connecttimeout
+        if not lookup.done():
+            self.resolving[clientsock] = (lookup, deadline, address)
+            return True
+        return self.start_connect(conf, clientsock, address, lookup, deadline)
+
+    def start_connect(self, conf, clientsock, address, lookup, deadline):
+        forward = Forward()
+        sock = forward.start(address[0], address[1], lookup)
+        if sock : self.connecting[sock] = (clientsock, deadline, forward)
+        return sock
+
+    def check_resolving(self, conf):
+        #start the connects of the clients whose DNS lookup is done, lookups that take more than connecttimeout seconds fail
+        now = time.monotonic()
+        for clientsock, (lookup, deadline, address) in list(self.resolving.items()):
+            if lookup.done():
+                del self.resolving[clientsock]
+                if self.start_connect(conf, clientsock, address, lookup, deadline) : continue
+            elif now >= deadline:
+                del self.resolving[clientsock]
+                print("\t - Grott - grottproxy forward error : ", address, "DNS lookup timeout") 
+            else:
+                continue
+            if conf.verbose: 
+                print("\t - Can't establish connection with remote server."),
+                print("\t - Closing connection with client side")
+            clientsock.close()
+
+    def on_connect(self,conf):
+        #connect finished (socket writable or exceptional), the result of the connect is in SO_ERROR 
+        clientsock, deadline, forward = self.connecting.pop(self.s)
+        err = self.s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err : 
+            self.connect_failed(conf, self.s, clientsock, forward, os.strerror(err))
+            return
+        if conf.verbose: 
+            try: 
+                print("\t -", clientsock.getpeername(), "has connected")
+            except: 
+                print("\t -", "peer has connected")
+        self.input_list.append(clientsock)
+        self.input_list.append(self.s)
+        self.channel[clientsock] = self.s
+        self.channel[self.s] = clientsock
+        self.clients.add(clientsock)
+
+    def connect_failed(self, conf, sock, clientsock, forward, reason):
+        print("\t - Grott - grottproxy forward error : ", (forward.host, forward.port), reason) 
+        resolver(conf).failed(forward.host, forward.port, forward.address)
+        sock.close()
+        if conf.verbose: 
+            print("\t - Can't establish connection with remote server."),
+            print("\t - Closing connection with client side")
+        clientsock.close()
+
+    def check_connecting(self,conf):
+        #connects that take more than connecttimeout seconds fail
+        now = time.monotonic()
+        for sock, (clientsock, deadline, forward) in list(self.connecting.items()):
+            if now >= deadline:
+                del self.connecting[sock]
+                self.connect_failed(conf, sock, clientsock, forward, "connect timeout")
+
     def on_close(self,conf):
         if conf.verbose: 
             #try / except to resolve errno 107: Transport endpoint is not connected 
@@ -182,127 +324,172 @@ class Proxy:
             except:  
                 print("\t -", "peer has disconnected")
 
-        #remove objects from input_list
+        #remove objects from input_list (no more reading from both sides)
         self.input_list.remove(self.s)
         self.input_list.remove(self.channel[self.s])
         out = self.channel[self.s]
         
-        # Close second forward connection if it exists
-        forward2_key = (out, 'forward2')
-        if forward2_key in self.channel:
-            forward2 = self.channel[forward2_key]
-            if forward2 in self.input_list:
-                self.input_list.remove(forward2)
-            forward2.close()
-            del self.channel[forward2]
-            del self.channel[forward2_key]
+        # Close second forward connection (after the queued records)
+        clientsock = self.s if self.s in self.clients else out
+        self.clients.discard(clientsock)
+        if self.mirror is not None : self.mirror.close(clientsock)
         
-        # close the connection with client
-        self.channel[out].close()  # equivalent to do self.s.close()
-        # close the connection with remote server
-        self.channel[self.s].close()
+        # close the closed side, the other side is closed when the data waiting for it is sent (half close) 
+        self.forget(self.s)
+        self.s.close()
+        if out in self.outbuf : 
+            pending = self.outbuf[out]
+            self.forget(out)
+            self.outbuf[out] = pending
+            self.closing[out] = time.monotonic() + conf.connecttimeout
+            if conf.verbose : print("\t - Grott sending waiting data before closing:", len(pending), "bytes")
+        else: 
+            self.forget(out)
+            out.close()
         # delete both objects from channel dict
         del self.channel[out]
         del self.channel[self.s]
 
+    def check_closing(self,conf):
+        #sockets that could not send their waiting data within connecttimeout seconds are closed (data dropped) 
+        now = time.monotonic()
+        for sock, deadline in list(self.closing.items()):
+            if now >= deadline:
+                del self.closing[sock]
+                if conf.verbose : print("\t - Grott destination not ready, waiting data dropped:", len(self.outbuf.get(sock, b"")), "bytes")
+                self.outbuf.pop(sock, None)
+                sock.close()
+
     def on_recv(self,conf):
         data = self.data      
         print("")
         print("\t - " + "Growatt packet received:") 
         print("\t\t ", self.channel[self.s])
         
-        #test if record is not corrupted
-        vdata = "".join("{:02x}".format(n) for n in data)
-        validatecc = validate_record(vdata)
-        if validatecc != 0 : 
-            print(f"\t - Grott - grottproxy - Invalid data record received, processing stopped for this record")
-            #Create response if needed? 
-            #self.send_queuereg[qname].put(response)
-            return  
-
-        # FILTER!!!!!!!! Detect if configure data is sent!
-        header = "".join("{:02x}".format(n) for n in data[0:8])
+        #create frame (header is parsed and data decrypted only once for all processing steps) 
+        frame = GrottFrame(data)
+
+        #test if record is valid and not blocked
+        try: 
+            forward = inspect_record(conf, frame)
+        except Exception as e: 
+            #record can not be inspected: forwarded (not if commands are blocked), the proxy continues 
+            forward = not conf.blockcmd
+            if conf.verbose : print("\t - Grott - grottproxy record inspection error, record", "forwarded:" if forward else "not forwarded:", repr(e))
+        if not forward : return
+
+        # send data to destination (reading from this socket is paused if the destination can not keep up)
+        self.send(conf, self.channel[self.s], data, self.s)
         
-        # Log external commands (06 = write inverter register, 10 = write multiple registers)
-        if header[14:16] in ("06", "10"):
-            if header[6:8] == "05" or header[6:8] == "06": 
-                cmddata = decrypt(data)
-            else:
-                cmddata = "".join("{:02x}".format(n) for n in data)
-            
-            # Determine offset based on protocol
-            offset = 40 if header[6:8] == "06" else 0
-            
-            if header[14:16] == "06":
-                # Single register write (command 06)
-                register = int(cmddata[36+offset:40+offset], 16)
-                value = int(cmddata[42+offset:46+offset], 16)
-                print(f"\t - Grott: External Write Command - Register: {register} (0x{register:04x}), Value: {value} (0x{value:04x})")
-            elif header[14:16] == "10":
-                # Multi-register write (command 10)
-                startregister = int(cmddata[36+offset:40+offset], 16)
-                endregister = int(cmddata[40+offset:44+offset], 16)
-                values_hex = cmddata[44+offset:]
-                num_regs = endregister - startregister + 1
-                print(f"\t - Grott: External Multi-Write Command - Registers: {startregister}-{endregister}")
-                # Parse and log individual register values
-                for i in range(num_regs):
-                    if (i * 4 + 4) <= len(values_hex):
-                        reg_value = int(values_hex[i*4:(i*4)+4], 16)
-                        reg_num = startregister + i
-                        print(f"\t\t   Register {reg_num} (0x{reg_num:04x}) = {reg_value} (0x{reg_value:04x})")
+        # Also send records from the datalogger to the second server (queued for the mirror writer)
+        if self.mirror is not None and self.s in self.clients:
+            self.mirror.put(self.s, data)
+            if conf.verbose: print("\t - Data also queued for second destination")
         
-        if conf.blockcmd : 
-            #standard everything is blocked!
-            print("\t - " + "Growatt command block checking started") 
-            blockflag = True 
-            #partly block configure Shine commands                   
-            if header[14:16] == "18" :         
-                if conf.blockcmd : 
-                    if header[6:8] == "05" or header[6:8] == "06" : confdata = decrypt(data) 
-                    else :  confdata = data
-
-                    #get conf command (location depends on record type), maybe later more flexibility is needed
-                    if header[6:8] == "06" : confcmd = confdata[76:80]
-                    else: confcmd = confdata[36:40]
-                    
-                    if header[14:16] == "18" : 
-                        #do not block if configure time command of configure IP (if noipf flag set)
-                        if conf.verbose : print("\t - Grott: Shine Configure command detected")                                                    
-                        if confcmd == "001f" or (confcmd == "0011" and conf.noipf) : 
-                            blockflag = False
-                            if confcmd == "001f": confcmd = "Time"
-                            if confcmd == "0011": confcmd = "Change IP"
-                            if conf.verbose : print("\t - Grott: Configure command not blocked : ", confcmd)    
-                    else : 
-                        #All configure inverter commands will be blocked
-                        if conf.verbose : print("\t - Grott: Inverter Configure command detected")
-            
-            #allow records: 
-            if header[12:16] in conf.recwl : blockflag = False     
-
-            if blockflag : 
-                print("\t - Grott: Record blocked: ", header[12:16])
-                if header[6:8] == "05" or header[6:8] == "06" : blockeddata = decrypt(data) 
-                else :  blockeddata = data
-                print(format_multi_line("\t\t ",blockeddata))
-                return
+        try: 
+            process_record(conf, frame)
+        except Exception as e: 
+            if conf.verbose : print("\t - Grott - grottproxy record processing error:", repr(e))
+
+
+def prefetch(conf, addresses):
+    #look up the server names at startup (kept in the DNS cache), a lookup that takes longer than connecttimeout 
+    #is completed in the background 
+    for address in addresses:
+        if address is None : continue
+        try: 
+            resolver(conf).resolve(address[0], address[1], conf.connecttimeout)
+        except OSError as e: 
+            print("\t - Grott - DNS lookup failed for", address[0], ":", e)
 
-        # send data to destination
-        self.channel[self.s].send(data)
+
+def inspect_record(conf, frame):
+    #validate record, log external commands and apply command blocking: returns True if the record can be forwarded
+    data = frame.data
+
+    #test if record is not corrupted
+    validatecc = frame.validate()
+    if validatecc != 0 : 
+        print(f"\t - Grott - grottproxy - Invalid data record received, processing stopped for this record")
+        #Create response if needed? 
+        #self.send_queuereg[qname].put(response)
+        return False
+
+    # FILTER!!!!!!!! Detect if configure data is sent!
+    header = frame.header
+    
+    # Log external commands (06 = write inverter register, 10 = write multiple registers)
+    if header[14:16] in ("06", "10"):
+        if header[6:8] == "05" or header[6:8] == "06": 
+            cmddata = frame.descrambled.hex()
+        else:
+            cmddata = data.hex()
         
-        # Also send to second forward connection if it exists
-        forward2_key = (self.s, 'forward2')
-        if forward2_key in self.channel:
-            try:
-                self.channel[forward2_key].send(data)
-                if conf.verbose: print("\t - Data also forwarded to second destination")
-            except Exception as e:
-                if conf.verbose: print("\t - Error forwarding to second destination:", e)
+        # Determine offset based on protocol
+        offset = 40 if header[6:8] == "06" else 0
         
-        if len(data) > conf.minrecl :
-            #process received data
-            procdata(conf,data)    
-        else:     
-            if conf.verbose: print("\t - " + 'Data less then minimum record length, data not processed') 
+        if header[14:16] == "06":
+            # Single register write (command 06)
+            register = int(cmddata[36+offset:40+offset], 16)
+            value = int(cmddata[42+offset:46+offset], 16)
+            print(f"\t - Grott: External Write Command - Register: {register} (0x{register:04x}), Value: {value} (0x{value:04x})")
+        elif header[14:16] == "10":
+            # Multi-register write (command 10)
+            startregister = int(cmddata[36+offset:40+offset], 16)
+            endregister = int(cmddata[40+offset:44+offset], 16)
+            values_hex = cmddata[44+offset:]
+            num_regs = endregister - startregister + 1
+            print(f"\t - Grott: External Multi-Write Command - Registers: {startregister}-{endregister}")
+            # Parse and log individual register values
+            for i in range(num_regs):
+                if (i * 4 + 4) <= len(values_hex):
+                    reg_value = int(values_hex[i*4:(i*4)+4], 16)
+                    reg_num = startregister + i
+                    print(f"\t\t   Register {reg_num} (0x{reg_num:04x}) = {reg_value} (0x{reg_value:04x})")
+    
+    if conf.blockcmd : 
+        #standard everything is blocked!
+        print("\t - " + "Growatt command block checking started") 
+        blockflag = True 
+        #partly block configure Shine commands                   
+        if header[14:16] == "18" :         
+            if conf.blockcmd : 
+                if header[6:8] == "05" or header[6:8] == "06" : confdata = frame.descrambled.hex() 
+                else :  confdata = data.hex()
+
+                #get conf command (location depends on record type), maybe later more flexibility is needed
+                if header[6:8] == "06" : confcmd = confdata[76:80]
+                else: confcmd = confdata[36:40]
+                
+                if header[14:16] == "18" : 
+                    #do not block if configure time command of configure IP (if noipf flag set)
+                    if conf.verbose : print("\t - Grott: Shine Configure command detected")                                                    
+                    if confcmd == "001f" or (confcmd == "0011" and conf.noipf) : 
+                        blockflag = False
+                        if confcmd == "001f": confcmd = "Time"
+                        if confcmd == "0011": confcmd = "Change IP"
+                        if conf.verbose : print("\t - Grott: Configure command not blocked : ", confcmd)    
+                else : 
+                    #All configure inverter commands will be blocked
+                    if conf.verbose : print("\t - Grott: Inverter Configure command detected")
+        
+        #allow records: 
+        if header[12:16] in conf.recwl : blockflag = False     
+
+        if blockflag : 
+            print("\t - Grott: Record blocked: ", header[12:16])
+            if header[6:8] == "05" or header[6:8] == "06" : blockeddata = frame.descrambled 
+            else :  blockeddata = data
+            print(format_multi_line("\t\t ",blockeddata))
+            return False
+
+    return True
+
+
+def process_record(conf, frame):
+    #decode and send the record to the outputs (queued for the pipeline workers)
+    if len(frame.data) > conf.minrecl :
+        process(conf,frame)    
+    else:     
+        if conf.verbose: print("\t - " + 'Data less then minimum record length, data not processed') 
                 
\ No newline at end of file
@@ -0,0 +1,145 @@
+# grottpvout.py PVOutput uploader
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# procdata queues the PVOutput statuses per system id and returns. The uploader thread sends them with one
+# pooled requests.Session (strict timeouts). A single waiting status is sent with addstatus (pvurl), more
+# waiting statuses (e.g. buffered records after an internet outage) are sent with addbatchstatus
+# (pvbatchurl), max 30 statuses per call. Statuses that fail on a connection or server error stay queued and
+# are sent again later (calls are supervised, see grottsupervisor). The upload limit per inverter
+# (GrottPvOutLimit in grottdata, per status time) is applied by procdata.
+# requests is imported when the uploader is created, so it is only needed when PVOutput is enabled.
+
+import threading
+
+from grottsupervisor import supervisor
+from grottqueue import GrottQueue, shared
+
+# max statuses per addbatchstatus call (PVOutput limit)
+MAXBATCH = 30
+# status fields in addbatchstatus order
+BATCHFIELDS = ("d", "t", "v1", "v2", "v3", "v4", "v5", "v6")
+# request parameters that apply to all statuses in a batch
+BATCHFLAGS = ("c1", "n")
+
+
+class GrottPvOut:
+
+    def __init__(self, conf):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.conf = conf
+        self.verbose = conf.verbose
+        self.url = conf.pvurl
+        self.batchurl = conf.pvbatchurl
+        self.apikey = conf.pvapikey
+        self.timeout = (conf.pvtimeout, conf.pvtimeout * 3)
+        self.maxqueue = conf.pvqueue
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # waiting statuses per system id (GrottQueue with the condition of the uploader)
+        self.queues = {}
+        self.cond = threading.Condition()
+        self.running = True
+        self.sent = 0
+        self.thread = threading.Thread(target=self.run, name="grottpvout", daemon=True)
+        self.thread.start()
+
+    def put(self, systemid, data):
+        # queue a status for a system id, returns immediately (if the queue is full the oldest status is dropped)
+        with self.cond:
+            queue = self.queues.get(systemid)
+            if queue is None:
+                queue = self.queues[systemid] = GrottQueue("Grott PVOutput systemid " + str(systemid), self.maxqueue, self.verbose, "status", self.cond)
+            queue.put(data)
+
+    def send(self, systemid, statuses):
+        # send statuses (same flags) for a system id, raises an exception on connection and server errors
+        headers = {"X-Pvoutput-Apikey": self.apikey, "X-Pvoutput-SystemId": str(systemid)}
+        if len(statuses) == 1:
+            reqret = self.session.post(self.url, data=statuses[0], headers=headers, timeout=self.timeout)
+        else:
+            data = {"data": ";".join(batchstatus(status) for status in statuses)}
+            for flag in BATCHFLAGS:
+                if flag in statuses[0]: data[flag] = statuses[0][flag]
+            reqret = self.session.post(self.batchurl, data=data, headers=headers, timeout=self.timeout)
+        if self.verbose: print("\t - " + "Grott PVOutput response systemid", systemid, "statuses", len(statuses), ":", reqret.text)
+        if reqret.status_code >= 500:
+            raise ConnectionError("PVOutput server error " + str(reqret.status_code))
+        if reqret.status_code != 200:
+            #invalid status (or not authorised), sending again will not help
+            print("\t - " + "Grott PVOutput statuses rejected:", reqret.status_code, reqret.text)
+        self.sent += len(statuses)
+
+    def send_all(self, msgs):
+        # send a list of {"systemid", "data"} messages in batches (used by the outbox), raises exception on errors
+        batch = []
+        for msg in msgs + [None]:
+            if batch and (msg is None or msg["systemid"] != batch[0]["systemid"] or flags(msg["data"]) != flags(batch[0]["data"]) or len(batch) == MAXBATCH):
+                self.send(batch[0]["systemid"], [m["data"] for m in batch])
+                batch = []
+            if msg is not None: batch.append(msg)
+
+    def next_batch(self):
+        # next statuses to send: max 30 statuses with the same flags of one system id (called with lock)
+        for systemid, queue in self.queues.items():
+            if queue:
+                first = flags(queue.queue[0])
+                statuses = []
+                for status in queue.queue:
+                    if len(statuses) == MAXBATCH or flags(status) != first: break
+                    statuses.append(status)
+                return systemid, statuses
+        return None
+
+    def run(self):
+        # uploader thread
+        retrywait = 5
+        while True:
+            with self.cond:
+                while self.running and self.next_batch() is None:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                systemid, statuses = self.next_batch()
+                #round robin over the system ids
+                self.queues[systemid] = self.queues.pop(systemid)
+            try:
+                supervisor(self.conf, "pvoutput").call(self.send, systemid, statuses)
+                retrywait = 5
+            except Exception as e:
+                print("\t - " + "Grott PVOutput send failed, retry in", retrywait, "seconds:", str(e))
+                with self.cond:
+                    self.cond.wait_for(lambda: not self.running, retrywait)
+                retrywait = min(retrywait * 2, 300)
+                continue
+            with self.cond:
+                queue = self.queues[systemid].queue
+                for status in statuses:
+                    if queue and queue[0] is status: queue.popleft()
+
+    def stop(self, timeout=5):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.thread.join(timeout)
+        self.session.close()
+
+
+def flags(status):
+    return tuple(status.get(flag) for flag in BATCHFLAGS)
+
+
+def batchstatus(status):
+    # status in addbatchstatus format: d,t,v1,...,v6 (-1 = no value, trailing values without value omitted)
+    values = [str(status[field]) if field in status else "-1" for field in BATCHFIELDS]
+    while values[-1] == "-1":
+        values.pop()
+    return ",".join(values)
+
+
+def uploader(conf):
+    # PVOutput uploader of this process, created on first use
+    return shared("pvoutput", lambda: GrottPvOut(conf))
@@ -0,0 +1,113 @@
+# grottqueue.py shared instances, bounded queues and worker threads
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# The outputs (MQTT, InfluxDB, PVOutput, extensions), the outbox, the sink supervisors, the pipeline, the second
+# server writer and the DNS cache have one instance per process (per name), created on first use with shared().
+# The stop method of a shared instance is called at exit (e.g. to send the waiting messages).
+# GrottQueue is a bounded queue: if it is full the oldest item is dropped (the producer never waits).
+# GrottWorker is a GrottQueue with a thread that handles the items one by one in order of arrival.
+
+import atexit
+import threading
+from collections import deque
+
+_shared = {}
+# reentrant: an instance can use other shared instances when it is created
+_lock = threading.RLock()
+
+
+def shared(key, create):
+    # instance for key in this process, created with create() on first use. The stop method of the instance
+    # (if it has one) is called at exit
+    try:
+        return _shared[key]
+    except KeyError:
+        pass
+    with _lock:
+        if key not in _shared:
+            instance = create()
+            if hasattr(instance, "stop"): atexit.register(instance.stop)
+            _shared[key] = instance
+        return _shared[key]
+
+
+class GrottQueue:
+
+    def __init__(self, name, maxqueue, verbose=False, item="record", cond=None):
+        # name and item are used in the messages (e.g. "Grott MQTT", "message"). Queues can share a condition
+        self.name = name
+        self.maxqueue = max(1, maxqueue)
+        self.verbose = verbose
+        self.item = item
+        self.queue = deque()
+        self.cond = cond if cond is not None else threading.Condition()
+        self.running = True
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def put(self, item):
+        # queue an item and return immediately, returns the dropped item (None if the queue was not full)
+        with self.cond:
+            dropped = None
+            if len(self.queue) >= self.maxqueue:
+                dropped = self.queue.popleft()
+                self.dropped += 1
+                if self.verbose: print("\t - " + self.name, "queue full, oldest", self.item, "dropped, total dropped:", self.dropped)
+            self.queue.append(item)
+            self.cond.notify()
+            return dropped
+
+
+class GrottWorker(GrottQueue):
+
+    def __init__(self, name, maxqueue, handle, verbose=False, item="record", thread=None, interval=None, idle=None, drain=True):
+        # handle(item) is called by the worker thread for every item. idle() is called when there was no item for
+        # interval seconds. On stop the waiting items are handled first (unless drain is False)
+        GrottQueue.__init__(self, name, maxqueue, verbose, item)
+        self.handle = handle
+        self.interval = interval
+        self.idle = idle
+        self.drain = drain
+        self.busy = False
+        self.processed = 0
+        self.failed = 0
+        self.thread = threading.Thread(target=self.run, name=thread or name, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        # worker thread: handle the items in order of arrival
+        while True:
+            with self.cond:
+                if self.running and not self.queue:
+                    self.cond.wait(self.interval)
+                if not self.running and not (self.drain and self.queue):
+                    return
+                item = self.queue.popleft() if self.queue else None
+                self.busy = item is not None
+            if item is None:
+                if self.idle is not None: self.idle()
+                continue
+            try:
+                self.handle(item)
+            except Exception as e:
+                with self.cond:
+                    self.failed += 1
+                print("\t - " + self.name, self.item, "processing error:", str(e))
+            with self.cond:
+                self.busy = False
+                self.processed += 1
+                if not self.queue: self.cond.notify_all()
+
+    def join(self, timeout=None):
+        # wait until the queued items are handled (returns False on timeout)
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.queue and not self.busy, timeout)
+
+    def stop(self, timeout=5):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.thread.join(timeout)
@@ -7,12 +7,14 @@ import threading
 import time
 import http.server
 import json, codecs 
-from itertools import cycle
 from io import BytesIO
 from datetime import datetime
 from urllib.parse import urlparse, parse_qs, parse_qsl  
 from collections import defaultdict
 
+from grottcodec import scramble
+from grottframe import GrottFrame, GrottFramer
+
 # grottserver.py emulates the server.growatt.com website and is initial developed for debugging and testing grott.
 # Updated: 2023-09-19
 # Version:
@@ -44,56 +46,6 @@ def format_multi_line(prefix, string, size=80):
     return '\n'.join([prefix + line for line in textwrap.wrap(string, size)])
 
 
-# encrypt / decrypt data.
-def decrypt(decdata):
-
-    ndecdata = len(decdata)
-
-    # Create mask and convert to hexadecimal
-    mask = "Growatt"
-    hex_mask = ['{:02x}'.format(ord(x)) for x in mask]
-    nmask = len(hex_mask)
-
-    # start decrypt routine
-    unscrambled = list(decdata[0:8])  # take unscramble header
-
-    for i, j in zip(range(0, ndecdata-8), cycle(range(0, nmask))):
-        unscrambled = unscrambled + [decdata[i+8] ^ int(hex_mask[j], 16)]
-
-    result_string = "".join("{:02x}".format(n) for n in unscrambled)
-
-    print("\t - " + "Grott - data decrypted V2")
-    return result_string
-
-def validate_record(xdata): 
-    # validata data record on length and CRC (for "05" and "06" records)
-    
-    data = bytes.fromhex(xdata)
-    ldata = len(data)
-    len_orgpayload = int.from_bytes(data[4:6],"big")
-    header = "".join("{:02x}".format(n) for n in data[0:8])
-    protocol = header[6:8]
-
-    if protocol in ("05","06"):
-        lcrc = 4
-        crc = int.from_bytes(data[ldata-2:ldata],"big")
-    else: 
-        lcrc = 0
-
-    len_realpayload = (ldata*2 - 12 -lcrc) / 2
-
-    if protocol != "02" :
-                crc_calc = libscrc.modbus(data[0:ldata-2])
-
-    if len_realpayload == len_orgpayload :
-        returncc = 0
-        if protocol != "02" and crc != crc_calc:     
-            returncc = 8    
-    else : 
-        returncc = 8
-
-    return(returncc)
-
 def htmlsendresp(self, responserc, responseheader,  responsetxt) : 
         #send response
         self.send_response(responserc)
@@ -130,9 +82,9 @@ def createtimecommand(protocol,loggerid,sequenceno) :
 
         if protocol != "02" :
             #encrypt message 
-            body = decrypt(body) 
-            crc16 = libscrc.modbus(bytes.fromhex(body))
-            body = bytes.fromhex(body) + crc16.to_bytes(2, "big")
+            body = scramble(body) 
+            crc16 = libscrc.modbus(body)
+            body = body + crc16.to_bytes(2, "big")
         
         if verbose:
             print("\t - Grottserver - Time command created :")
@@ -421,9 +373,9 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
 
                 if loggerreg[dataloggerid]["protocol"] != "02" :
                     #encrypt message 
-                    body = decrypt(body) 
-                    crc16 = libscrc.modbus(bytes.fromhex(body))
-                    body = bytes.fromhex(body) + crc16.to_bytes(2, "big")
+                    body = scramble(body) 
+                    crc16 = libscrc.modbus(body)
+                    body = body + crc16.to_bytes(2, "big")
 
                 # add header
                 if verbose:
@@ -775,9 +727,9 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
                 
                 if loggerreg[dataloggerid]["protocol"] != "02" :
                     #encrypt message 
-                    body = decrypt(body) 
-                    crc16 = libscrc.modbus(bytes.fromhex(body))
-                    body = bytes.fromhex(body) + crc16.to_bytes(2, "big")
+                    body = scramble(body) 
+                    crc16 = libscrc.modbus(body)
+                    body = body + crc16.to_bytes(2, "big")
 
                 # queue command 
                 qname = loggerreg[dataloggerid]["ip"] + "_" + str(loggerreg[dataloggerid]["port"])
@@ -877,6 +829,8 @@ class sendrecvserver:
 
         self.inputs = [self.server]
         self.outputs = []
+        #stream framer per connection (a receive can contain more or partial records)
+        self.framers = {}
         self.send_queuereg = send_queuereg
         
         print(f"\t - Grottserver - Ready to listen at: {host}:{port}")
@@ -904,11 +858,16 @@ class sendrecvserver:
             else:
                 # Existing connection
                 try:
-                    data = s.recv(1024)
+                    data = s.recv(4096)
+                    framer = self.framers.get(s)
+                    if framer is None: framer = self.framers[s] = GrottFramer()
                     if data:
-                        self.process_data(s, data)
+                        for record in framer.feed(data):
+                            self.process_data(s, record)
                     else:
-                        # Empty read means connection is closed, perform cleanup
+                        # Empty read means connection is closed, process the data of an incomplete record and perform cleanup
+                        for record in framer.flush():
+                            self.process_data(s, record)
                         self.close_connection(s)
                 #except ConnectionResetError:
                 except:
@@ -963,11 +922,21 @@ class sendrecvserver:
     def handle_new_connection(self, s):
         try: 
             connection, client_address = s.accept()
+        except (BlockingIOError, InterruptedError, ConnectionAbortedError): 
+            #connection is gone before it is accepted (e.g. reset by the client)
+            return
+        try: 
             connection.setblocking(0)
+            client_address, client_port = connection.getpeername()
+        except OSError as e: 
+            #connection reset directly after accept
+            print("\t - Grottserver - connection closed before it was registered : ", e)
+            connection.close()
+            return
+        try: 
             self.inputs.append(connection)
             self.outputs.append(connection)
             print(f"\t - Grottserver - Socket connection received from {client_address}")
-            client_address, client_port = connection.getpeername()
             qname = client_address + "_" + str(client_port)
 
             #create queue
@@ -993,6 +962,7 @@ class sendrecvserver:
                 pass
             
             # Remove from tracking lists
+            self.framers.pop(s, None)
             if s in self.outputs:
                 self.outputs.remove(s)
             if s in self.inputs:
@@ -1057,10 +1027,11 @@ class sendrecvserver:
                 print("\t - " + "Grottserver - Original Data:")
                 print(format_multi_line("\t\t ", data))
             
+            #create frame, header is parsed and data is decrypted only once  
+            frame = GrottFrame(data)
+
             #validate data (Length + CRC for 05/06)
-            #join gebeurt nu meerdere keren! Stroomlijnen!!!! 
-            vdata = "".join("{:02x}".format(n) for n in data)
-            #validatecc = validate_record(vdata)
+            #validatecc = frame.validate()
             validatecc = 0
             if validatecc != 0 : 
                 print(f"\t - Grottserver - Invalid data record received, processing stopped for this record")
@@ -1069,16 +1040,12 @@ class sendrecvserver:
                 return  
 
             # Create header
-            header = "".join("{:02x}".format(n) for n in data[0:8])
-            protocol = header[6:8]
+            header = frame.header
+            protocol = frame.protocol
             sequencenumber = header[0:4]
-            protocol = header[6:8]
             #command = header[14:16]
-            rectype = header[14:16]
-            if protocol in ("05","06") :
-                result_string = decrypt(data) 
-            else :         
-                result_string = "".join("{:02x}".format(n) for n in data)
+            rectype = frame.command
+            result_string = frame.plain.hex()
             if verbose:
                 print("\t - Grottserver - Plain record: ")
                 print(format_multi_line("\t\t ", result_string))
@@ -1124,15 +1091,6 @@ class sendrecvserver:
 
                 if rectype in ("03") : 
                 # init record register logger/inverter id (including sessionid?)
-                # decrypt body. 
-                    if header[6:8] in ("05","06") :
-                        #print("header1 : ", header[6:8])
-                        result_string = decrypt(data) 
-                    else :         
-                        result_string = data.hex()   
-            
-                    loggerid = result_string[16:36]
-                    loggerid = codecs.decode(loggerid, "hex").decode('utf-8')
                     if header[6:8] in ("02","05") :                    
                         inverterid = result_string[36:56]
                     else : 
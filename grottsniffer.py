@@ -7,7 +7,8 @@ import struct
 #from itertools import cycle # to support "cycling" the iterator
 #import time, json, datetime, codecs
 
-from grottdata import procdata
+from grottpipeline import process
+from grottframe import GrottFrame
 
 class Sniff:
     def __init__(self,conf):
@@ -53,7 +54,7 @@ class Sniff:
                             print("\t\t\t - " + 'RST: {}, SYN: {}, FIN:{}'.format(self.tcp.flag_rst, self.tcp.flag_syn, self.tcp.flag_fin))
 
                         if len(self.tcp.data) > conf.minrecl :
-                            procdata(conf,self.tcp.data)    
+                            process(conf,GrottFrame(self.tcp.data))    
                         else:     
                             if conf.verbose: print("\t - " + 'Data less then minimum record length, data not processed') 
                             
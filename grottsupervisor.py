@@ -0,0 +1,117 @@
+# grottsupervisor.py sink supervisor: deadlines and circuit breakers
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# Calls to a sink (InfluxDB, PVOutput, outbox deliveries, extension) are run by the supervisor of that sink on
+# a separate thread and may take at most sinkdeadline seconds. A call that raises an exception or exceeds the
+# deadline is a failure. After sinkfailures failures in a row the circuit breaker opens: calls fail
+# immediately (CircuitOpenError) without contacting the sink. After sinkprobe seconds one call is let through
+# as probe (half open): if it succeeds the breaker closes, otherwise it opens again.
+# A call that exceeded its deadline keeps running in the background, new calls fail immediately until it ends.
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from grottqueue import shared
+
+CLOSED = "closed"
+OPEN = "open"
+HALFOPEN = "half open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class SinkTimeoutError(Exception):
+    pass
+
+
+class GrottSink:
+
+    def __init__(self, name, deadline=10, failures=3, probe=30, verbose=False):
+        self.name = name
+        self.deadline = deadline
+        self.maxfailures = failures
+        self.probe = probe
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.openedat = 0
+        self.probing = False
+        self.hung = None
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="grottsink-" + name)
+        # counters
+        self.calls = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def admit(self):
+        # check if a call is allowed (closed, or probe when half open), called with lock. The caller reports
+        # the result with success() or failure() (also used for calls not run by the executor, e.g. async)
+        if self.hung is not None and not self.hung.done():
+            self.rejected += 1
+            raise SinkTimeoutError(self.name + " call that exceeded the deadline still running")
+        if self.state == OPEN:
+            if time.monotonic() - self.openedat < self.probe:
+                self.rejected += 1
+                raise CircuitOpenError(self.name + " circuit open")
+            self.state = HALFOPEN
+            print("\t - " + "Grott sink", self.name, "circuit half open, probing")
+        if self.state == HALFOPEN:
+            if self.probing:
+                self.rejected += 1
+                raise CircuitOpenError(self.name + " circuit half open, probe running")
+            self.probing = True
+        self.calls += 1
+
+    def acquire(self):
+        with self.lock:
+            self.admit()
+
+    def submit(self, fn, args, kwargs):
+        # start a call if it is allowed
+        with self.lock:
+            self.admit()
+            return self.executor.submit(fn, *args, **kwargs)
+
+    def success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                print("\t - " + "Grott sink", self.name, "circuit closed")
+            self.state = CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def failure(self, error):
+        with self.lock:
+            self.failed += 1
+            self.failures += 1
+            self.probing = False
+            if self.state == HALFOPEN or (self.state == CLOSED and self.failures >= self.maxfailures):
+                print("\t - " + "Grott sink", self.name, "circuit open after", self.failures, "failures, probe in", self.probe, "seconds:", str(error))
+                self.state = OPEN
+                self.openedat = time.monotonic()
+
+    def call(self, fn, *args, **kwargs):
+        # run fn with deadline, raises CircuitOpenError / SinkTimeoutError or the exception of fn
+        future = self.submit(fn, args, kwargs)
+        try:
+            result = future.result(timeout=self.deadline)
+        except FutureTimeout:
+            self.hung = future
+            error = SinkTimeoutError(self.name + " deadline of " + str(self.deadline) + " seconds exceeded")
+            self.failure(error)
+            raise error
+        except Exception as e:
+            self.failure(e)
+            raise
+        self.success()
+        return result
+
+
+def supervisor(conf, name):
+    # supervisor of a sink, created on first use
+    return shared(("supervisor", name), lambda: GrottSink(name, conf.sinkdeadline, conf.sinkfailures, conf.sinkprobe, conf.verbose))
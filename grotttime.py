@@ -0,0 +1,113 @@
+# grotttime.py record date/time processing
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# The record date/time (6 bytes: year-2000, month, day, hour, minute, second) is converted once per record
+# into a GrottTime. Every sink takes the format it needs from it (iso string for MQTT / extensions, d and t
+# for PVOutput, UTC time or epoch ns for InfluxDB) without parsing the date string again.
+# Timezones are resolved once per timezone name and the UTC offset is cached per hour (timezone changes
+# happen on the hour).
+
+from datetime import datetime, timedelta
+import time
+
+#pytz is optional, it is only needed for InfluxDB
+try:
+    import pytz
+except:
+    pytz = None
+
+EPOCH = datetime(1970, 1, 1)
+DATELEN = 6
+
+
+class GrottTime:
+    # record date/time (local time as in the record or from the server)
+
+    __slots__ = ("local", "fromserver")
+
+    def __init__(self, local, fromserver=False):
+        self.local = local
+        self.fromserver = fromserver
+
+    @classmethod
+    def now(cls):
+        return cls(datetime.now().replace(microsecond=0), True)
+
+    @property
+    def iso(self):
+        # 2023-05-17T10:11:12 (json time)
+        return self.local.isoformat()
+
+    @property
+    def pvodate(self):
+        # PVOutput date 20230517
+        return "{:04d}{:02d}{:02d}".format(self.local.year, self.local.month, self.local.day)
+
+    @property
+    def pvotime(self):
+        # PVOutput time 10:11
+        return "{:02d}:{:02d}".format(self.local.hour, self.local.minute)
+
+    def utc(self, tmzone="local"):
+        # UTC time (naive datetime)
+        return converter(tmzone).utc(self.local)
+
+    def epoch_ns(self, tmzone="local"):
+        # UTC epoch in nanoseconds (InfluxDB line protocol)
+        return (self.utc(tmzone) - EPOCH) // timedelta(seconds=1) * 1000000000
+
+
+def record_time(buf, dateoffset):
+    # date/time from the (decrypted) record bytes, dateoffset is the hex string position as in the layout.
+    # returns None if there is no valid date/time in the record
+    try:
+        if dateoffset % 2 == 0:
+            raw = bytes(buf[dateoffset // 2:dateoffset // 2 + DATELEN])
+        else:
+            raw = bytes.fromhex(bytes(buf).hex()[dateoffset:dateoffset + DATELEN * 2])
+        if len(raw) != DATELEN or raw[0] > 99:
+            return None
+        return GrottTime(datetime(2000 + raw[0], raw[1], raw[2], raw[3], raw[4], raw[5]))
+    except ValueError:
+        return None
+
+
+class TimeConverter:
+    # local to UTC conversion for one timezone, UTC offset cached per hour
+
+    def __init__(self, tmzone):
+        self.tmzone = tmzone
+        self.tz = None
+        self.offsets = {}
+        if tmzone != "local":
+            try:
+                self.tz = pytz.timezone(tmzone)
+            except:
+                print("\t - " + "Grott unknown timezone : ", tmzone, ", default timezone used")
+                self.tmzone = "local"
+
+    def utc(self, local):
+        if self.tz is None:
+            #local: fixed offset of the grott server timezone
+            return local + timedelta(seconds=time.timezone)
+        hour = local.replace(minute=0, second=0, microsecond=0)
+        offset = self.offsets.get(hour)
+        if offset is None:
+            offset = self.tz.localize(local, is_dst=None).utcoffset()
+            if len(self.offsets) > 1024:
+                self.offsets.clear()
+            self.offsets[hour] = offset
+        return local - offset
+
+
+_converters = {}
+
+
+def converter(tmzone):
+    # timezone converter, created once per timezone
+    try:
+        return _converters[tmzone]
+    except KeyError:
+        tc = _converters[tmzone] = TimeConverter(tmzone)
+        return tc
@@ -0,0 +1,13 @@
+# grottutil.py small helpers shared by the grott modules
+# Updated: 2026-10-16
+# Version 2.8.3
+#
+# Helpers without dependencies on the other grott modules, so they can be imported by every module
+# (e.g. grottlayout) without loading the processing and output modules.
+
+def str2bool(defstr):
+    if defstr in ("True", "true", "TRUE", "y", "Y", "yes", "YES", 1, "1") : defret = True 
+    if defstr in ("False", "false", "FALSE", "n", "N", "no", "NO", 0, "0") : defret = False 
+    if 'defret' in locals():
+        return(defret)
+    else : return()
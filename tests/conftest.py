@@ -0,0 +1,13 @@
+import sys, os
+
+# Required to import the grott modules from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def make_record(protocol, length, rnd):
+    "Random Growatt record with a valid header for protocol (02, 05 or 06) and the total length"
+
+    body = bytearray(rnd.getrandbits(8) for _ in range(length))
+    body[0:8] = bytes([0, rnd.getrandbits(8), 0, protocol, 0, 0, 1, 4])
+    body[4:6] = (length - 6 - (2 if protocol in (5, 6) else 0)).to_bytes(2, "big")
+    return bytes(body)
@@ -0,0 +1,155 @@
+import sys, os, json, random
+
+# Required to import grottbatch from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+import pytest
+np = pytest.importorskip("numpy")
+
+import grottdata
+from grottconf import Conf
+from grottcodec import scramble
+from grottbatch import decode_batch, time_column
+
+
+@pytest.fixture
+def conf():
+    conf = Conf("test")
+    conf.verbose = False
+    conf.compat = False
+    conf.invtype = "default"
+    conf.nomqtt = False
+    conf.outbox = False
+    conf.pvoutput = False
+    conf.influx = False
+    conf.extension = False
+    conf.mqttfields = None
+    return conf
+
+
+def digits(length, rnd):
+    return bytes(rnd.choice(b"0123456789") for _ in range(length))
+
+
+def frame_data(device, command, body):
+    "Protocol 06 record (scrambled, with 2 bytes for the CRC) with the plain body after the header"
+
+    plain = bytes([0, 1, 0, 6]) + (len(body) + 4).to_bytes(2, "big") + bytes([device, command]) + body + b"\0\0"
+    return scramble(plain)
+
+
+def inverter_record(length, rnd, date=None):
+    body = bytearray(digits(length - 10, rnd))
+    if date is not None:
+        body[68 - 8:68 - 8 + 6] = bytes(date)
+    return frame_data(0x01, 0x04, bytes(body))
+
+
+def meter_record(rnd, values=80):
+    #smart meter record with log fields: datalogger serial, filler and the comma separated values
+    log = ",".join("{:.2f}".format(rnd.uniform(-500, 500)) for _ in range(values)).encode("ascii")
+    return frame_data(0x50, 0x1b, digits(40, rnd) + log)
+
+
+def procdata_values(conf, monkeypatch, records):
+    "values (and time) as sent to MQTT by procdata for every record, None if the record is not processed"
+
+    sent = []
+    monkeypatch.setattr(grottdata, "mqtt_queue", lambda conf, msg: sent.append(json.loads(msg[1])))
+    out = []
+    for data in records:
+        del sent[:]
+        grottdata.procdata(conf, data)
+        out.append(sent[0] if sent else None)
+    return out
+
+
+def batch_rows(columns):
+    "rows of a column group as plain python values"
+
+    names = [name for name in columns if name not in ("time", "buffered")]
+    nrec = len(columns["device"])
+    return [{name: columns[name][i].item() if hasattr(columns[name][i], "item") else columns[name][i] for name in names}
+            for i in range(nrec)]
+
+
+def test_numeric_layout_equals_procdata(conf, monkeypatch):
+    "Test that the batch columns of an inverter layout have the values procdata sends (also short records)"
+
+    rnd = random.Random(1)
+    short = conf.decoders["T06NNNN"].recordlength
+    records = [inverter_record(500, rnd, (23, 5, 17, 10, 30, i)) for i in range(5)]
+    records += [inverter_record(500, rnd) for _ in range(5)]
+    records += [inverter_record(length, rnd) for length in (short + 2, short, short - 1, short - 3)]
+    expected = procdata_values(conf, monkeypatch, records)
+    columns = decode_batch(conf, records, divide=False)
+    assert set(columns) == {"T06NNNNX", "T06NNNN"}
+    rows = batch_rows(columns["T06NNNNX"]) + batch_rows(columns["T06NNNN"])
+    expected = [values for values in expected if values is not None]
+    assert len(rows) == len(expected) == len(records)
+    for row, msg in zip(rows, expected):
+        assert row.pop("device") == msg["device"]
+        assert row == msg["values"]
+    times = columns["T06NNNNX"]["time"]
+    assert [str(t) for t in times[:5]] == [msg["time"] for msg in expected[:5]]
+    assert np.isnat(times[5:]).all()
+
+
+def test_log_layout_equals_procdata(conf, monkeypatch):
+    "Test that log fields (smart meter layout with logstart) are in the batch columns as procdata sends them"
+
+    rnd = random.Random(2)
+    records = [meter_record(rnd) for _ in range(6)]
+    expected = procdata_values(conf, monkeypatch, records)
+    columns = decode_batch(conf, records, divide=False)
+    assert list(columns) == ["T06501b"]
+    logfields = [field[0] for field in conf.decoders["T06501b"].fields if field[1] >= 3]
+    assert len(logfields) > 30
+    assert set(logfields) <= set(columns["T06501b"])
+    rows = batch_rows(columns["T06501b"])
+    for row, msg in zip(rows, expected):
+        assert row == msg["values"]
+        assert row["device"] == "SDM630"
+
+
+def test_invalid_record_skipped(conf, monkeypatch):
+    "Test that a record procdata does not process (log field missing) is not in the batch"
+
+    rnd = random.Random(3)
+    records = [meter_record(rnd), meter_record(rnd, values=10), meter_record(rnd)]
+    expected = procdata_values(conf, monkeypatch, records)
+    assert expected[1] is None
+    columns = decode_batch(conf, records, divide=False)
+    assert len(columns["T06501b"]["device"]) == 2
+
+
+def test_time_column():
+    "Test the date/time at even and half byte positions, and dates that are not (completely) in the record"
+
+    date = bytes([23, 2, 28, 23, 59, 58])
+    rows = np.zeros((4, 20), dtype=np.uint8)
+    rows[0, 4:10] = np.frombuffer(date, dtype=np.uint8)
+    rows[1, 4:10] = np.frombuffer(bytes([23, 2, 30, 0, 0, 0]), dtype=np.uint8)
+    rows[2, 4:10] = np.frombuffer(date, dtype=np.uint8)
+    rows[3, 4:10] = np.frombuffer(bytes([123, 2, 28, 0, 0, 0]), dtype=np.uint8)
+    lengths = np.array([20, 20, 9, 20])
+    times = time_column(rows, lengths, 8)
+    assert str(times[0]) == "2023-02-28T23:59:58"
+    assert np.isnat(times[1:]).all()
+    #half byte position
+    shifted = np.frombuffer(bytes.fromhex("0" * 9 + date.hex() + "0" * 11), dtype=np.uint8).reshape(1, 16)
+    assert str(time_column(shifted, np.array([16]), 9)[0]) == "2023-02-28T23:59:58"
+    assert np.isnat(time_column(shifted, np.array([10]), 9)[0])
+
+
+def test_unsigned_8_bytes(conf):
+    "Test that unsigned 8 byte values over the int64 range are kept"
+
+    from grottlayout import GrottLayout
+    from grottbatch import decode_group
+
+    layout = GrottLayout("u8", {"decrypt": {"value": "False"}, "big": {"value": 16, "length": 8, "type": "num"}})
+    plain = bytes(8) + (2 ** 64 - 5).to_bytes(8, "big")
+    columns = decode_group(layout, [(plain, False, layout.decode(plain))], divide=False)
+    assert int(columns["big"][0]) == 2 ** 64 - 5
@@ -0,0 +1,77 @@
+import sys, os, random
+from itertools import cycle
+
+# Required to import grottcodec from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+import pytest
+from grottcodec import descramble, scramble
+from grottframe import GrottFrame
+from conftest import make_record
+
+
+# protocol 06 data record (examples/grotttest.py)
+record06 = bytes.fromhex(
+    "00320006010101040d222c4559454c74412d7761747447726f7761747447726f7761747447723e3a23464c75415d4150747447726f"
+    "7761747447726f7761747447726f7774767d4b7c65756174746b726e776161064e776f6061746135726f7761747447726f7772cf67"
+    "ce7b2a7774747454c96f7761747447726f7761747447726f7761747452726fd0d97796a77e6e7a61747447726f7761747447726f77"
+    "617474477ce977617474475f6f2e2f547447726f776174624772df4161747447726f77617474f7446f7761747447726f7761747447"
+    "726f7761747447726f7761747447786f776b287d457a9777607eb407066ef46ff376527ce87762747747656f7761747447726f6d03")
+
+
+def loop_decrypt(decdata):
+    "Byte loop descrambling as used by grottdata, grottproxy and grottserver before grottcodec (hex string)"
+
+    hex_mask = ['{:02x}'.format(ord(x)) for x in "Growatt"]
+    unscrambled = list(decdata[0:8])
+    for i, j in zip(range(0, len(decdata) - 8), cycle(range(0, len(hex_mask)))):
+        unscrambled = unscrambled + [decdata[i + 8] ^ int(hex_mask[j], 16)]
+    return "".join("{:02x}".format(n) for n in unscrambled)
+
+
+def test_known_record():
+    "Test that the protocol 06 record is descrambled as with the byte loop"
+
+    plain = descramble(record06)
+    assert plain.hex() == loop_decrypt(record06)
+    #datalogger serial is readable after descrambling
+    assert plain[8:18] == b"JPC281833B"
+    assert GrottFrame(record06).plain == plain
+
+
+@pytest.mark.parametrize("protocol", [5, 6])
+def test_scrambled_equals_loop(protocol):
+    "Test that protocol 05 and 06 records are descrambled as with the byte loop, for all mask alignments"
+
+    rnd = random.Random(protocol)
+    for length in list(range(0, 40)) + [265, 800, 7 * 1024 + 3, 9000]:
+        record = make_record(protocol, max(length, 8), rnd)[:length]
+        assert descramble(record).hex() == loop_decrypt(record)
+        assert GrottFrame(record).plain == descramble(record)
+
+
+def test_protocol_02_not_scrambled():
+    "Test that protocol 02 records are used as received"
+
+    rnd = random.Random(2)
+    record = make_record(2, 300, rnd)
+    frame = GrottFrame(record)
+    assert not frame.scrambled
+    assert frame.plain == record
+    #the codec itself always descrambles (used for protocol 05/06 and by layouts with decrypt = yes)
+    assert frame.descrambled.hex() == loop_decrypt(record)
+
+
+@pytest.mark.parametrize("protocol", [2, 5, 6])
+def test_round_trip(protocol):
+    "Test that scramble and descramble are each others inverse"
+
+    rnd = random.Random(10 + protocol)
+    for length in (0, 7, 8, 9, 100, 265, 10000):
+        record = make_record(protocol, max(length, 8), rnd)[:length]
+        assert scramble(descramble(record)) == record
+        assert descramble(scramble(record)) == record
+        assert descramble(bytearray(record)) == descramble(record)
+        #header is not scrambled
+        assert descramble(record)[:8] == record[:8]
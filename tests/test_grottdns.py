@@ -0,0 +1,107 @@
+import sys, os, socket
+
+# Required to import grottdns from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+import pytest
+import grottdns
+from grottdns import GrottResolver, NEGTTL, MAXSTALE
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def dns(monkeypatch):
+    "Resolver with a fake clock and getaddrinfo (answers from dns.answers, raises if the name is not there)"
+
+    clock = Clock()
+    monkeypatch.setattr(grottdns.time, "monotonic", clock)
+    resolver = GrottResolver(ttl=100)
+    resolver.clock = clock
+    resolver.answers = {"server.growatt.com": "10.0.0.1"}
+
+    def getaddrinfo(host, port, type=0):
+        if host not in resolver.answers: raise socket.gaierror("name not known")
+        return [(socket.AF_INET, type, 6, "", (resolver.answers[host], port))]
+
+    monkeypatch.setattr(grottdns.socket, "getaddrinfo", getaddrinfo)
+    yield resolver
+    resolver.executor.shutdown()
+
+
+def wait_lookups(dns):
+    "Wait for the background lookups"
+    with dns.lock:
+        pending = list(dns.pending.values())
+    for future in pending:
+        try:
+            future.result()
+        except OSError:
+            pass
+
+
+def test_cached_and_refreshed(dns):
+    "Test that a cached address is used and looked up again in the background before the ttl runs out"
+
+    assert dns.resolve("server.growatt.com", 5279, 5) == (socket.AF_INET, ("10.0.0.1", 5279))
+    assert dns.lookups == 1
+    dns.answers["server.growatt.com"] = "10.0.0.2"
+    dns.clock.now += 50
+    assert dns.resolve("server.growatt.com", 5279, 5)[1][0] == "10.0.0.1"
+    assert dns.lookups == 1
+    #refresh: the old address is used until the lookup is done
+    dns.clock.now += 40
+    assert dns.submit("server.growatt.com", 5279).result()[1][0] == "10.0.0.1"
+    wait_lookups(dns)
+    assert dns.lookups == 2
+    assert dns.cached("server.growatt.com", 5279)[1][0] == "10.0.0.2"
+
+
+def test_stale_address_expires(dns):
+    "Test that the last good address is used while the refresh fails, but not longer than MAXSTALE x ttl"
+
+    dns.resolve("server.growatt.com", 5279, 5)
+    del dns.answers["server.growatt.com"]
+    dns.clock.now += 90
+    assert dns.resolve("server.growatt.com", 5279, 5)[1][0] == "10.0.0.1"
+    wait_lookups(dns)
+    assert dns.failed_lookups == 1
+    dns.clock.now += 100 * MAXSTALE - 90
+    assert dns.cached("server.growatt.com", 5279) is None
+    #the old address is not used anymore: the connection waits for a new lookup (that fails)
+    with pytest.raises(OSError):
+        dns.resolve("server.growatt.com", 5279, 5)
+    assert ("server.growatt.com", 5279) not in dns.cache
+    dns.answers["server.growatt.com"] = "10.0.0.3"
+    dns.clock.now += NEGTTL
+    assert dns.resolve("server.growatt.com", 5279, 5)[1][0] == "10.0.0.3"
+
+
+def test_negative_cache(dns):
+    "Test that a failed lookup is not repeated within NEGTTL seconds"
+
+    with pytest.raises(OSError):
+        dns.resolve("unknown.growatt.com", 5279, 5)
+    dns.answers["unknown.growatt.com"] = "10.0.0.4"
+    dns.clock.now += NEGTTL - 1
+    with pytest.raises(OSError):
+        dns.resolve("unknown.growatt.com", 5279, 5)
+    assert (dns.lookups, dns.failed_lookups) == (1, 1)
+    dns.clock.now += 1
+    assert dns.resolve("unknown.growatt.com", 5279, 5)[1][0] == "10.0.0.4"
+    assert (dns.lookups, dns.failed_lookups) == (2, 1)
+
+
+def test_ip_address_not_looked_up(dns):
+    "Test that an IP address is used without lookup"
+
+    assert dns.resolve("192.168.1.10", 5279) == (socket.AF_INET, ("192.168.1.10", 5279))
+    assert dns.resolve("::1", 5279) == (socket.AF_INET6, ("::1", 5279))
+    assert dns.lookups == 0
@@ -0,0 +1,68 @@
+import sys, os, asyncio, threading, time
+from types import SimpleNamespace
+
+# Required to import grottextension from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+from grottextension import GrottExtension, extvar_for
+
+
+def config(**settings):
+    conf = SimpleNamespace(verbose=False, extqueue=3, sinkdeadline=5, sinkfailures=3, sinkprobe=30)
+    conf.__dict__.update(settings)
+    return conf
+
+
+def wait_until(test, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not test():
+        if time.monotonic() > deadline: return False
+        time.sleep(0.001)
+    return True
+
+
+def test_queue_full_drops_oldest():
+    "Test that a slow extension gets the latest records and the oldest waiting records are dropped"
+
+    release = threading.Event()
+    records = []
+
+    def grottext_record(conf, record):
+        release.wait(5)
+        records.append((conf.extvar, record["seq"]))
+
+    ext = GrottExtension(config(), "slow", SimpleNamespace(grottext_record=grottext_record), {"url": "x"}, None)
+    ext.put(None, {"seq": 0}, None, None)
+    assert wait_until(lambda: ext.worker.busy)
+    for seq in range(1, 10):
+        ext.put(None, {"seq": seq}, None, None)
+    assert ext.stats()["dropped"] == 6
+    release.set()
+    ext.stop()
+    assert records == [({"url": "x"}, seq) for seq in (0, 7, 8, 9)]
+    assert ext.stats() == {"extension": "slow", "queue": 0, "done": 4, "failed": 0, "skipped": 0, "dropped": 6}
+
+
+def test_async_max_running_calls():
+    "Test that an async extension runs max extqueue calls at the same time"
+
+    async def grottext_record(conf, record):
+        await asyncio.sleep(0.1)
+
+    ext = GrottExtension(config(), "async", SimpleNamespace(grottext_record=grottext_record), None, None)
+    for seq in range(5):
+        ext.put(None, {"seq": seq}, None, None)
+    assert ext.stats()["dropped"] == 2
+    assert wait_until(lambda: ext.stats()["done"] == 3)
+    assert ext.stats()["queue"] == 0
+    ext.stop()
+
+
+def test_extvar_for():
+    "Test that an extension gets its own dict from extvar, otherwise the complete extvar"
+
+    extvar = {"grottext": {"url": "http://localhost"}, "grotcsv": {"outpath": "/tmp"}}
+    assert extvar_for(extvar, "grotcsv", ["grottext", "grotcsv"]) == {"outpath": "/tmp"}
+    assert extvar_for({"url": "http://localhost"}, "grottext", ["grottext"]) == {"url": "http://localhost"}
+    assert extvar_for(extvar, "grotcsv", ["grotcsv"]) == extvar
@@ -0,0 +1,143 @@
+import sys, os, random
+
+# Required to import grottframe from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+from grottframe import GrottFramer
+from conftest import make_record
+
+
+def records(n, rnd):
+    return [make_record(rnd.choice((2, 5, 6)), rnd.randint(8, 600), rnd) for _ in range(n)]
+
+
+def feed_all(framer, chunks):
+    out = []
+    for chunk in chunks:
+        out.extend(framer.feed(chunk))
+    return out
+
+
+def test_single_record():
+    "Test that a receive with exactly one record is returned as is"
+
+    rnd = random.Random(1)
+    framer = GrottFramer()
+    for record in records(20, rnd):
+        assert framer.feed(record) == [record]
+    assert len(framer) == 0
+    assert framer.frames == 20
+
+
+def test_split():
+    "Test that records split over receives (also within the header) are reassembled"
+
+    rnd = random.Random(2)
+    recs = records(50, rnd)
+    stream = b"".join(recs)
+    for _ in range(20):
+        framer = GrottFramer()
+        cuts = sorted(rnd.sample(range(1, len(stream)), 200))
+        chunks = [stream[a:b] for a, b in zip([0] + cuts, cuts + [len(stream)])]
+        assert feed_all(framer, chunks) == recs
+        assert len(framer) == 0
+        assert framer.resynced == 0
+    #one byte per receive
+    framer = GrottFramer()
+    assert feed_all(framer, [stream[i:i + 1] for i in range(len(stream))]) == recs
+
+
+def test_coalesced():
+    "Test that more records in one receive are returned separately"
+
+    rnd = random.Random(3)
+    recs = records(30, rnd)
+    framer = GrottFramer()
+    assert framer.feed(b"".join(recs)) == recs
+    #coalesced with the start of the next record
+    assert framer.feed(recs[0] + recs[1][:5]) == [recs[0]]
+    assert len(framer) == 5
+    assert framer.feed(recs[1][5:]) == [recs[1]]
+    assert len(framer) == 0
+
+
+def test_garbage_prefix_resync():
+    "Test that data without valid header is passed on as received and the next records are found"
+
+    rnd = random.Random(4)
+    recs = records(5, rnd)
+    garbage = b"\x47\x45\x54\x20\x2f\x20\x48\x54\x54\x50\x2f\x31\x2e\x31\r\n\r\n"
+    framer = GrottFramer()
+    out = framer.feed(garbage + b"".join(recs))
+    assert out == [garbage] + recs
+    assert framer.resynced == 1
+    #garbage between records, one byte per receive: the garbage is passed on in one piece
+    for size in (1, 7):
+        framer = GrottFramer()
+        stream = recs[0] + garbage + recs[1] + recs[2]
+        out = feed_all(framer, [stream[i:i + size] for i in range(0, len(stream), size)])
+        assert out == [recs[0], garbage, recs[1], recs[2]]
+        assert len(framer) == 0
+
+
+def test_garbage_kept_until_header():
+    "Test that data without a plausible header is kept (max maxbuffer bytes) and not passed on in small pieces"
+
+    framer = GrottFramer(maxbuffer=1000)
+    rnd = random.Random(5)
+    garbage = bytes(rnd.getrandbits(8) | 1 for _ in range(1200))
+    assert feed_all(framer, [garbage[i:i + 1] for i in range(1000)]) == []
+    assert len(framer) == 1000
+    #more than maxbuffer bytes: passed on, except a possible header start
+    assert framer.feed(garbage[1000:1001]) == [garbage[:998]]
+    assert len(framer) == 3
+    rec = make_record(2, 100, rnd)
+    assert framer.feed(garbage[1001:] + rec) == [garbage[998:], rec]
+    assert len(framer) == 0
+    #kept data is returned on close
+    assert framer.feed(garbage[:10]) == []
+    assert framer.flush() == [garbage[:10]]
+
+
+def test_no_small_pieces():
+    "Test that a corrupted stream is only split at plausible headers"
+
+    rnd = random.Random(8)
+    recs = records(40, rnd)
+    #unknown protocol in some headers
+    for i in rnd.sample(range(40), 10):
+        recs[i] = recs[i][:3] + b"\x07" + recs[i][4:]
+    stream = b"".join(recs)
+    framer = GrottFramer()
+    out = feed_all(framer, [stream[i:i + 1] for i in range(len(stream))]) + framer.flush()
+    assert b"".join(out) == stream
+    #no pieces shorter than a header (except the data returned on close)
+    assert min(len(piece) for piece in out[:-1]) >= 8
+
+
+def test_too_long_record_resync():
+    "Test that a header with a length over maxbuffer is not waited for"
+
+    rnd = random.Random(6)
+    rec = make_record(6, 300, rnd)
+    framer = GrottFramer(maxbuffer=1000)
+    bad = bytes([0, 1, 0, 6, 0xff, 0xff, 1, 4]) + bytes(20)
+    out = framer.feed(bad + rec)
+    assert out[-1] == rec
+    assert b"".join(out) == bad + rec
+
+
+def test_flush():
+    "Test that an incomplete record is returned on close"
+
+    rnd = random.Random(7)
+    rec = make_record(5, 100, rnd)
+    framer = GrottFramer()
+    assert framer.feed(rec[:3]) == []
+    assert framer.flush() == [rec[:3]]
+    assert framer.flush() == []
+    assert framer.feed(rec[:50]) == []
+    assert framer.flush() == [rec[:50]]
+    assert len(framer) == 0
+    assert framer.feed(rec) == [rec]
@@ -0,0 +1,63 @@
+import sys, os, threading, time
+from types import SimpleNamespace
+
+# Required to import grottinflux from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+from grottinflux import GrottInflux, line
+
+
+class WriteApi:
+    "influxdb v2 write api that fails until it is up"
+
+    def __init__(self):
+        self.up = False
+        self.writes = []
+        self.lock = threading.Lock()
+
+    def write(self, bucket, org, lines):
+        with self.lock:
+            if not self.up: raise ConnectionError("influxdb not reachable")
+            self.writes.append(list(lines))
+
+
+def config(api, **settings):
+    conf = SimpleNamespace(verbose=False, ifbatch=3, ifflush=0.05, ifbuffer=5, influx2=True, ifwrite_api=api,
+                           ifbucket="grottdb", iforg="grott", sinkdeadline=5, sinkfailures=1000, sinkprobe=30)
+    conf.__dict__.update(settings)
+    return conf
+
+
+def wait_until(test, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not test():
+        if time.monotonic() > deadline: return False
+        time.sleep(0.001)
+    return True
+
+
+def test_line():
+    "Test the line protocol escaping and field types"
+
+    assert line("grott", {"device": "NTC 1,2", "type": ""}, {"pvpowerout": 2500, "temp": 21.5, "serial": 'a"b'}, 10) == \
+        'grott,device=NTC\\ 1\\,2 pvpowerout=2500i,temp=21.5,serial="a\\"b" 10'
+    assert line("grott", {}, {}, 10) is None
+
+
+def test_lines_kept_until_written():
+    "Test that lines are written in batches, kept while influxdb is not reachable and the oldest are dropped"
+
+    api = WriteApi()
+    influx = GrottInflux(config(api))
+    for i in range(7):
+        influx.put("line" + str(i))
+    assert influx.dropped == 2
+    time.sleep(0.1)
+    assert api.writes == []
+    api.up = True
+    assert wait_until(lambda: influx.written == 5)
+    assert api.writes == [["line2", "line3", "line4"], ["line5", "line6"]]
+    influx.put("line7")
+    influx.stop()
+    assert api.writes[-1] == ["line7"]
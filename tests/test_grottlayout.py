@@ -0,0 +1,145 @@
+import sys, os, random
+
+# Required to import grottconf from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+import pytest
+from grottconf import Conf
+from grottlayout import GrottLayout
+
+
+@pytest.fixture(scope="module")
+def recorddict():
+    return Conf("test").recorddict
+
+
+def slicing_decode(layoutdef, result_string, includeall):
+    "Record values as decoded with the hex string slicing of grottdata before the compiled layouts (8 = error)"
+
+    definedkey = {}
+    try:
+        logdict = bytes.fromhex(result_string[layoutdef["logstart"]["value"]:len(result_string)-4]).decode("ASCII").split(",")
+    except:
+        pass
+    for keyword in layoutdef.keys():
+        if keyword in ("decrypt", "date", "logstart", "device"):
+            continue
+        include = layoutdef[keyword].get("incl") != "no"
+        try:
+            if include or includeall:
+                keytype = layoutdef[keyword].get("type", "num")
+                pos = layoutdef[keyword].get("value")
+                if keytype in ("text", "num", "numx"):
+                    keyhex = result_string[pos:pos + (layoutdef[keyword]["length"] * 2)]
+                if keytype == "text":
+                    definedkey[keyword] = bytes.fromhex(keyhex).decode("utf-8")
+                if keytype == "num":
+                    definedkey[keyword] = int(keyhex, 16)
+                if keytype == "numx":
+                    definedkey[keyword] = int.from_bytes(bytes.fromhex(keyhex), byteorder="big", signed=True)
+                if keytype == "log":
+                    definedkey[keyword] = logdict[layoutdef[keyword]["pos"] - 1]
+                if keytype == "logpos":
+                    if float(logdict[layoutdef[keyword]["pos"] - 1]) > 0: definedkey[keyword] = logdict[layoutdef[keyword]["pos"] - 1]
+                    else: definedkey[keyword] = 0
+                if keytype == "logneg":
+                    if float(logdict[layoutdef[keyword]["pos"] - 1]) < 0: definedkey[keyword] = logdict[layoutdef[keyword]["pos"] - 1]
+                    else: definedkey[keyword] = 0
+        except:
+            return 8
+    return definedkey
+
+
+def compiled_decode(layout, buf):
+    try:
+        return dict(layout.decode(buf))
+    except ValueError:
+        return 8
+
+
+def record(length, rnd):
+    "Record bytes that decode as text and log fields (ascii digits, with some commas)"
+    return bytes(rnd.choice(b"0123456789,") if rnd.random() < 0.1 else rnd.choice(b"0123456789") for _ in range(length))
+
+
+@pytest.mark.parametrize("includeall", [False, True])
+def test_compiled_decoder_equals_slicing(recorddict, includeall):
+    "Test that the compiled decoder decodes every layout as the hex string slicing, also for short records"
+
+    rnd = random.Random(1)
+    checked = 0
+    for name, layoutdef in recorddict.items():
+        layout = GrottLayout(name, layoutdef, includeall)
+        full = layout.recordlength + 4
+        lengths = {full, layout.recordlength, max(layout.recordlength - 1, 0), max(layout.recordlength - 3, 0), full // 2, 20}
+        for length in sorted(lengths):
+            buf = record(length, rnd)
+            expected = slicing_decode(layoutdef, buf.hex(), includeall)
+            assert compiled_decode(layout, buf) == expected, (name, length)
+            checked += expected != 8
+    assert checked > len(recorddict)
+
+
+def test_short_record_last_field(recorddict):
+    "Test that a record that is too short for its last field decodes the available bytes"
+
+    layoutdef = recorddict["T06NNNNX"]
+    layout = GrottLayout("T06NNNNX", layoutdef)
+    last = max((key for key in layoutdef if isinstance(layoutdef[key], dict) and layoutdef[key].get("type", "num") == "num"
+                and isinstance(layoutdef[key].get("value"), int) and layoutdef[key].get("incl") != "no"),
+               key=lambda key: layoutdef[key]["value"])
+    pos = layoutdef[last]["value"]
+    buf = bytes(range(256)) * (pos // 512 + 1)
+    #only the first byte of the last field is in the record
+    buf = buf[:pos // 2 + 1]
+    decoded = layout.decode(buf)
+    assert decoded[last] == buf[-1]
+    #the last field is not in the record: processing stops
+    with pytest.raises(ValueError):
+        layout.decode(buf[:-1])[last]
+
+
+def test_half_byte_positions():
+    "Test that fields at a half byte (odd hex) position are decoded as from the hex string"
+
+    layoutdef = {
+        "decrypt": {"value": "False"},
+        "text": {"value": 3, "length": 5, "type": "text"},
+        "num": {"value": 15, "length": 2, "type": "num"},
+        "numx": {"value": 21, "length": 2, "type": "numx"},
+        "last": {"value": 27, "length": 4, "type": "text"},
+    }
+    layout = GrottLayout("odd", layoutdef)
+    rnd = random.Random(2)
+    for length in range(0, 22):
+        buf = record(length, rnd)
+        expected = slicing_decode(layoutdef, buf.hex(), False)
+        assert compiled_decode(layout, buf) == expected, length
+    #text of hex digits shifted by half a byte
+    buf = bytes.fromhex("000" + "4142434445" + "0" * 31)
+    assert layout.decode(buf)["text"] == "ABCDE"
+
+
+def test_untouched_fields_not_decoded(recorddict):
+    "Test that only the fields that are used are decoded (text fields are decoded up front)"
+
+    from grottdata import selectvalues
+
+    layout = GrottLayout("T06NNNNX", recorddict["T06NNNNX"])
+    buf = record(layout.recordlength + 4, random.Random(3))
+    decoded = layout.decode(buf)
+    eager = {field[0] for field in layout.eager}
+    assert set(decoded.values) == eager
+    #names and membership do not decode
+    assert "pvpowerout" in decoded and "pvpowerout" in list(decoded)
+    assert set(decoded.values) == eager
+    decoded["pvpowerout"]
+    assert set(decoded.values) == eager | {"pvpowerout"}
+    #a field selection only decodes the selected fields
+    selected = selectvalues(decoded, {"pvserial", "pvstatus"})
+    assert set(selected) == {"pvserial", "pvstatus"}
+    assert set(decoded.values) == eager | {"pvpowerout", "pvstatus"}
+    #without selection all fields are decoded
+    assert selectvalues(decoded, None) == dict(decoded)
+    assert set(decoded.values) == set(layout.fieldmap)
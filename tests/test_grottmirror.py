@@ -0,0 +1,99 @@
+import sys, os, socket, time, threading
+from types import SimpleNamespace
+
+# Required to import grottmirror from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+import pytest
+from grottmirror import GrottMirror
+
+
+@pytest.fixture
+def server():
+    "Second server: accepts one connection, answers every receive"
+
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(5)
+    listener.settimeout(5)
+    yield listener
+    listener.close()
+
+
+def receive(listener, size):
+    conn = listener.accept()[0]
+    conn.settimeout(5)
+    data = b""
+    while len(data) < size:
+        received = conn.recv(4096)
+        if not received: break
+        data += received
+        #response, read and dropped by the mirror
+        conn.sendall(b"\x00\x01\x00\x06\x00\x02\x01\x03")
+    return conn, data
+
+
+def closed(conn):
+    "Connection closed by the mirror (reset if not all responses were read)"
+    try:
+        return conn.recv(10) == b""
+    except ConnectionResetError:
+        return True
+
+
+def test_records_forwarded_in_order(server):
+    "Test that the records of a session are sent in order over one connection"
+
+    conf = SimpleNamespace(verbose=False, mirrorqueue=100, connecttimeout=2, dnsttl=300)
+    mirror = GrottMirror(conf, "127.0.0.1", server.getsockname()[1])
+    records = [bytes([i]) * 50 for i in range(20)]
+    for record in records:
+        mirror.put("session", record)
+    conn, data = receive(server, 1000)
+    assert data == b"".join(records)
+    mirror.close("session")
+    assert closed(conn)
+    conn.close()
+    mirror.stop()
+    assert mirror.stats()["sent"] == 20
+    assert mirror.stats()["dropped"] == 0
+
+
+def test_queue_full_drops_oldest(server):
+    "Test that the oldest records are dropped when the queue is full"
+
+    conf = SimpleNamespace(verbose=False, mirrorqueue=3, connecttimeout=2, dnsttl=300)
+    mirror = GrottMirror(conf, "127.0.0.1", server.getsockname()[1])
+    records = [bytes([i]) * 50 for i in range(10)]
+    #the writer thread waits for the lock
+    with mirror.cond:
+        for record in records:
+            mirror.put("session", record)
+        assert [data for session, data in mirror.queue] == records[-3:]
+        assert mirror.dropped == 7
+    conn, data = receive(server, 150)
+    assert data == b"".join(records[-3:])
+    mirror.stop()
+    conn.close()
+    assert mirror.stats()["sent"] == 3
+
+
+def test_put_not_blocked_by_discard(server):
+    "Test that reading the responses of the second server does not block put"
+
+    conf = SimpleNamespace(verbose=False, mirrorqueue=100, connecttimeout=2, dnsttl=300)
+    mirror = GrottMirror(conf, "127.0.0.1", server.getsockname()[1])
+    reading = threading.Event()
+
+    def discard():
+        reading.set()
+        time.sleep(1)
+
+    mirror.idle = discard
+    #the responses are read when there is no record for a second
+    assert reading.wait(3)
+    start = time.monotonic()
+    mirror.put("session", b"record")
+    assert time.monotonic() - start < 0.5
+    mirror.stop()
@@ -0,0 +1,130 @@
+import sys, os, threading, time
+from types import SimpleNamespace
+
+# Required to import grottmqtt from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+import pytest
+import grottmqtt
+
+
+class FakeInfo:
+    def __init__(self, client, mid):
+        self.client = client
+        self.mid = mid
+        self.rc = grottmqtt.mqtt.MQTT_ERR_SUCCESS
+        self.acked = threading.Event()
+
+    def wait_for_publish(self, timeout=None):
+        self.acked.wait(timeout)
+
+    def is_published(self):
+        return self.acked.is_set()
+
+
+class FakeClient:
+    "paho client without network: messages are acknowledged with ack()"
+
+    def __init__(self, *args, **kwargs):
+        self.published = []
+        self.lock = threading.Lock()
+
+    def username_pw_set(self, username, password): pass
+    def reconnect_delay_set(self, min_delay, max_delay): pass
+    def max_inflight_messages_set(self, inflight): pass
+    def connect_async(self, host, port, keepalive): pass
+    def loop_start(self): pass
+    def loop_stop(self): pass
+    def disconnect(self): pass
+
+    def connect(self):
+        self.on_connect(self, None, {}, 0)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        with self.lock:
+            info = FakeInfo(self, len(self.published))
+            self.published.append((topic, payload, info))
+        if qos == 0: self.ack(info.mid)
+        return info
+
+    def ack(self, mid):
+        info = self.published[mid][2]
+        info.acked.set()
+        self.on_publish(self, None, mid, 0, None)
+
+
+def config(**settings):
+    conf = SimpleNamespace(verbose=False, mqttqueue=100, mqttbatch=10, mqttcoalesce=0, mqttqos=1, sinkdeadline=5,
+                           mqttinflight=2, inverterid="test", pubauth=None, mqttip="localhost", mqttport=1883)
+    conf.__dict__.update(settings)
+    return conf
+
+
+def wait_until(test, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not test():
+        if time.monotonic() > deadline: return False
+        time.sleep(0.001)
+    return True
+
+
+@pytest.fixture(autouse=True)
+def fake_client(monkeypatch):
+    monkeypatch.setattr(grottmqtt.mqtt, "Client", FakeClient)
+
+
+def test_qos1_window():
+    "Test that with qos 1 max mqttinflight messages are unacknowledged and sent counts acknowledgements"
+
+    mqtt = grottmqtt.GrottMqtt(config(mqttqos=1, mqttinflight=2))
+    for i in range(5):
+        mqtt.publish("energy/growatt", str(i))
+    mqtt.client.connect()
+    assert wait_until(lambda: len(mqtt.client.published) == 2)
+    #window full: the third message is published after the first acknowledgement
+    time.sleep(0.05)
+    assert len(mqtt.client.published) == 2
+    assert mqtt.sent == 0
+    mqtt.client.ack(0)
+    assert wait_until(lambda: len(mqtt.client.published) == 3)
+    assert mqtt.sent == 1
+    for mid in range(1, 5):
+        assert wait_until(lambda: len(mqtt.client.published) > mid)
+        mqtt.client.ack(mid)
+    assert [payload for topic, payload, info in mqtt.client.published] == [str(i) for i in range(5)]
+    assert mqtt.sent == 5
+    mqtt.stop()
+
+
+def test_coalescing():
+    "Test that with a deep queue only the latest message per key is kept, at the position of the first one"
+
+    mqtt = grottmqtt.GrottMqtt(config(mqttqos=0, mqttcoalesce=2))
+    for i in range(10):
+        mqtt.publish("energy/" + "ab"[i % 2], str(i), key="ab"[i % 2])
+    mqtt.publish("energy/c", "c")
+    assert mqtt.coalesced == 8
+    mqtt.client.connect()
+    assert wait_until(lambda: mqtt.sent == 3)
+    assert [(topic, payload) for topic, payload, info in mqtt.client.published] == [("energy/a", "8"), ("energy/b", "9"), ("energy/c", "c")]
+    #a published key is not coalesced anymore
+    mqtt.publish("energy/a", "10", key="a")
+    assert wait_until(lambda: mqtt.sent == 4)
+    mqtt.stop()
+
+
+def test_queue_full_drops_oldest():
+    "Test that the oldest message is dropped when the queue is full (and can not be coalesced anymore)"
+
+    mqtt = grottmqtt.GrottMqtt(config(mqttqos=0, mqttqueue=3, mqttcoalesce=3))
+    for i in range(3):
+        mqtt.publish("energy/" + str(i), str(i), key=i)
+    mqtt.publish("energy/3", "3", key=3)
+    assert mqtt.dropped == 1
+    mqtt.publish("energy/0", "new", key=0)
+    assert mqtt.coalesced == 0
+    mqtt.client.connect()
+    assert wait_until(lambda: mqtt.sent == 3)
+    assert [payload for topic, payload, info in mqtt.client.published] == ["2", "3", "new"]
+    mqtt.stop()
@@ -0,0 +1,82 @@
+import sys, os, threading, time
+
+# Required to import grottoutbox from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+from grottoutbox import GrottOutbox
+
+
+class Target:
+    "Sink that is not reachable until it is up"
+
+    def __init__(self, up=True, limit=None):
+        self.up = up
+        self.limit = limit
+        self.received = []
+        self.lock = threading.Lock()
+
+    def deliver(self, msg):
+        with self.lock:
+            if not self.up or (self.limit is not None and len(self.received) >= self.limit):
+                raise ConnectionError("sink not reachable")
+            self.received.append(msg)
+
+
+def wait_until(test, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not test():
+        if time.monotonic() > deadline: return False
+        time.sleep(0.001)
+    return True
+
+
+def test_replay_after_restart(tmp_path):
+    "Test that messages not delivered before a restart are delivered in order after the restart"
+
+    target = Target(up=False)
+    box = GrottOutbox("test", str(tmp_path), target.deliver, segmentbytes=200, fsync=0.01, rate=0)
+    msgs = [{"topic": "energy/growatt", "payload": i} for i in range(20)]
+    for msg in msgs:
+        box.put(msg)
+    box.stop()
+    assert target.received == []
+    assert len(os.listdir(os.path.join(str(tmp_path), "test"))) > 2
+
+    target = Target(limit=8)
+    box = GrottOutbox("test", str(tmp_path), target.deliver, segmentbytes=200, fsync=0.01, rate=0)
+    assert wait_until(lambda: len(target.received) == 8)
+    box.stop()
+    assert target.received == msgs[:8]
+
+    #only the messages that were not delivered
+    target = Target()
+    box = GrottOutbox("test", str(tmp_path), target.deliver, segmentbytes=200, fsync=0.01, rate=0)
+    assert wait_until(lambda: len(target.received) == 12)
+    box.put({"topic": "energy/growatt", "payload": 20})
+    assert wait_until(lambda: len(target.received) == 13)
+    box.stop()
+    assert target.received == msgs[8:] + [{"topic": "energy/growatt", "payload": 20}]
+    #delivered segments are deleted
+    assert len([f for f in os.listdir(os.path.join(str(tmp_path), "test")) if f.endswith(".seg")]) == 1
+
+
+def test_torn_message_removed(tmp_path):
+    "Test that a partly written last message (e.g. power loss) is removed at startup"
+
+    target = Target(up=False)
+    box = GrottOutbox("test", str(tmp_path), target.deliver, fsync=0.01, rate=0)
+    box.put({"payload": 1})
+    box.put({"payload": 2})
+    box.stop()
+    seg = os.path.join(str(tmp_path), "test", "00000001.seg")
+    with open(seg, "r+b") as f:
+        f.truncate(os.path.getsize(seg) - 3)
+    target = Target()
+    box = GrottOutbox("test", str(tmp_path), target.deliver, fsync=0.01, rate=0, batch=5)
+    assert wait_until(lambda: len(target.received) == 1)
+    box.put({"payload": 3})
+    assert wait_until(lambda: len(target.received) == 2)
+    box.stop()
+    #with batch > 1 deliver gets a list of messages
+    assert target.received == [[{"payload": 1}], [{"payload": 3}]]
@@ -0,0 +1,66 @@
+import sys, os, random, threading, time
+from types import SimpleNamespace
+
+# Required to import grottpipeline from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+from grottpipeline import GrottPipeline
+
+
+def frame(serial, seq):
+    return SimpleNamespace(data=bytes(8) + serial + bytes([seq]), serial=serial, seq=seq)
+
+
+def config(**settings):
+    conf = SimpleNamespace(verbose=False, pipeworkers=4, pipequeue=1000)
+    conf.__dict__.update(settings)
+    return conf
+
+
+def test_records_of_a_datalogger_in_order():
+    "Test that the records of a datalogger are processed in order by one worker"
+
+    processed = {}
+    threads = {}
+
+    def process(conf, frame):
+        time.sleep(random.random() / 10000)
+        processed.setdefault(frame.serial, []).append(frame.seq)
+        threads.setdefault(frame.serial, set()).add(threading.current_thread().name)
+
+    pipe = GrottPipeline(config(), process)
+    serials = [("NTC" + str(i)).encode().ljust(10, b"0") for i in range(10)]
+    for seq in range(100):
+        for serial in serials:
+            pipe.put(frame(serial, seq))
+    assert pipe.join(10)
+    assert all(processed[serial] == list(range(100)) for serial in serials)
+    assert all(len(names) == 1 for names in threads.values())
+    assert len(set.union(*threads.values())) > 1
+    assert sum(stats["processed"] for stats in pipe.stats()) == 1000
+    pipe.stop()
+
+
+def test_queue_full_and_errors():
+    "Test that the oldest frames are dropped when a worker queue is full and a failing frame is counted"
+
+    release = threading.Event()
+    processed = []
+
+    def process(conf, frame):
+        release.wait(5)
+        if frame.seq == 7: raise ValueError("invalid record")
+        processed.append(frame.seq)
+
+    pipe = GrottPipeline(config(pipeworkers=1, pipequeue=5), process)
+    pipe.put(frame(b"NTC0000000", 0))
+    while not pipe.workers[0].busy: time.sleep(0.001)
+    for seq in range(1, 11):
+        pipe.put(frame(b"NTC0000000", seq))
+    assert pipe.depth() == [5]
+    release.set()
+    assert pipe.join(5)
+    assert processed == [0, 6, 8, 9, 10]
+    assert pipe.stats() == [{"worker": 0, "depth": 0, "processed": 6, "dropped": 5, "failed": 1}]
+    pipe.stop()
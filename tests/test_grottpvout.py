@@ -0,0 +1,85 @@
+import sys, os, threading, time
+from types import SimpleNamespace
+
+# Required to import grottpvout from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+import pytest
+from grottpvout import GrottPvOut, batchstatus
+
+
+class Session:
+    "requests session that records the posts"
+
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.posts.append((url, headers["X-Pvoutput-SystemId"], data))
+        return SimpleNamespace(status_code=200, text="OK 200")
+
+    def close(self): pass
+
+
+@pytest.fixture
+def pvout():
+    conf = SimpleNamespace(verbose=False, pvurl="https://pvoutput.org/service/r2/addstatus.jsp",
+                           pvbatchurl="https://pvoutput.org/service/r2/addbatchstatus.jsp", pvapikey="key",
+                           pvtimeout=1, pvqueue=40, sinkdeadline=5, sinkfailures=3, sinkprobe=30)
+    uploader = GrottPvOut(conf)
+    uploader.session = Session()
+    yield uploader
+    uploader.stop()
+
+
+def status(minute, **values):
+    return dict({"d": "20261016", "t": "10:{:02d}".format(minute), "v1": minute * 10, "v2": 100}, **values)
+
+
+def wait_until(test, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not test():
+        if time.monotonic() > deadline: return False
+        time.sleep(0.001)
+    return True
+
+
+def test_batches(pvout):
+    "Test that waiting statuses are sent with addbatchstatus, max 30 per call, round robin over the system ids"
+
+    #the uploader thread waits for the lock
+    with pvout.cond:
+        for minute in range(45):
+            pvout.put(1, status(minute))
+        pvout.put(2, status(0))
+        pvout.put(2, status(1))
+        assert pvout.queues[1].dropped == 5
+    assert wait_until(lambda: pvout.sent == 42)
+    posts = pvout.session.posts
+    assert [(url.rsplit("/", 1)[1], systemid) for url, systemid, data in posts] == \
+        [("addbatchstatus.jsp", "1"), ("addbatchstatus.jsp", "2"), ("addbatchstatus.jsp", "1")]
+    assert posts[0][2]["data"] == ";".join(batchstatus(status(minute)) for minute in range(5, 35))
+    assert posts[2][2]["data"] == ";".join(batchstatus(status(minute)) for minute in range(35, 45))
+    #a single status is sent with addstatus
+    pvout.put(1, status(50))
+    assert wait_until(lambda: pvout.sent == 43)
+    assert posts[3] == ("https://pvoutput.org/service/r2/addstatus.jsp", "1", status(50))
+
+
+def test_batch_flags(pvout):
+    "Test that statuses with other flags (c1, n) are sent in another call"
+
+    with pvout.cond:
+        pvout.put(1, status(0))
+        pvout.put(1, status(1, c1=1))
+        pvout.put(1, status(2, c1=1))
+    assert wait_until(lambda: pvout.sent == 3)
+    assert [data for url, systemid, data in pvout.session.posts] == \
+        [status(0), {"data": batchstatus(status(1)) + ";" + batchstatus(status(2)), "c1": 1}]
+
+
+def test_batchstatus():
+    "Test the addbatchstatus format, values without value are -1 or omitted at the end"
+
+    assert batchstatus({"d": "20261016", "t": "10:00", "v2": 100}) == "20261016,10:00,-1,100"
@@ -0,0 +1,89 @@
+import sys, os, threading, time
+
+# Required to import grottqueue from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+from grottqueue import GrottQueue, GrottWorker, shared
+
+
+def test_queue_full_drops_oldest():
+    "Test that put drops (and returns) the oldest item when the queue is full"
+
+    queue = GrottQueue("test", 3)
+    assert [queue.put(i) for i in range(5)] == [None, None, None, 0, 1]
+    assert list(queue.queue) == [2, 3, 4]
+    assert queue.dropped == 2
+    assert len(queue) == 3
+
+
+def test_worker_order_and_join():
+    "Test that the worker handles the items in order, also after a failing item"
+
+    handled = []
+
+    def handle(item):
+        if item == 5: raise ValueError("bad item")
+        time.sleep(0.001)
+        handled.append(item)
+
+    worker = GrottWorker("test", 100, handle)
+    for i in range(20):
+        worker.put(i)
+    assert worker.join(5)
+    assert handled == [i for i in range(20) if i != 5]
+    assert (worker.processed, worker.failed, worker.dropped) == (20, 1, 0)
+    worker.stop()
+    assert not worker.thread.is_alive()
+
+
+def test_worker_overflow():
+    "Test that a busy worker drops the oldest waiting items and handles the rest after stop (drain)"
+
+    handled = []
+    release = threading.Event()
+    worker = GrottWorker("test", 3, lambda item: release.wait(5) and handled.append(item))
+    worker.put(0)
+    #worker busy with the first item
+    while not worker.busy: time.sleep(0.001)
+    for i in range(1, 10):
+        worker.put(i)
+    assert worker.dropped == 6
+    release.set()
+    worker.stop()
+    assert handled == [0, 7, 8, 9]
+
+
+def test_worker_idle_and_no_drain():
+    "Test that idle is called without items and waiting items are not handled on stop without drain"
+
+    idle = threading.Event()
+    handled = []
+    worker = GrottWorker("test", 10, handled.append, interval=0.01, idle=idle.set, drain=False)
+    assert idle.wait(5)
+    with worker.cond:
+        worker.put(1)
+        worker.running = False
+        worker.cond.notify_all()
+    worker.stop()
+    assert handled == []
+
+
+def test_shared_created_once():
+    "Test that a shared instance is created once, also when requested by more threads at the same time"
+
+    created = []
+
+    def create():
+        time.sleep(0.01)
+        created.append(object())
+        return created[-1]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(shared(("test", "once"), create))) for _ in range(10)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert len(created) == 1
+    assert all(result is created[0] for result in results)
+    #create can use other shared instances
+    assert shared(("test", "outer"), lambda: [shared(("test", "inner"), dict)])[0] is shared(("test", "inner"), dict)
@@ -0,0 +1,74 @@
+import sys, os, threading, time
+
+# Required to import grottsupervisor from the root
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+import pytest
+from grottsupervisor import GrottSink, CircuitOpenError, SinkTimeoutError, CLOSED, OPEN, HALFOPEN
+
+
+def fail():
+    raise ConnectionError("sink not reachable")
+
+
+def test_circuit_open_and_close():
+    "Test that the circuit opens after sinkfailures failures, probes after sinkprobe seconds and closes again"
+
+    sink = GrottSink("test", deadline=1, failures=3, probe=0.1)
+    assert sink.call(lambda x: x + 1, 1) == 2
+    for _ in range(3):
+        assert sink.state == CLOSED
+        with pytest.raises(ConnectionError):
+            sink.call(fail)
+    assert sink.state == OPEN
+    #open: the sink is not called
+    called = []
+    with pytest.raises(CircuitOpenError):
+        sink.call(called.append, 1)
+    assert called == [] and sink.rejected == 1
+    #half open: a failing probe opens the circuit again
+    time.sleep(0.1)
+    with pytest.raises(ConnectionError):
+        sink.call(fail)
+    assert sink.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        sink.call(called.append, 2)
+    #a successful probe closes the circuit
+    time.sleep(0.1)
+    assert sink.call(lambda: "ok") == "ok"
+    assert sink.state == CLOSED and sink.failures == 0
+    assert (sink.calls, sink.failed, sink.rejected) == (6, 4, 2)
+
+
+def test_one_probe_at_a_time():
+    "Test that only one call is let through when the circuit is half open"
+
+    sink = GrottSink("test", deadline=1, failures=1, probe=0.05)
+    with pytest.raises(ConnectionError):
+        sink.call(fail)
+    time.sleep(0.05)
+    release = threading.Event()
+    probe = threading.Thread(target=sink.call, args=(release.wait, 5))
+    probe.start()
+    while sink.state != HALFOPEN: time.sleep(0.001)
+    with pytest.raises(CircuitOpenError):
+        sink.call(lambda: None)
+    release.set()
+    probe.join()
+    assert sink.state == CLOSED
+
+
+def test_deadline():
+    "Test that a call that exceeds the deadline fails and new calls fail until it ends"
+
+    sink = GrottSink("test", deadline=0.05, failures=3, probe=30)
+    release = threading.Event()
+    with pytest.raises(SinkTimeoutError):
+        sink.call(release.wait, 5)
+    with pytest.raises(SinkTimeoutError):
+        sink.call(lambda: None)
+    release.set()
+    sink.hung.result()
+    assert sink.call(lambda: "ok") == "ok"
+    assert sink.failures == 0